@@ -62,15 +62,24 @@ class WarpedTokenStream(BufferedTokenStream):
 
 
     # ========= 状态机 =========
+    # ; 只出现在 block 里：遇到 ; 或 } 时，没闭合的 ( / [ 都视为已结束，
+    # 与 src_to_cst._split_statements 的规则相同。合法程序的括号都配对，
+    # 结果不变；出错的程序里一个没闭合的 ( 不会让后面每条语句的 := 都被拆开
     def _update_mode(self, tok):
         l = self.lexer
+        stack = self.mode_stack
         if tok.type in (l.LPAREN, l.LBRACK):
-            self.mode_stack.append(PAREN)
+            stack.append(PAREN)
         elif tok.type == l.LBRACE:
-            self.mode_stack.append(BLOCK)
-        elif tok.type in (l.RPAREN, l.RBRACK, l.RBRACE):
-            if len(self.mode_stack) > 1:
-                self.mode_stack.pop()
+            stack.append(BLOCK)
+        elif tok.type in (l.RPAREN, l.RBRACK):
+            if stack[-1] == PAREN:
+                stack.pop()
+        elif tok.type in (l.SEMICOLON, l.RBRACE):
+            while stack[-1] == PAREN:
+                stack.pop()
+            if tok.type == l.RBRACE and len(stack) > 1:
+                stack.pop()
 
     def _should_split(self):
         # 规则 1：当前在 PAREN
@@ -1,12 +1,22 @@
-from typing import Dict, List, Optional
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
 from ast_types import (
     AstList, BindPhi, Block, BlockInfo, Call, Expr,
-    Function, Identifier, Literal, Point, Program, Stmt
+    Function, Identifier, ImportIdentifier, Literal, Point, Program, Stmt
 )
+from block_tree import number_blocks
 from intr import INTRINSIC
 
+# 并行 resolve 的门槛：不同 (name, block) 少于这个数时进程池的开销比 resolve 本身大
+PARALLEL_MIN_KEYS = 2048
 
-def build_bdg(ast: Program):
+
+def build_bdg(
+    ast: Program,
+    jobs: int = 1,
+    min_parallel: int = PARALLEL_MIN_KEYS,
+    imports: Optional[List[ImportIdentifier]] = None,
+):
     block_index: List[BlockInfo] = []
     point_index: List[Point] = []
     bindphi_index: List[BindPhi] = []
@@ -40,6 +50,26 @@ def build_bdg(ast: Program):
     for intr in INTRINSIC:
         add_builtin(intr)
 
+    # 其他模块的导出（use!）：和 builtin 同在 depth -1，即扩展了 prelude
+    def add_import(ident: ImportIdentifier):
+        nonlocal point_id
+        p = Point(
+            point_id,
+            ident.name,
+            'import',
+            None,
+            ident,
+            None,
+            -1,
+        )
+        point_id += 1
+        ident.point = p
+        builtin_scope.setdefault(ident.name, set()).add(p)
+        point_index.append(p)
+
+    for ident in imports or ():
+        add_import(ident)
+
     # ==================================================
     # helpers
     # ==================================================
@@ -151,6 +181,21 @@ def build_bdg(ast: Program):
                 build_blocks(stmt.expr.body, bi)
 
     build_blocks(ast.block, None)
+    # 前序区间：之后的祖先判断 / LCA 都是 O(1)，见 block_tree
+    number_blocks(block_index[0])
+
+    # name -> 定义了它的 block（按 pre 排序）及其中同名的 point。
+    # 祖先的 pre 都不大于当前 block 的 pre，resolve 时二分出这一段，
+    # 再用区间包含挑出祖先，不必沿 parent 链把每一层的 points 都扫一遍
+    def_pres: Dict[str, List[int]] = {}
+    def_blocks: Dict[str, List[Tuple[BlockInfo, List[Point]]]] = {}
+    for blk in sorted(block_index, key=lambda b: b.pre):
+        by_name: Dict[str, List[Point]] = {}
+        for p in blk.points:
+            by_name.setdefault(p.name, []).append(p)
+        for name, pts in by_name.items():
+            def_pres.setdefault(name, []).append(blk.pre)
+            def_blocks.setdefault(name, []).append((blk, pts))
 
     # ==================================================
     # Phase 2: identifier resolve（按 block depth BFS）
@@ -160,18 +205,21 @@ def build_bdg(ast: Program):
             return
 
         bp = new_bindphi(ident.name, ident)
+        bp.scope = bi
 
         # symbol
         for p in symbol_scope.get(ident.name, []):
             bp.add(p, depth=-2)
 
-        # block chain
-        cur = bi
-        while cur:
-            for p in cur.points:
-                if p.name == ident.name:
-                    bp.add(p, depth=cur.depth)
-            cur = cur.parent
+        # block chain：由内到外，与沿 parent 往上走的顺序相同
+        pres = def_pres.get(ident.name)
+        if pres:
+            blocks = def_blocks[ident.name]
+            for k in range(bisect_right(pres, bi.pre) - 1, -1, -1):
+                blk, pts = blocks[k]
+                if blk.is_ancestor_of(bi):
+                    for p in pts:
+                        bp.add(p, depth=blk.depth)
 
         # builtin
         for p in builtin_scope.get(ident.name, []):
@@ -203,8 +251,192 @@ def build_bdg(ast: Program):
         else:
             raise NotImplementedError(type(expr))
 
+    if jobs <= 1:
+        for bi in sorted(block_index, key=lambda b: b.depth):
+            for stmt in bi.ast_block.stmts:
+                resolve_expr(stmt.expr, bi)
+        return ast, block_index, point_index, bindphi_index
+
+    # ==================================================
+    # Phase 2（并行）：见 resolve_parallel
+    # ==================================================
+    work: List[Tuple[Identifier, BlockInfo]] = []
+
+    def collect_expr(expr: Expr, bi: BlockInfo):
+        if isinstance(expr, Identifier):
+            if not (expr.point or expr.bindphi):
+                work.append((expr, bi))
+        elif isinstance(expr, Call):
+            collect_expr(expr.fn, bi)
+            collect_expr(expr.arg, bi)
+        elif isinstance(expr, AstList):
+            for item in expr.items:
+                collect_expr(item.value, bi)
+        elif isinstance(expr, Function):
+            collect_expr(expr.params, bi)
+            if expr.ret:
+                collect_expr(expr.ret, bi)
+        elif not isinstance(expr, Literal):
+            raise NotImplementedError(type(expr))
+
     for bi in sorted(block_index, key=lambda b: b.depth):
         for stmt in bi.ast_block.stmts:
-            resolve_expr(stmt.expr, bi)
+            collect_expr(stmt.expr, bi)
+
+    snapshot = scope_snapshot(block_index, symbol_scope, builtin_scope)
+    resolved = resolve_parallel(
+        snapshot, block_index, [(ident.name, bi.id) for ident, bi in work], jobs, min_parallel,
+    )
+
+    # 按串行版本的顺序建 BindPhi：id、candidates 的插入顺序都和 jobs=1 一致
+    for ident, bi in work:
+        if ident.bindphi:
+            continue
+        bp = new_bindphi(ident.name, ident)
+        bp.scope = bi
+        flat = resolved[(ident.name, bi.id)]
+        for k in range(0, len(flat), 2):
+            bp.add(point_index[flat[k + 1]], depth=flat[k])
+        ident.bindphi = bp
 
     return ast, block_index, point_index, bindphi_index
+
+
+def clear_bdg(ast: Program):
+    """
+    去掉 build_bdg 写进 AST 的 point / bindphi / block，
+    同一棵 AST（incremental 复用的语句）可以再跑一次 build_bdg
+    """
+    stack = [ast.block]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Block):
+            node.block = None
+            stack.extend(node.stmts)
+        elif isinstance(node, Stmt):
+            if node.target is not None:
+                stack.append(node.target)
+            stack.append(node.expr)
+        elif isinstance(node, Identifier):
+            node.point = None
+            node.bindphi = None
+        elif isinstance(node, Call):
+            stack.append(node.fn)
+            stack.append(node.arg)
+        elif isinstance(node, AstList):
+            for item in node.items:
+                if item.key is not None:
+                    stack.append(item.key)
+                stack.append(item.value)
+        elif isinstance(node, Function):
+            stack.append(node.params)
+            if node.ret is not None:
+                stack.append(node.ret)
+            stack.extend(node.ann)
+            stack.append(node.body)
+
+
+# ============================================================
+# 并行 identifier resolve
+#
+# resolve 的结果只取决于 (name, 所在 block)，且只读 Phase 0/1 建好的作用域：
+#   symbol_scope / builtin_scope / 每个 block 的 points / parent 链
+# 把这些拍成只含 int / str 的快照发给 worker（initializer 里只传一次），
+# 不同的 (name, block_id) 按顶层 block 的子树分组，分给各进程。
+# worker 返回扁平的 (depth, point_id, depth, point_id, ...)，
+# 顺序与串行版本 bp.add 的顺序相同；主进程再按原遍历顺序生成 BindPhi。
+# ============================================================
+
+# (parents, depths, block_points, symbols, builtins)
+#   block_points[block_id] = {name: [point_id, ...]}
+ScopeSnapshot = Tuple[List[int], List[int], List[Dict[str, List[int]]], Dict[str, List[int]], Dict[str, List[int]]]
+
+
+def scope_snapshot(
+    block_index: List[BlockInfo],
+    symbol_scope: Dict[str, set],
+    builtin_scope: Dict[str, set],
+) -> ScopeSnapshot:
+    parents = [bi.parent.id if bi.parent else -1 for bi in block_index]
+    depths = [bi.depth for bi in block_index]
+    block_points = []
+    for bi in block_index:
+        by_name: Dict[str, List[int]] = {}
+        for p in bi.points:
+            by_name.setdefault(p.name, []).append(p.id)
+        block_points.append(by_name)
+    # set 的遍历顺序在这里定下来，worker 里照抄
+    symbols = {name: [p.id for p in ps] for name, ps in symbol_scope.items()}
+    builtins = {name: [p.id for p in ps] for name, ps in builtin_scope.items()}
+    return parents, depths, block_points, symbols, builtins
+
+
+def resolve_keys(snapshot: ScopeSnapshot, keys: List[Tuple[str, int]]) -> List[Tuple[int, ...]]:
+    parents, depths, block_points, symbols, builtins = snapshot
+    out = []
+    for name, block_id in keys:
+        flat: List[int] = []
+        for pid in symbols.get(name, ()):
+            flat += (-2, pid)
+        cur = block_id
+        while cur != -1:
+            for pid in block_points[cur].get(name, ()):
+                flat += (depths[cur], pid)
+            cur = parents[cur]
+        for pid in builtins.get(name, ()):
+            flat += (-1, pid)
+        out.append(tuple(flat))
+    return out
+
+
+_worker_snapshot: Optional[ScopeSnapshot] = None
+
+
+def _init_worker(snapshot: ScopeSnapshot):
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _resolve_chunk(keys: List[Tuple[str, int]]) -> List[Tuple[int, ...]]:
+    return resolve_keys(_worker_snapshot, keys)
+
+
+def _partition(block_index: List[BlockInfo], keys: List[Tuple[str, int]], jobs: int) -> List[List[Tuple[str, int]]]:
+    """按顶层 block（根的直接子 block）分组，再贪心装进 jobs 个桶；结果只取决于输入"""
+    top = [0] * len(block_index)
+    for bi in block_index:
+        if bi.parent is None or bi.parent.parent is None:
+            top[bi.id] = bi.id
+        else:
+            top[bi.id] = top[bi.parent.id]
+
+    groups: Dict[int, List[Tuple[str, int]]] = {}
+    for key in keys:
+        groups.setdefault(top[key[1]], []).append(key)
+
+    buckets: List[List[Tuple[str, int]]] = [[] for _ in range(jobs)]
+    for _, group in sorted(groups.items(), key=lambda kv: (-len(kv[1]), kv[0])):
+        min(buckets, key=len).extend(group)
+    return [b for b in buckets if b]
+
+
+def resolve_parallel(
+    snapshot: ScopeSnapshot,
+    block_index: List[BlockInfo],
+    keys: List[Tuple[str, int]],
+    jobs: int,
+    min_parallel: int = PARALLEL_MIN_KEYS,
+) -> Dict[Tuple[str, int], Tuple[int, ...]]:
+    unique = list(dict.fromkeys(keys))
+    if len(unique) < min_parallel:
+        return dict(zip(unique, resolve_keys(snapshot, unique)))
+
+    chunks = _partition(block_index, unique, jobs)
+    resolved: Dict[Tuple[str, int], Tuple[int, ...]] = {}
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(
+        max_workers=len(chunks), initializer=_init_worker, initargs=(snapshot,),
+    ) as pool:
+        for chunk, result in zip(chunks, pool.map(_resolve_chunk, chunks)):
+            resolved.update(zip(chunk, result))
+    return resolved
@@ -66,6 +66,18 @@ class Identifier(Expr):
         self.bindphi: Optional[BindPhi] = None
 
 
+class ImportIdentifier(Identifier):
+    """
+    其他模块导出的名字（use!(mod) 引入），不在本模块的 AST 里。
+    summary 是接口文件里的导出摘要（value 种类 / 编码后的类型 ...），
+    cstPointer 指向模块源码里的定义位置（SourceSpan.file_id 区分文件）。
+    """
+    def __init__(self, name: str, module: str, summary: dict):
+        super().__init__(name)
+        self.module: str = module
+        self.summary: dict = summary
+
+
 class Literal(Expr):
     def __init__(self, raw: str, type: LiteralType):
         super().__init__()
@@ -129,10 +141,19 @@ class BlockInfo:
 
         self.points: List[Point] = []
         self.ast_block = block
+
+        # 前序区间（build_bdg Phase 1 里由 block_tree.number_blocks 填）：
+        # 子树里的 block 恰好是 pre 落在 [pre, post] 的那些
+        self.pre = -1
+        self.post = -1
     
     def __hash__(self):
         return self.id
 
+    def is_ancestor_of(self, other: BlockInfo) -> bool:
+        """self 是 other 本身或它的祖先；O(1)"""
+        return self.pre <= other.pre and other.post <= self.post
+
 class Point:
     def __init__(self,
                  id: int, name: str, typ: str,
@@ -145,7 +166,7 @@ class Point:
         self.stmt = stmt
         self.define_depth = define_depth
         self.type = typ
-        assert typ in ['builtin', 'point', 'symbol']
+        assert typ in ['builtin', 'point', 'symbol', 'import']
 
     def __hash__(self):
         return self.id
@@ -155,6 +176,8 @@ class BindPhi:
         self.id = id
         self.name = name
         self.entry = entry
+        # resolve 时所在的 block；(name, scope) 相同的 BindPhi 候选集合也相同
+        self.scope: Optional[BlockInfo] = None
         # candidates[level] = List[Point]
         self.candidates: Dict[int, set[Point]] = dict()
 
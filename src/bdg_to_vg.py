@@ -28,82 +28,11 @@ from vg_types import (
 
 
 
-def dump_value_graph(graph: ValueGraph):
-    print("=" * 80)
-    print("VALUE GRAPH")
-    print("=" * 80)
-
-    dump_values(graph)
-    dump_phis(graph)
-    dump_edges(graph)
-
-    print("=" * 80)
-
-
-def dump_values(graph: ValueGraph):
-    print("\n[ValueNodes]")
-    for v in graph.values:
-        ast = v.ast.__class__.__name__ if v.ast else None
-        in_edge = f"e{v.in_edge.id}" if v.in_edge else None
-        if v.placeholder:
-            continue
-
-        print(
-            f"  v{v.id:<3} "
-            f"kind={v.kind:<7} "
-            f"ast={ast:<12} "
-            f"in_edge={in_edge}"
-            f"  {v.ast.getCstPointer().get('text', '<rule>') if v.ast.getCstPointer() is not None else '<builtin>'}"
-        )
-
-
-def dump_phis(graph: ValueGraph):
-    print("\n[PhiNodes]")
-    for p in graph.phis:
-        if p.identifier is not None:
-            name = p.identifier.name
-        else:
-            name = '<not an identifier>'
-        bind = f"BindPhi#{p.bindphi.id}" if p.bindphi else None
-
-        print(f"  p{p.id:<3} id={name} bindphi={bind}")
-
-        for level, values in sorted(p.candidates.items()):
-            vs = ", ".join(f"v{v.id}" for v in values)
-            print(f"       depth {level}: {vs}")
-
-
-def dump_edges(graph: ValueGraph):
-    print("\n[Edges]")
-    for e in graph.edges:
-        print(f"  e{e.id:<3} kind={e.kind}")
-
-        print(f"       out : v{e.output.id}")
-
-        if e.transform:
-            print(f"       fn  : p{e.transform.id}")
-
-        if e.inputs:
-            ins = ", ".join(f"p{p.id}" for p in e.inputs)
-            print(f"       in  : {ins}")
-
-        ast = e.ast.__class__.__name__
-        print(f"       ast : {ast}")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+def dump_value_graph(graph: ValueGraph, f=None, fmt: str = "text"):
+    """写到 f（默认 stdout），格式见 vg_emit"""
+    import sys
+    from vg_emit import write_value_graph
+    return write_value_graph(graph, f or sys.stdout, fmt)
 
 
 from typing import List, Deque
@@ -376,6 +305,7 @@ def connect_identifiers(graph: ValueGraph, bi: BlockInfo, points: Point):
     # symbol ValueNode 复用（同一个 symbol 只建一个）
     symbol_cache: dict[str, ValueNode] = {}
     builtin_cache: dict[str, ValueNode] = {}
+    import_cache: dict[int, ValueNode] = {}
 
     # 注意：这里遍历的是“当前已经建出来的值”
     for val in list(graph.values):
@@ -406,6 +336,16 @@ def connect_identifiers(graph: ValueGraph, bi: BlockInfo, points: Point):
                     assert target_val is not None
                     phi.add(depth, target_val)
 
+                elif pt.type == 'import':
+                    # 导出值只有接口摘要，没有图；每个导出 point 一个外部 value
+                    if pt.id not in import_cache:
+                        import_cache[pt.id] = graph.new_value(
+                            kind="expr",
+                            ast=pt.identifier,
+                            cst=pt.identifier.cstPointer,
+                        )
+                    phi.add(depth, import_cache[pt.id])
+
                 elif pt.type == 'builtin':
                     sym = Identifier(pt.name)
                     if pt.name not in builtin_cache:
@@ -441,10 +381,20 @@ def replace_input_phi(
     new_phi:   用 BindPhi 构造出来的新 PhiNode
     """
 
-    # 在所有 edge.inputs 中找这个 ident_val
+    # 在所有 edge.transform / edge.inputs 中找这个 ident_val
     found = False
 
     for edge in graph.edges:
+        # call 的 fn 位置也是占位 phi
+        if edge.transform is not None:
+            for values in edge.transform.candidates.values():
+                if ident_val in values:
+                    edge.transform = new_phi
+                    found = True
+                    break
+            if found:
+                break
+
         for i, phi in enumerate(edge.inputs):
             # 占位 phi 一定只有一个 candidate，且指向 ident_val
             for values in phi.candidates.values():
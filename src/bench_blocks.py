@@ -0,0 +1,104 @@
+import argparse
+import random
+import sys
+import time
+
+from ast_types import BlockInfo
+from block_tree import BlockTree, number_blocks
+
+
+# ============================================================
+# block 祖先 / LCA 查询（见 block_tree）
+#
+#   python bench_blocks.py [blocks...]   随机生成对应大小的 block 树，随机取 block 对查询
+#
+# 两种树形：
+#   wide —— 父节点在已有 block 里均匀随机取（深度约 ln n，接近真实程序）
+#   deep —— 父节点只在最近的几个 block 里取（深度与 n 同阶，最坏情况）
+# 与沿 parent 往上走的做法比较，每种查询报告平均微秒，并检查结果一致。
+# ============================================================
+
+SHAPES = {"wide": None, "deep": 4}
+
+
+def random_tree(n: int, window, rng: random.Random):
+    blocks = [BlockInfo(0, None, None)]
+    for i in range(1, n):
+        lo = 0 if window is None else max(0, i - window)
+        parent = blocks[rng.randrange(lo, i)]
+        bi = BlockInfo(i, parent, None)
+        parent.children.append(bi)
+        blocks.append(bi)
+    return blocks
+
+
+def walk_is_ancestor(a: BlockInfo, b: BlockInfo) -> bool:
+    while b is not None and b.depth > a.depth:
+        b = b.parent
+    return b is a
+
+
+def walk_lca(a: BlockInfo, b: BlockInfo) -> BlockInfo:
+    while a.depth > b.depth:
+        a = a.parent
+    while b.depth > a.depth:
+        b = b.parent
+    while a is not b:
+        a, b = a.parent, b.parent
+    return a
+
+
+def per_query_us(fn, pairs) -> float:
+    t0 = time.perf_counter()
+    for a, b in pairs:
+        fn(a, b)
+    return (time.perf_counter() - t0) / len(pairs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block ancestry / LCA query benchmark")
+    parser.add_argument("blocks", nargs="*", type=int, default=[10_000, 100_000],
+                        help="Block tree sizes")
+    parser.add_argument("--queries", type=int, default=20_000, help="Random block pairs per tree")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'shape':>5} {'blocks':>7} {'depth':>6} {'number ms':>9} {'lca build ms':>12} "
+          f"{'anc walk us':>11} {'anc us':>7} {'lca walk us':>11} {'lca us':>7}")
+    for shape, window in SHAPES.items():
+        for n in args.blocks:
+            rng = random.Random(args.seed)
+            blocks = random_tree(n, window, rng)
+
+            t0 = time.perf_counter()
+            number_blocks(blocks[0])
+            number_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            tree = BlockTree(blocks)
+            build_ms = (time.perf_counter() - t0) * 1000
+
+            # 一半的对是 (祖先, 后代)：后代在祖先的前序区间里取；否则随机对几乎都不是祖先关系
+            pairs = []
+            for _ in range(args.queries):
+                a = blocks[rng.randrange(n)]
+                if rng.random() < 0.5:
+                    b = tree.order[rng.randint(a.pre, a.post)]
+                else:
+                    b = blocks[rng.randrange(n)]
+                pairs.append((a, b))
+            for a, b in pairs:
+                assert a.is_ancestor_of(b) == walk_is_ancestor(a, b)
+                assert tree.lca(a, b) is walk_lca(a, b)
+
+            anc_walk = per_query_us(walk_is_ancestor, pairs)
+            anc = per_query_us(BlockInfo.is_ancestor_of, pairs)
+            lca_walk = per_query_us(walk_lca, pairs)
+            lca = per_query_us(tree.lca, pairs)
+            depth = max(bi.depth for bi in blocks)
+            print(f"{shape:>5} {n:>7} {depth:>6} {number_ms:>9.1f} {build_ms:>12.1f} "
+                  f"{anc_walk:>11.2f} {anc:>7.2f} {lca_walk:>11.2f} {lca:>7.2f}")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
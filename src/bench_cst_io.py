@@ -0,0 +1,103 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import xml.etree.ElementTree as ET
+
+from src_to_cst import build_cst, cst_dict_to_xml, cst_dict_to_bin, indent_xml, parse_tree
+from cst_stream import write_cst
+from bench_typing import generate_generic_program
+
+
+# ============================================================
+# CST 输出 benchmark：吞吐（MB/s）与峰值内存
+#
+# 写到 os.devnull，只计输出本身；峰值内存用 tracemalloc，
+# 不含已经在内存里的 CST / parse tree。
+# ============================================================
+
+def et_xml(cst, f) -> int:
+    elem = cst_dict_to_xml(cst)
+    indent_xml(elem)
+    s = ET.tostring(elem, encoding="unicode")
+    f.write(s)
+    return len(s)
+
+
+def dumps_json(cst, f) -> int:
+    s = json.dumps(cst, indent=2)
+    f.write(s)
+    return len(s)
+
+
+class _CountingWriter(io.RawIOBase):
+    def __init__(self, f):
+        self.f = f
+        self.n = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.n += len(b)
+        return self.f.write(b)
+
+
+def binary(cst, f) -> int:
+    w = _CountingWriter(f.buffer)
+    cst_dict_to_bin(cst, w)
+    return w.n
+
+
+def measure(fn, *args):
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        n = fn(*args, f)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return n, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CST output benchmark")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[50, 200],
+        help="Number of generated function groups per run",
+    )
+    args = parser.parse_args()
+
+    print(f"{'n':>5} {'writer':<22} {'size':>10} {'MB/s':>8} {'peak':>10}")
+    for n in args.sizes:
+        src = generate_generic_program(n)
+        cst = build_cst(src)
+        tree, p = parse_tree(src)
+
+        runs = [
+            ("xml  ElementTree", lambda f: et_xml(cst, f)),
+            ("xml  stream(dict)", lambda f: write_cst(cst, f, "xml")),
+            ("xml  stream(tree)", lambda f: write_cst(tree, f, "xml", parser=p)),
+            ("json json.dumps", lambda f: dumps_json(cst, f)),
+            ("json stream(dict)", lambda f: write_cst(cst, f, "json")),
+            ("json stream(tree)", lambda f: write_cst(tree, f, "json", parser=p)),
+            ("bin  stream(dict)", lambda f: binary(cst, f)),
+        ]
+        for name, fn in runs:
+            size, elapsed, peak = measure(fn)
+            print(
+                f"{n:>5} {name:<22} {size / 1e6:>8.2f}MB "
+                f"{size / 1e6 / elapsed:>8.1f} {peak / 1024:>8.0f}KiB"
+            )
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from ast_types import Call, Identifier, Literal as AstLiteral
+from vg_emit import EMIT_FORMATS, TextEmitter, write_value_graph
+from vg_types import ValueGraph
+
+
+# ============================================================
+# value graph 输出吞吐（见 vg_emit）
+#
+#   python bench_emit.py [values...]    合成一张有 N 个 value 的图（每个调用
+#                                      3 个 value、3 个 phi、1 条 edge），写到临时文件
+#
+# 每种格式比较 buffer_size：
+#   print  —— 旧的 dump 方式：redirect_stdout 后逐行 print（只测 text）
+#   0      —— 每条记录一次 write
+#   64K（默认）/ 1M
+# 合成图只用来测输出层，AST 节点是共享的几个对象。
+# ============================================================
+
+BUFFERS = [("0", 0), ("64K", 1 << 16), ("1M", 1 << 20)]
+
+
+def synthetic_graph(values: int) -> ValueGraph:
+    graph = ValueGraph()
+    fn = Identifier("f")
+    fn.cstPointer = {"text": "f"}
+    arg = AstLiteral("42", "int")
+    arg.cstPointer = {"text": "42"}
+    call = Call(fn, arg)
+    call.cstPointer = {"rule": "expression"}
+    for _ in range(values // 3):
+        f_val = graph.new_value(kind="symbol", ast=fn, cst=fn.cstPointer)
+        a_val = graph.new_value(kind="literal", ast=arg, cst=arg.cstPointer)
+        out = graph.new_value(kind="expr", ast=call, cst=call.cstPointer)
+        f_phi = graph.new_phi(identifier=fn, bindphi=None)
+        f_phi.add(0, f_val)
+        a_phi = graph.new_phi(identifier=None, bindphi=None)
+        a_phi.add(0, a_val)
+        o_phi = graph.new_phi(identifier=None, bindphi=None)
+        o_phi.add(0, out)
+        graph.new_edge(kind="call", output=out, transform=f_phi, inputs=[a_phi], ast=call)
+    return graph
+
+
+class _PrintEmitter(TextEmitter):
+    """旧 dump：格式与 text 相同，每行一次 print"""
+
+    def write(self, s: str):
+        for line in s[:-1].split("\n"):
+            print(line)
+        self.written += len(s)
+
+
+def print_lines(graph: ValueGraph, f) -> int:
+    with redirect_stdout(f):
+        return _PrintEmitter(f).emit(graph)
+
+
+def timed(fn, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        t0 = time.perf_counter()
+        chars = fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+        elapsed = time.perf_counter() - t0
+    return chars, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value graph emitter throughput benchmark")
+    parser.add_argument("values", nargs="*", type=int, default=[1_000_000, 2_000_000],
+                        help="Value nodes in the synthetic graph")
+    parser.add_argument("--format", action="append", choices=EMIT_FORMATS,
+                        help="Only these formats (repeatable)")
+    args = parser.parse_args()
+    formats = args.format or EMIT_FORMATS
+
+    print(f"{'values':>9} {'format':>6} {'buffer':>6} {'MB':>8} {'s':>7} {'MB/s':>7} {'nodes/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vg.out")
+        for n in args.values:
+            graph = synthetic_graph(n)
+            nodes = len(graph.values) + len(graph.phis) + len(graph.edges)
+            runs = []
+            if "text" in formats:
+                runs.append(("text", "print", lambda f: print_lines(graph, f)))
+            for fmt in formats:
+                for label, size in BUFFERS:
+                    runs.append((fmt, label, lambda f, fmt=fmt, size=size: write_value_graph(graph, f, fmt, size)))
+            for fmt, label, fn in runs:
+                chars, elapsed = timed(fn, path)
+                mb = os.path.getsize(path) / 1e6
+                print(
+                    f"{len(graph.values):>9} {fmt:>6} {label:>6} {mb:>8.1f} {elapsed:>7.2f} "
+                    f"{mb / elapsed:>7.1f} {nodes / elapsed:>10.0f}"
+                )
+                sys.stdout.flush()
+            del graph
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import random
+import sys
+import time
+
+from ast_to_bdg import build_bdg
+from ast_types import Identifier
+from cst_to_ast import build_ast
+from ide_index import IdeIndex, ast_children, resolved_points
+from src_to_cst import build_cst, source_map_for
+from source_span import SourceSpan
+from yafl_gen import generate_program
+
+
+# ============================================================
+# 编辑器查询延迟（见 ide_index）
+#
+#   python bench_ide.py [statements...]   生成对应规模的程序，建索引后在随机位置查询
+#
+# 每种查询报告平均 / p99 微秒，与不建索引的做法比较：
+#   scan —— 每次查询都遍历整棵 AST（找最内层节点 / 找所有同名引用）
+# 同时检查两种做法的结果一致。build_bdg 对同名绑定是平方级的，规模不宜太大。
+# ============================================================
+
+QUERIES = ["node_at", "definitions", "references", "hover"]
+
+
+def scan_node_at(ast, x: int):
+    best, best_key = None, None
+    stack = [(ast, 0)]
+    while stack:
+        node, depth = stack.pop()
+        span = node.getCstPointer()
+        if isinstance(span, SourceSpan) and span.start <= x < span.end:
+            key = (span.end - span.start, -depth)
+            if best_key is None or key < best_key:
+                best, best_key = node, key
+        for child in ast_children(node):
+            stack.append((child, depth + 1))
+    return best
+
+
+def scan_references(ast, points):
+    ids = {p.id for p in points}
+    out = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Identifier) and node.bindphi is not None \
+                and any(p.id in ids for p in resolved_points(node.bindphi)):
+            out.append(node)
+        stack.extend(ast_children(node))
+    return out
+
+
+def percentile(samples, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IDE index query latency benchmark")
+    parser.add_argument("statements", nargs="*", type=int, default=[1_000, 3_000],
+                        help="Top-level statements in the generated program")
+    parser.add_argument("--queries", type=int, default=2_000, help="Random positions per size")
+    parser.add_argument("--scan-queries", type=int, default=50, help="Positions for the full-scan baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'stmts':>7} {'lines':>7} {'nodes':>8} {'build ms':>9} {'query':>11} "
+          f"{'avg us':>8} {'p99 us':>8} {'scan us':>10}")
+    for n in args.statements:
+        src = generate_program(args.seed, statements=n)
+        sm = source_map_for(src)
+        ast = build_ast(build_cst(src, parser="rd"), source=src, source_map=sm)
+        ast, _, point_index, bindphi_index = build_bdg(ast)
+
+        t0 = time.perf_counter()
+        index = IdeIndex(ast, point_index, bindphi_index, sm)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        rng = random.Random(args.seed)
+        lines = src.count("\n") + 1
+        positions = []
+        while len(positions) < args.queries:
+            line = rng.randint(1, lines)
+            text = sm.line_text(line)
+            if text:
+                positions.append((line, rng.randrange(len(text))))
+
+        # 一致性 + 基线
+        scan = {"node_at": [], "references": []}
+        for line, col in positions[:args.scan_queries]:
+            t0 = time.perf_counter()
+            expect = scan_node_at(ast, sm.offset(line, col))
+            scan["node_at"].append(time.perf_counter() - t0)
+            assert index.node_at(line, col) is expect, (line, col)
+            points = index.definitions(line, col)
+            t0 = time.perf_counter()
+            expect = scan_references(ast, points)
+            scan["references"].append(time.perf_counter() - t0)
+            assert {id(r) for r in index.references(line, col)} == {id(r) for r in expect}, (line, col)
+
+        index._refs.clear()  # references 缓存：下面测的是首次查询
+        for q in QUERIES:
+            fn = getattr(index, q)
+            samples = []
+            for line, col in positions:
+                t0 = time.perf_counter()
+                fn(line, col)
+                samples.append(time.perf_counter() - t0)
+            avg = sum(samples) / len(samples) * 1e6
+            base = f"{sum(scan[q]) / len(scan[q]) * 1e6:>10.0f}" if q in scan else f"{'-':>10}"
+            print(f"{n:>7} {lines:>7} {len(index.tree):>8} {build_ms:>9.0f} {q:>11} "
+                  f"{avg:>8.1f} {percentile(samples, 0.99) * 1e6:>8.1f} {base}")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import random
+import sys
+import time
+
+from cst_to_ast import build_ast
+from incremental import Document
+from source_map import SourceMap
+from src_to_cst import build_cst
+from yafl_gen import generate_program
+
+
+# ============================================================
+# 单字符编辑的重解析延迟（见 incremental）
+#
+#   python bench_incremental.py [lines...]   生成对应行数的程序（yafl_gen，大约一行一条
+#                                           语句），打开成 Document，在随机位置输入一个
+#                                           字符再删掉（文档回到原样），两次编辑分别计时
+#   --full                                  同时测整篇 build_cst + build_ast 作为对照
+#
+# edit 只含重新 lex / parse / 建 AST 和 chunk 拼接；program 是之后第一次取整棵
+# AST（平移复用语句的 span）的耗时，build_bdg 等全程序阶段不在其中。
+# ============================================================
+
+TYPED = "x"
+
+
+def percentile(samples, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental reparse latency benchmark")
+    parser.add_argument("lines", nargs="*", type=int, default=[10_000, 100_000],
+                        help="Approximate line counts of the generated programs")
+    parser.add_argument("--edits", type=int, default=500, help="Random positions per size")
+    parser.add_argument("--lexer", choices=["antlr", "fast"], default="antlr")
+    parser.add_argument("--parser", choices=["antlr", "rd"], default="rd")
+    parser.add_argument("--full", action="store_true", help="Also time a full build_cst + build_ast")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'lines':>7} {'chunks':>7} {'open s':>7} {'full s':>7} "
+          f"{'avg ms':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'program ms':>10}")
+    for n in args.lines:
+        src = generate_program(args.seed, statements=n)
+        lines = src.count("\n") + 1
+
+        t0 = time.perf_counter()
+        doc = Document(src, lexer=args.lexer, parser=args.parser)
+        open_s = time.perf_counter() - t0
+        chunks = sum(1 for _ in doc.chunks())
+
+        full = "-"
+        if args.full:
+            t0 = time.perf_counter()
+            build_ast(build_cst(src, lexer=args.lexer, parser=args.parser), source=src,
+                      source_map=SourceMap(src))
+            full = f"{time.perf_counter() - t0:.1f}"
+
+        rng = random.Random(args.seed)
+        samples = []
+        for _ in range(args.edits):
+            at = rng.randrange(len(src) + 1)
+            t0 = time.perf_counter()
+            doc.edit(at, at, TYPED)
+            samples.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            doc.edit(at, at + len(TYPED), "")
+            samples.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        doc.edit(0, 0, " ")
+        doc.program()
+        program_ms = (time.perf_counter() - t0) * 1000
+
+        ms = [s * 1000 for s in samples]
+        print(f"{lines:>7} {chunks:>7} {open_s:>7.1f} {full:>7} {sum(ms) / len(ms):>7.2f} "
+              f"{percentile(ms, 0.5):>7.2f} {percentile(ms, 0.99):>7.2f} {max(ms):>7.2f} {program_ms:>10.0f}")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
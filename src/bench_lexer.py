@@ -0,0 +1,159 @@
+import argparse
+import random
+import sys
+import time
+from typing import List, Tuple
+
+from antlr4 import Token
+from antlr4.error.ErrorListener import ErrorListener
+
+from fast_lexer import make_lexer
+from yafl_gen import generate_program, random_program
+
+
+# ============================================================
+# FastLexer vs. MainLexer
+#
+#   python bench_lexer.py --check -n 2000    逐 token 比较 (type, channel, text,
+#                                            line, column, start, stop)，以及报出的
+#                                            错误 (line, column, 消息)
+#   python bench_lexer.py [sizes...]         tokens/sec
+#
+# --check 的输入：test 文件、yafl_gen 生成的程序，以及把各种容易出错的
+# 片段（带符号数字、hex / bin float、nan / inf 前缀、"//x"、"=>" / "=="、
+# 多行字符串和注释、没闭合的字符串 ...）随机拼接、时有时无空白的"token 汤"，
+# 再加上 ERROR_CASES。出错的输入同样逐 token 比较：错误恢复跳过的范围
+# 不同，就是接受了不同的程序。
+# ============================================================
+
+FRAGMENTS = [
+    "0", "7", "42", "1_000", "017", "0_7", "1__2", "0x1f", "0X_1", "0x", "0b101", "0b2", "0o17", "0o8",
+    "1u", "1ul", "1lu", "1ll", "1lll", "1U", "-1", "+1", "-0x1f", "+-1",
+    "1.5", "1.", ".5", "-.5", "+1.5e3", "1e5", "1e", "1.5e+3f", "2.0f", "1.l", "0x1.8p1", "0x1p3",
+    "0x1e5", "0x1.f", "0b1.1", "0b1e1", "0o7.1p2", "09.5", "08e1",
+    "nan", "NaN", "nanx", "inf", "-inf", "+Infinity", "infin", "infini", "infinityy",
+    "true", "false", "null", "truex", "nullable",
+    "a", "_x", "x1", "arr!", "!pure", "+", "-", "==", "=", "x=", "a=>b", "==>", "...", ".", "@#$",
+    "é", "变量", "ﷰx",
+    "//", "//x", "// c\n", "/*x*/", "/* multi\nline */", "/*", "*/",
+    '"s"', '"a\\"b"', '"\\n"', "'x'", "'it\\'s'", "`raw\nline`", "``",
+    ":=", "=>", ":", ";", ",", "(", ")", "{", "}", "[", "]",
+    # 没闭合的字符串 / 非法字符
+    '"abc', "'q", '"a\\', '"x\r', "`open", "\x01",
+]
+
+ERROR_CASES = [
+    'a := "abc;',
+    'b := "x\ny";',
+    "c := 'it\\'s\n;",
+    "d := `raw;\n1;",
+    'e := "a\\',
+]
+
+SEPARATORS = ["", "", "", " ", "\t", "\n", "\r\n", "  "]
+
+
+def token_soup(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choice(FRAGMENTS) + rnd.choice(SEPARATORS) for _ in range(n))
+
+
+class _Collector(ErrorListener):
+    def __init__(self):
+        self.errors: List[tuple] = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.errors.append(("error", line, column, msg))
+
+
+def lex(src: str, kind: str) -> Tuple[List[tuple], List[tuple]]:
+    lexer = make_lexer(src, kind)
+    collector = _Collector()
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(collector)
+    out = []
+    while True:
+        t = lexer.nextToken()
+        out.append((t.type, t.channel, t.text, t.line, t.column, t.start, t.stop))
+        if t.type == Token.EOF:
+            return out, collector.errors
+
+
+def check(inputs, out=sys.stdout) -> int:
+    compared = with_errors = failed = 0
+    for label, src in inputs:
+        tokens, errors = lex(src, "antlr")
+        compared += 1
+        if errors:
+            with_errors += 1
+        # 错误接在 token 后面一起比较
+        expected = tokens + errors
+        fast_tokens, fast_errors = lex(src, "fast")
+        actual = fast_tokens + fast_errors
+        if actual == expected:
+            continue
+        failed += 1
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                break
+        else:
+            i = min(len(expected), len(actual))
+        out.write(f"{label}: token {i} differs\n")
+        out.write(f"    MainLexer: {expected[i] if i < len(expected) else None}\n")
+        out.write(f"    FastLexer: {actual[i] if i < len(actual) else None}\n")
+        out.write(f"    input: {src!r}\n")
+    out.write(f"{compared} input(s) compared ({with_errors} with lexer errors), {failed} mismatch(es)\n")
+    return failed
+
+
+def throughput(src: str, kind: str, repeat: int) -> Tuple[int, float]:
+    best = None
+    for _ in range(repeat):
+        lexer = make_lexer(src, kind)
+        t0 = time.perf_counter()
+        n = 0
+        while lexer.nextToken().type != Token.EOF:
+            n += 1
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return n, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast lexer differential check and benchmark")
+    parser.add_argument("sizes", nargs="*", type=int, default=[200, 1000, 4000],
+                        help="Statement counts of generated programs to benchmark")
+    parser.add_argument("--check", action="store_true", help="Compare token streams instead of timing")
+    parser.add_argument("-n", "--count", type=int, default=500, help="Random inputs for --check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", action="append", default=[], help="Also compare this source file (repeatable)")
+    args = parser.parse_args()
+
+    if args.check:
+        rnd = random.Random(args.seed)
+        inputs = []
+        for path in args.file:
+            with open(path, "r", encoding="utf-8") as f:
+                inputs.append((path, f.read()))
+        inputs += [(f"error case {k}", src) for k, src in enumerate(ERROR_CASES)]
+        inputs += [(f"generated {n}", generate_program(args.seed, statements=n)) for n in (10, 100)]
+        inputs += [(f"random {k}", random_program(args.seed + k)) for k in range(args.count // 10)]
+        inputs += [(f"soup {k}", token_soup(rnd, rnd.randrange(1, 40))) for k in range(args.count)]
+        sys.exit(1 if check(inputs) else 0)
+
+    print(f"{'stmts':>6} {'tokens':>8} {'antlr tok/s':>12} {'fast tok/s':>12} {'speedup':>8}")
+    for n in args.sizes:
+        src = generate_program(args.seed, statements=n)
+        # 第一次跑 ANTLR 要建 DFA，先预热
+        throughput(src[:2000], "antlr", 1)
+        tokens, t_antlr = throughput(src, "antlr", args.repeat)
+        _, t_fast = throughput(src, "fast", args.repeat)
+        print(
+            f"{n:>6} {tokens:>8} {tokens / t_antlr:>12.0f} {tokens / t_fast:>12.0f} "
+            f"{t_antlr / t_fast:>7.1f}x"
+        )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from src_to_cst import build_cst
+from cst_to_ast import build_ast
+from ast_to_bdg import build_bdg
+from bdg_to_vg import build_value_graph
+from bench_typing import generate_generic_program
+
+
+# ============================================================
+# 前端内存 benchmark：AST 指向 CST dict vs. SourceSpan（CST 在建完 AST 后释放）
+#
+#   parse    —— build_cst + build_ast 阶段的峰值（两种方式都要先有完整 CST）
+#   retained —— build_ast 之后仍然存活的内存（AST + 它拖住的东西）
+#   backend  —— 之后 BDG / value graph 阶段的峰值
+# ============================================================
+
+def run(src: str, spans: bool):
+    gc.collect()
+    tracemalloc.start()
+
+    cst = build_cst(src)
+    if spans:
+        ast = build_ast(cst, source=src)
+        del cst
+    else:
+        ast = build_ast(cst)
+        del cst
+    gc.collect()
+    retained, parse_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    bdg, block_index, point_index, bindphi_index = build_bdg(ast)
+    build_value_graph(bdg, block_index, point_index, bindphi_index)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return parse_peak, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frontend memory benchmark")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[25, 50, 100],
+        help="Number of generated function groups per run",
+    )
+    args = parser.parse_args()
+
+    print(f"{'n':>5} {'pointer':<8} {'parse':>12} {'retained':>12} {'backend':>12}")
+    for n in args.sizes:
+        src = generate_generic_program(n)
+        for name, spans in (("dict", False), ("span", True)):
+            parse_peak, retained, peak = run(src, spans)
+            print(
+                f"{n:>5} {name:<8} {parse_peak / 1024:>9.0f}KiB "
+                f"{retained / 1024:>9.0f}KiB {peak / 1024:>9.0f}KiB"
+            )
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import sys
+import time
+from typing import Optional
+
+from WarpedTokenStream import WarpedTokenStream
+from fast_lexer import make_lexer
+from rd_parser import ParseFailure, parse_tokens
+from src_to_cst import build_cst, parse_cst_to_dict, parse_tree
+from yafl_gen import generate_program, random_program
+
+
+# ============================================================
+# 递归下降 parser vs. ANTLR MainParser
+#
+#   python bench_parser.py --check --file test.txt   比较两边的 CST dict
+#   python bench_parser.py [sizes...]                parse 时间（含 lexer）
+#
+# --check 的输入：--file 给的文件、CONSTRUCTS 里每种语法结构一条、
+# yafl_gen 的生成程序和随机程序。每条输入分三类计数：
+#   相同      —— 递归下降自己解析成功，CST 与 ANTLR 完全一致
+#   退回      —— 递归下降放弃（ParseFailure），build_cst_rd 会交给 ANTLR
+#   不一致    —— 递归下降成功但 CST 不同，或 ANTLR 报错而它接受了
+# 两边都报错的输入不计入。
+# ============================================================
+
+# test.txt 里出现的每种结构，外加几处需要按分支顺序消歧的写法
+CONSTRUCTS = [
+    "x := 42;",
+    "x := -1.5e3f; y := nan; z := inf; s := \"s\"; t := true; n := null;",
+    "eq(1);",
+    "nums := (1, 2, 3,);",
+    "point := (x: 10, y: 20);",
+    "mixed := (1, a: 2, 3, b: 4);",
+    "empty := ();",
+    "single := (a: 1);",
+    "trailing := (a,,);",
+    "paren := (x);",
+    "id := (v: T) => { v };",
+    "f := x => { x };",
+    "eq := (a: i64, b: i64): i32 => !pure { a; };",
+    "mul := (a: i32, b: i32): i32 => pure inline { a };",
+    "makeAdder := (x: i32): () => { i32 } => { (y: i32): i32 => { x } };",
+    "nihao := (): unit => { nums := (1, 2); };",
+    "r1 := add(1, 2);",
+    "r2 := (makeAdder(10))(32);",
+    "r3 := ((x: i32): i32 => { x })(5);",
+    "r4 := [add, (3, 4)];",
+    "[awa, pwp];",
+    "[add, (1, 2)](3)(4, 5);",
+    "awa:=-100;",
+    "args := *((arg: i32), 5);",
+    "fn := args: i32 => !pure { get!(arg, 0) };",
+    "type := (chrs: ...);",
+    "print := (len: i32, str: type) => !effect { };",
+    "loop!((pass: (i: i32, sum: i32), keepon: bool) => { ((+(i, 1), +(sum, a(i))), <(i, len(a))); }, (0, 0))(sum);",
+    "f := (x):=i32 => { x };",
+    "g := (a: T => { a });",
+    "h := (a: b => { c }, d);",
+    "k := (x): a => { } => { };",
+    "a;; b",
+    "",
+]
+
+
+def rd_cst(src: str, lexer: str = "antlr") -> Optional[dict]:
+    tokens = WarpedTokenStream(make_lexer(src, lexer))
+    tokens.fill()
+    try:
+        return parse_tokens(tokens.tokens)
+    except ParseFailure:
+        return None
+
+
+def antlr_cst(src: str, lexer: str = "antlr") -> Optional[dict]:
+    try:
+        tree, parser = parse_tree(src, lexer)
+    except Exception:
+        return None
+    return parse_cst_to_dict(tree, parser)
+
+
+def check(inputs, out=sys.stdout) -> int:
+    same = fallback = failed = rejected = 0
+    for label, src in inputs:
+        expected = antlr_cst(src)
+        actual = rd_cst(src)
+        if expected is None and actual is None:
+            rejected += 1
+        elif actual is None:
+            fallback += 1
+        elif actual == expected:
+            same += 1
+        else:
+            failed += 1
+            why = "ANTLR rejects it" if expected is None else "CST differs"
+            out.write(f"{label}: {why}\n    input: {src[:400]!r}\n")
+    out.write(
+        f"{same} identical, {fallback} fell back to ANTLR, {failed} mismatch(es), "
+        f"{rejected} rejected by both\n"
+    )
+    return failed
+
+
+def best_time(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recursive-descent parser differential check and benchmark")
+    parser.add_argument("sizes", nargs="*", type=int, default=[200, 1000, 3000],
+                        help="Statement counts of generated programs to benchmark")
+    parser.add_argument("--check", action="store_true", help="Compare CSTs instead of timing")
+    parser.add_argument("-n", "--count", type=int, default=500, help="Random programs for --check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", action="append", default=[], help="Also compare this source file (repeatable)")
+    args = parser.parse_args()
+
+    # ANTLR 的报错走 logger.error，--check 里不需要
+    logging.disable(logging.CRITICAL)
+
+    if args.check:
+        inputs = []
+        for path in args.file:
+            with open(path, "r", encoding="utf-8") as f:
+                inputs.append((path, f.read()))
+        inputs += [(f"construct {k}", src) for k, src in enumerate(CONSTRUCTS)]
+        inputs += [(f"generated {n}", generate_program(args.seed, statements=n)) for n in (10, 100, 500)]
+        inputs += [(f"random {args.seed + k}", random_program(args.seed + k)) for k in range(args.count)]
+        sys.exit(1 if check(inputs) else 0)
+
+    print(f"{'stmts':>6} {'antlr':>9} {'rd':>9} {'rd+fast':>9} {'speedup':>8}")
+    build_cst(generate_program(args.seed, statements=20))
+    for n in args.sizes:
+        src = generate_program(args.seed, statements=n)
+        t_antlr = best_time(lambda: build_cst(src), args.repeat)
+        t_rd = best_time(lambda: build_cst(src, parser="rd"), args.repeat)
+        t_fast = best_time(lambda: build_cst(src, lexer="fast", parser="rd"), args.repeat)
+        print(f"{n:>6} {t_antlr:>8.3f}s {t_rd:>8.3f}s {t_fast:>8.3f}s {t_antlr / t_fast:>7.1f}x")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
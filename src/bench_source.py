@@ -0,0 +1,96 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from yafl_gen import generate_program
+
+
+# ============================================================
+# 读入 vs. mmap 的源码输入（见 source_text）
+#
+#   python bench_source.py [MiB...]     生成对应大小的源文件，在新进程里
+#                                      打开 + 扫完所有 token（取每个 token 的 text），
+#                                      报告耗时和峰值 RSS 相对 import 之后的增量
+#   --unicode                          每段程序前加一行中文注释，走非 ASCII 的分块路径
+#   --lexer fast                       FastLexer（mmap 时会整体解码一次）
+#
+# 生成的程序是同一段 generate_program 输出重复拼接，只用于测输入层。
+# ============================================================
+
+MODES = ["never", "always"]
+
+
+def make_file(path: str, mib: float, unicode: bool, seed: int) -> int:
+    unit = generate_program(seed, statements=500)
+    if unicode:
+        unit = "// 生成的程序：重复拼接，只用于测输入层\n" + unit
+    target = int(mib * (1 << 20))
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        while written < target:
+            f.write(unit)
+            written += len(unit.encode("utf-8"))
+    return written
+
+
+def max_rss_kib() -> int:
+    # Linux 上 ru_maxrss 的单位是 KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(path: str, mode: str, lexer_kind: str) -> None:
+    """子进程：打开并扫完 path，输出 "毫秒 RSS增量KiB token数" """
+    from antlr4 import Token
+    from fast_lexer import make_lexer
+    from source_text import open_source
+    import logging
+    logging.disable(logging.CRITICAL)
+    base = max_rss_kib()
+    t0 = time.perf_counter()
+    src = open_source(path, mode)
+    lexer = make_lexer(src, lexer_kind)
+    n = 0
+    while True:
+        t = lexer.nextToken()
+        if t.type == Token.EOF:
+            break
+        t.text
+        n += 1
+    elapsed = time.perf_counter() - t0
+    print(f"{elapsed * 1000:.0f} {max_rss_kib() - base} {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading vs. memory-mapping source files")
+    parser.add_argument("sizes", nargs="*", type=float, default=[1, 4], help="Source sizes in MiB")
+    parser.add_argument("--unicode", action="store_true", help="Include non-ASCII text")
+    parser.add_argument("--lexer", choices=["antlr", "fast"], default="antlr")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", nargs=3, metavar=("PATH", "MODE", "LEXER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f"{'MiB':>6} {'mode':>7} {'tokens':>9} {'ms':>9} {'RSS +MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.yafl")
+        for mib in args.sizes:
+            size = make_file(path, mib, args.unicode, args.seed)
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", path, mode, args.lexer],
+                    capture_output=True, text=True, check=True,
+                ).stdout.split()
+                ms, rss, tokens = int(out[0]), int(out[1]), int(out[2])
+                print(f"{size / (1 << 20):>6.1f} {mode:>7} {tokens:>9} {ms:>9} {rss / 1024:>9.1f}")
+                sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
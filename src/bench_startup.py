@@ -0,0 +1,133 @@
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# ============================================================
+# 冷启动：import 时间与短文件的端到端时间
+#
+#   python bench_startup.py            每个模块的 import 耗时（python -X importtime）
+#                                      和几种配置下编译一个很短的文件的总时间
+#   python bench_startup.py --check    CI 用：
+#                                        - import pipeline 之后 LAZY 里的模块都还没加载
+#                                        - import pipeline 的中位数耗时不超过 --budget
+#                                      不满足时退出码为 1
+#
+# 测之前先 compileall 一遍，量的是加载 .pyc 而不是编译字节码。
+# 每次都是新进程；取中位数（import）/ 最小值（端到端）。
+# ============================================================
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY = "pipeline"
+
+# 只在对应选项 / 出错时才需要的模块，import pipeline 时不应加载
+LAZY = [
+    "grammar.MainParser",
+    "xml.etree.ElementTree",
+    "json",
+    "logging",
+    "hashlib",
+    "tracemalloc",
+    "concurrent.futures",
+    "wcwidth",
+    "cst_bin",
+    "cst_stream",
+    "vg_serial",
+    "type_infer",
+    "overload",
+    "monomorph",
+]
+
+BUDGET_MS = 200.0
+
+SHORT_PROGRAM = """\
+add := (a: i32, b: i32): i32 => { +(a, b) };
+x := add(1, 2);
+"""
+
+CONFIGS = [
+    ("antlr", []),
+    ("rd", ["--parser", "rd"]),
+    ("rd + fast lexer", ["--parser", "rd", "--lexer", "fast"]),
+]
+
+
+def import_profile() -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """一次 import ENTRY：(总毫秒, 模块 -> (self us, cumulative us))"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY}"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative))
+    return modules[ENTRY][1] / 1000, modules
+
+
+def end_to_end(argv: List[str], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "pipeline.py")] + argv,
+            cwd=HERE, stdout=subprocess.DEVNULL, check=True,
+        )
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the compiler entry point")
+    parser.add_argument("--check", action="store_true", help="Fail if lazy modules load eagerly or imports exceed the budget")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="Import time budget in ms (median)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest modules by self time")
+    args = parser.parse_args()
+
+    compileall.compile_dir(HERE, quiet=1)
+
+    runs = [import_profile() for _ in range(args.repeat)]
+    median = statistics.median(total for total, _ in runs)
+    modules = runs[-1][1]
+    eager = [name for name in LAZY if name in modules]
+
+    print(f"import {ENTRY}: median {median:.1f} ms over {args.repeat} run(s), {len(modules)} modules")
+
+    if args.check:
+        ok = True
+        if eager:
+            ok = False
+            print(f"loaded eagerly: {', '.join(eager)}")
+        if median > args.budget:
+            ok = False
+            print(f"over budget: {median:.1f} ms > {args.budget:.1f} ms")
+        print("ok" if ok else "FAILED")
+        sys.exit(0 if ok else 1)
+
+    print(f"\n{'module':<40} {'self ms':>8} {'cumul ms':>9}")
+    for name, (self_us, cumulative) in sorted(modules.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"{name:<40} {self_us / 1000:>8.1f} {cumulative / 1000:>9.1f}")
+    if eager:
+        print(f"\nloaded eagerly: {', '.join(eager)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "short.yafl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(SHORT_PROGRAM)
+        print(f"\n{'short file, end to end':<24} {'best ms':>8}")
+        for label, extra in CONFIGS:
+            print(f"{label:<24} {end_to_end([path] + extra, args.repeat):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from src_to_cst import build_cst
+from cst_to_ast import build_ast
+from ast_to_bdg import build_bdg
+from bdg_to_vg import build_value_graph
+from vg_prune import prune_value_graph
+from profiler import PhaseProfiler, cst_sizes
+from yafl_gen import DEFAULTS, generate_program
+
+
+# ============================================================
+# 前端 benchmark 套件
+#
+# 对 yafl_gen 的每个维度单独做规模扫描（其余维度取默认值），
+# 记录各阶段 (cst / ast / bdg / vg / prune) 的耗时，结果写成 JSON：
+#   python bench_suite.py --out before.json
+#   python bench_suite.py --out after.json --compare before.json
+#
+# 每个 (维度, 阶段) 用 log(t) ~ log(x) 的最小二乘斜率估计增长阶，
+# 斜率明显大于 1 说明该阶段随这个维度超线性增长。
+# ============================================================
+
+SWEEPS: Dict[str, List[float]] = {
+    "statements": [50, 100, 200, 400],
+    "depth": [1, 2, 4, 8],
+    "reuse": [0.0, 0.5, 0.9],
+    "string_len": [8, 32, 128, 512],
+    "list_width": [2, 8, 32, 128],
+    "curry": [1, 4, 16, 64],
+}
+
+QUICK_SWEEPS: Dict[str, List[float]] = {
+    "statements": [25, 50, 100],
+    "depth": [1, 4],
+    "reuse": [0.0, 0.9],
+    "string_len": [8, 128],
+    "list_width": [2, 32],
+    "curry": [1, 16],
+}
+
+PHASES = ["cst", "ast", "bdg", "vg", "prune"]
+
+# 不是"规模"的维度不算斜率
+_NOT_SIZE = {"reuse"}
+
+SUPERLINEAR = 1.3
+REGRESSION = 1.2
+
+
+def run_phases(src: str, jobs: int = 1) -> dict:
+    prof = PhaseProfiler(memory=False)
+    with prof.phase("cst"):
+        cst = build_cst(src)
+    prof.sizes(**cst_sizes(cst))
+    with prof.phase("ast"):
+        ast = build_ast(cst, source=src)
+        del cst
+    with prof.phase("bdg"):
+        bdg, block_index, point_index, bindphi_index = build_bdg(ast, jobs=jobs)
+    prof.sizes(blocks=len(block_index), points=len(point_index), bindphis=len(bindphi_index))
+    with prof.phase("vg"):
+        vg = build_value_graph(bdg, block_index, point_index, bindphi_index)
+    prof.sizes(values=len(vg.values), phis=len(vg.phis), edges=len(vg.edges))
+    with prof.phase("prune"):
+        prune_value_graph(vg, block_index)
+    prof.sizes(live_values=len(vg.values), live_phis=len(vg.phis), live_edges=len(vg.edges))
+
+    sizes = {}
+    for p in prof.phases:
+        sizes.update(p.sizes)
+    return {
+        "phases": {p.name: {"wall_s": p.wall, "cpu_s": p.cpu} for p in prof.phases},
+        "sizes": sizes,
+    }
+
+
+def best_of(src: str, repeat: int, jobs: int = 1) -> dict:
+    """每个阶段取 repeat 次里最短的墙钟时间"""
+    best = None
+    for _ in range(repeat):
+        r = run_phases(src, jobs)
+        if best is None:
+            best = r
+            continue
+        for name, t in r["phases"].items():
+            if t["wall_s"] < best["phases"][name]["wall_s"]:
+                best["phases"][name] = t
+    return best
+
+
+# ============================================================
+# 斜率 / 对比
+# ============================================================
+
+def loglog_slope(xs: List[float], ys: List[float]) -> Optional[float]:
+    pts = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(pts) < 2:
+        return None
+    mx = sum(p[0] for p in pts) / len(pts)
+    my = sum(p[1] for p in pts) / len(pts)
+    sxx = sum((p[0] - mx) ** 2 for p in pts)
+    if sxx == 0:
+        return None
+    return sum((p[0] - mx) * (p[1] - my) for p in pts) / sxx
+
+
+def slopes(runs: List[dict]) -> Dict[str, Dict[str, Optional[float]]]:
+    out: Dict[str, Dict[str, Optional[float]]] = {}
+    for dim in dict.fromkeys(r["dimension"] for r in runs):
+        if dim in _NOT_SIZE:
+            continue
+        rs = [r for r in runs if r["dimension"] == dim]
+        xs = [r["value"] for r in rs]
+        out[dim] = {
+            phase: loglog_slope(xs, [r["phases"][phase]["wall_s"] for r in rs])
+            for phase in PHASES
+        }
+    return out
+
+
+def compare(new: dict, old: dict, out=sys.stdout):
+    old_runs = {(r["dimension"], r["value"]): r for r in old["runs"]}
+    out.write(f"compare against {old['meta'].get('commit')} ({old['meta'].get('timestamp')})\n")
+    out.write(f"{'dimension':<12} {'value':>7} " + " ".join(f"{p:>8}" for p in PHASES) + "\n")
+    regressions = 0
+    for r in new["runs"]:
+        base = old_runs.get((r["dimension"], r["value"]))
+        if base is None:
+            continue
+        cells = []
+        for phase in PHASES:
+            a = base["phases"].get(phase, {}).get("wall_s")
+            b = r["phases"].get(phase, {}).get("wall_s")
+            if not a or b is None:
+                cells.append(f"{'-':>8}")
+                continue
+            ratio = b / a
+            mark = "!" if ratio > REGRESSION else " "
+            regressions += ratio > REGRESSION
+            cells.append(f"{ratio:>7.2f}{mark}")
+        out.write(f"{r['dimension']:<12} {r['value']:>7g} " + " ".join(cells) + "\n")
+    out.write(f"{regressions} phase timing(s) slower than {REGRESSION}x\n")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================================================
+# main
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Frontend scaling benchmark suite")
+    parser.add_argument("--out", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON produced by an earlier --out")
+    parser.add_argument(
+        "--dimension",
+        action="append",
+        choices=list(SWEEPS),
+        help="Only sweep these dimensions (repeatable)",
+    )
+    parser.add_argument("--quick", action="store_true", help="Smaller sweeps")
+    parser.add_argument("--repeat", type=int, default=1, help="Best-of-N per point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Processes for BDG identifier resolution")
+    args = parser.parse_args()
+
+    sweeps = QUICK_SWEEPS if args.quick else SWEEPS
+    dims = args.dimension or list(sweeps)
+
+    # ANTLR 第一次解析要建 DFA，先预热一次，不然第一个点的 cst 会被严重高估
+    run_phases(generate_program(args.seed, statements=10))
+
+    runs = []
+    print(f"{'dimension':<12} {'value':>7} " + " ".join(f"{p:>9}" for p in PHASES) + f" {'values':>8}")
+    for dim in dims:
+        for value in sweeps[dim]:
+            params = {dim: value}
+            src = generate_program(args.seed, **params)
+            r = best_of(src, max(1, args.repeat), args.jobs)
+            r.update(dimension=dim, value=value, params=dict(DEFAULTS, **params), bytes=len(src))
+            runs.append(r)
+            print(
+                f"{dim:<12} {value:>7g} "
+                + " ".join(f"{r['phases'][p]['wall_s'] * 1e3:>7.1f}ms" for p in PHASES)
+                + f" {r['sizes'].get('values', 0):>8}"
+            )
+            sys.stdout.flush()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+        },
+        "runs": runs,
+        "slopes": slopes(runs),
+    }
+
+    print("\nscaling exponent (log-log slope of wall time)")
+    print(f"{'dimension':<12} " + " ".join(f"{p:>8}" for p in PHASES))
+    for dim, per_phase in result["slopes"].items():
+        cells = []
+        for phase in PHASES:
+            k = per_phase[phase]
+            if k is None:
+                cells.append(f"{'-':>8}")
+            else:
+                cells.append(f"{k:>7.2f}{'*' if k > SUPERLINEAR else ' '}")
+        print(f"{dim:<12} " + " ".join(cells))
+    print(f"(* = super-linear, slope > {SUPERLINEAR})")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print()
+        compare(result, old)
+
+
+if __name__ == "__main__":
+    main()
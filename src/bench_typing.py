@@ -0,0 +1,294 @@
+import argparse
+import sys
+import time
+
+from src_to_cst import build_cst
+from cst_to_ast import build_ast
+from ast_to_bdg import build_bdg
+from bdg_to_vg import build_value_graph
+from type_table import TypeTable
+from type_infer import infer_types
+from overload import OverloadIndex
+from monomorph import monomorphize
+
+
+# ============================================================
+# 类型推导 benchmark：生成大量泛型函数 + 类型构造 + 调用点
+# ============================================================
+
+def generate_generic_program(n: int, arity: int = 4) -> str:
+    """
+    n 组（E 是 0, 1, ..., arity - 1）：
+        vecK  := arr!(i32, K % 8 + 1);
+        pairK := join!((a: vecK), (b: arr!(f64, ...)));
+        idK   := (v: T, w: pairK, x: arr!(i32, ...)): T => { v };
+        rK    := idK(1, (E), (E));
+        sK    := sizeof!(vecK);
+        eK    := eq!(vecK, vec((K + 8) % n));
+    相同的类型构造在不同组之间反复出现，用来观察 hash-consing 的效果。
+    """
+    out = []
+    for k in range(n):
+        out.append(f"vec{k} := arr!(i32, {k % 8 + 1});")
+        out.append(f"pair{k} := join!((a: vec{k}), (b: arr!(f64, ...)));")
+        out.append(
+            f"id{k} := (v: T, w: pair{k}, x: arr!(i32, ...)): T => {{ v }};"
+        )
+        elems = ", ".join(str(i) for i in range(arity))
+        out.append(f"r{k} := id{k}(1, ({elems}), ({elems}));")
+        out.append(f"s{k} := sizeof!(vec{k});")
+        out.append(f"e{k} := eq!(vec{k}, vec{(k + 8) % n});")
+    return "\n".join(out) + "\n"
+
+
+def generate_overload_program(k: int, calls: int) -> str:
+    """
+    k 个同名重载 f，参数个数 1..k，再用 calls 个调用点轮流命中它们。
+    用来观察重载集合变大时单次分派的代价。
+    """
+    out = []
+    for i in range(1, k + 1):
+        params = ", ".join(f"p{j}: i32" for j in range(i))
+        if i == 1:
+            params += ","
+        out.append(f"f := ({params}): i32 => {{ p0 }};")
+    for c in range(calls):
+        n = c % k + 1
+        args = ", ".join(str(j) for j in range(n))
+        if n == 1:
+            args += ","
+        out.append(f"c{c} := f({args});")
+    return "\n".join(out) + "\n"
+
+
+def generate_mono_program(calls: int, distinct: int) -> str:
+    """
+    一个泛型函数 g，calls 个调用点，实参只有 distinct 种不同的 (T, 长度) 组合。
+    实例数应当等于 distinct，与调用点个数无关。
+    """
+    literals = ["1", "1u", "1l", "1ul", "1.0", "1.0f", "true"]
+    out = ["g := (v: T, a: arr!(i32, ...)) => { w := v; (w, a) };"]
+    for c in range(calls):
+        d = c % distinct
+        lit = literals[d % len(literals)]
+        elems = ", ".join("0" for _ in range(d // len(literals) + 1))
+        if d // len(literals) == 0:
+            elems += ","
+        out.append(f"c{c} := g({lit}, ({elems}));")
+    return "\n".join(out) + "\n"
+
+
+def build_graph(src: str):
+    ast = build_ast(build_cst(src))
+    bdg, block_index, point_index, bindphi_index = build_bdg(ast)
+    return build_value_graph(bdg, block_index, point_index, bindphi_index)
+
+
+class TimedOverloadIndex(OverloadIndex):
+    """只累计 select 本身的耗时，不含实参 / 候选的类型推导"""
+    def __init__(self):
+        super().__init__()
+        self.elapsed = 0.0
+
+    def select(self, inference, edge, phi, arg_tid):
+        # 候选类型先推出来，避免把递归推导算进分派时间
+        for values in phi.candidates.values():
+            for v in values:
+                inference.info(v)
+        t0 = time.perf_counter()
+        res = super().select(inference, edge, phi, arg_tid)
+        self.elapsed += time.perf_counter() - t0
+        return res
+
+
+def run_overloads(k: int, calls: int):
+    vg = build_graph(generate_overload_program(k, calls))
+    index = TimedOverloadIndex()
+    inference = infer_types(vg, resolver=index)
+    return {
+        "k": k,
+        "calls": calls,
+        "dispatch_s": index.elapsed,
+        "errors": len(inference.errors),
+        "index": str(index),
+    }
+
+
+# (源码, 期望的类型错误)：带 key 的实参要按字段名挑重载，不能只看位置签名
+OVERLOAD_CASES = [
+    ("f := (a: i32): i32 => { a };\nf := (b: i32): i32 => { b };\nx := f(a: 1);\n",
+     []),
+    ("f := (a: i32): i32 => { a };\nf := (b: i32): i32 => { b };\nx := f(1,);\n",
+     ["ambiguous call: 2 overloads with parameters (i32, ) for `f`"]),
+    ("f := (a: i32): i32 => { a };\nf := (a: f64): f64 => { a };\nx := f(b: 1);\n",
+     ["no overload matches (b: i32) for `f`"]),
+    ("f := (a: i32): i32 => { a };\nf := (a: f64): f64 => { a };\nx := f(a: 1);\n",
+     []),
+]
+
+
+def check_overloads() -> int:
+    """逐个跑 OVERLOAD_CASES，返回不符合预期的个数"""
+    bad = 0
+    for k, (src, expected) in enumerate(OVERLOAD_CASES):
+        inference = infer_types(build_graph(src), resolver=OverloadIndex())
+        got = [msg for _, msg in inference.errors]
+        if got != expected:
+            bad += 1
+            print(f"overload case {k}: expected {expected}, got {got}")
+    return bad
+
+
+# 实例的函数体要在类型实参下推导：body 的类型应等于实例化后的返回类型
+MONO_CHECK = "id := (v: T): T => { w := v; w };\na := id(1,);\nb := id(1.0,);\nc := id(true,);\n"
+
+
+def check_mono() -> int:
+    """返回函数体类型与实例签名不一致的实例个数"""
+    vg = build_graph(MONO_CHECK)
+    inference = infer_types(vg)
+    mono = monomorphize(vg, inference)
+    t = inference.table
+    bad = 0
+    for inst in mono.instances.values():
+        body = inference.phi_values(inst.value.in_edge.inputs[-1])[0]
+        got = inference.type_of(body)
+        if got != inst.ret:
+            bad += 1
+            print(f"instance v{inst.value.id}: body {t.render(got)}, expected {t.render(inst.ret)}")
+    if len(mono.instances) != 3:
+        bad += 1
+        print(f"expected 3 instances, got {len(mono.instances)}")
+    return bad
+
+
+def run_mono(calls: int, distinct: int):
+    vg = build_graph(generate_mono_program(calls, distinct))
+    inference = infer_types(vg)
+    t0 = time.perf_counter()
+    mono = monomorphize(vg, inference)
+    elapsed = time.perf_counter() - t0
+    return {
+        "calls": calls,
+        "distinct": distinct,
+        "mono_s": elapsed,
+        "stats": mono.stats,
+    }
+
+
+def run_once(n: int):
+    src = generate_generic_program(n)
+
+    t0 = time.perf_counter()
+    vg = build_graph(src)
+    t1 = time.perf_counter()
+
+    table = TypeTable()
+    inference = infer_types(vg, table)
+    t2 = time.perf_counter()
+
+    lookups = 0
+    t3 = time.perf_counter()
+    for a in range(len(table)):
+        table.eq(a, a)
+        table.has(a, 0)
+        table.sizeof(a)
+        lookups += 3
+    t4 = time.perf_counter()
+
+    return {
+        "n": n,
+        "values": len(vg.values),
+        "types": len(table),
+        "memo_hits": table.memo_hits,
+        "memo_misses": table.memo_misses,
+        "errors": len(inference.errors),
+        "frontend_s": t1 - t0,
+        "infer_s": t2 - t1,
+        "lookup_ns": (t4 - t3) / max(1, lookups) * 1e9,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Type inference benchmark")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[25, 50, 100, 200],
+        help="Number of generic function groups per run",
+    )
+    parser.add_argument(
+        "--overloads",
+        type=int,
+        nargs="*",
+        default=None,
+        help="Instead measure dispatch over overload sets of these sizes",
+    )
+    parser.add_argument(
+        "--calls",
+        type=int,
+        default=400,
+        help="Call sites per overload-set run",
+    )
+    parser.add_argument(
+        "--mono",
+        type=int,
+        nargs="*",
+        default=None,
+        help="Instead measure monomorphization with this many distinct instantiations",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check overload selection on keyed arguments and instance bodies",
+    )
+    args = parser.parse_args()
+
+    if args.check:
+        bad = check_overloads() + check_mono()
+        print("ok" if not bad else f"{bad} check(s) failed")
+        sys.exit(1 if bad else 0)
+
+    if args.mono is not None:
+        for d in args.mono or [1, 4, 16, 64]:
+            r = run_mono(args.calls, d)
+            st = r["stats"]
+            print(
+                f"distinct={r['distinct']:<4} calls={r['calls']:<5} "
+                f"instances {st.instantiations:<4} hit {st.hit_rate:6.1%}  "
+                f"cloned values {st.values_cloned:<6} "
+                f"{r['mono_s'] * 1e3:7.2f}ms"
+            )
+            sys.stdout.flush()
+        return
+
+    if args.overloads is not None:
+        for k in args.overloads or [2, 8, 32, 128]:
+            r = run_overloads(k, args.calls)
+            print(
+                f"k={r['k']:<4} calls={r['calls']:<5} "
+                f"dispatch {r['dispatch_s'] / r['calls'] * 1e6:6.1f}us/call  "
+                f"{r['index']}"
+            )
+            sys.stdout.flush()
+        return
+
+    print(
+        f"{'n':>6} {'values':>8} {'types':>6} {'memo hit':>9} "
+        f"{'frontend':>10} {'infer':>10} {'us/value':>9} {'lookup':>9}"
+    )
+    for n in args.sizes:
+        r = run_once(n)
+        total = r["memo_hits"] + r["memo_misses"]
+        hit = r["memo_hits"] / total if total else 0.0
+        print(
+            f"{r['n']:>6} {r['values']:>8} {r['types']:>6} {hit:>8.1%} "
+            f"{r['frontend_s']:>9.3f}s {r['infer_s']:>9.3f}s "
+            f"{r['infer_s'] / r['values'] * 1e6:>9.2f} {r['lookup_ns']:>7.0f}ns"
+        )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from typing import List, Optional
+
+from ast_types import BlockInfo
+
+# ============================================================
+# BlockInfo 树上的常数时间祖先 / LCA 查询
+#
+# build_bdg Phase 1 建好 block 树后调用 number_blocks，给每个 block 一个
+# 前序区间 [pre, post]（post = 子树里最大的 pre）。之后：
+#
+#   a.is_ancestor_of(b)  —— 区间包含，O(1)，不用沿 parent 往上走
+#   BlockTree(block_index).lca(a, b)
+#                        —— 最近公共祖先，O(1)；按需构建，O(n log n)
+#
+# LCA 用前序序列上的 RMQ：对 pre[u] < pre[v]，前序区间 (pre[u], pre[v]]
+# 里父节点最浅的那个 block，它的父节点就是 lca(u, v)（u 是 v 的祖先时
+# 即 u 本身）。稀疏表的元素编码成 parent.depth * n + parent.pre，
+# 直接比 int 取 min。
+# ============================================================
+
+
+def number_blocks(root: BlockInfo) -> int:
+    """按 children 顺序前序编号，填 pre / post；返回 block 数"""
+    counter = 0
+    stack = [(root, False)]
+    while stack:
+        bi, done = stack.pop()
+        if done:
+            bi.post = counter - 1
+            continue
+        bi.pre = counter
+        counter += 1
+        stack.append((bi, True))
+        for child in reversed(bi.children):
+            stack.append((child, False))
+    return counter
+
+
+class BlockTree:
+    """建好之后只读；block 树改变（重新 build_bdg）后要重建"""
+
+    def __init__(self, block_index: List[BlockInfo]):
+        n = len(block_index)
+        self.order: List[Optional[BlockInfo]] = [None] * n
+        for bi in block_index:
+            assert 0 <= bi.pre < n, "number_blocks has not been run"
+            self.order[bi.pre] = bi
+
+        # base[i]：前序第 i 个 block 的父节点编码；根没有父节点，永远不会被查到
+        base = [0] * n
+        for i in range(1, n):
+            parent = self.order[i].parent
+            base[i] = parent.depth * n + parent.pre
+        self.n = n
+        self.table = [base]
+        span = 1
+        while span * 2 <= n:
+            prev = self.table[-1]
+            self.table.append([min(prev[i], prev[i + span]) for i in range(n - span * 2 + 1)])
+            span *= 2
+
+    def is_ancestor(self, a: BlockInfo, b: BlockInfo) -> bool:
+        return a.is_ancestor_of(b)
+
+    def lca(self, a: BlockInfo, b: BlockInfo) -> BlockInfo:
+        if a.is_ancestor_of(b):
+            return a
+        if b.is_ancestor_of(a):
+            return b
+        lo, hi = (a.pre, b.pre) if a.pre < b.pre else (b.pre, a.pre)
+        lo += 1
+        k = (hi - lo + 1).bit_length() - 1
+        row = self.table[k]
+        x = row[lo]
+        y = row[hi - (1 << k) + 1]
+        return self.order[(x if x < y else y) % self.n]
+
+    def common_depth(self, a: BlockInfo, b: BlockInfo) -> int:
+        """两个 block 共同可见的最深一层作用域"""
+        return self.lca(a, b).depth
+
+    def distance(self, a: BlockInfo, b: BlockInfo) -> int:
+        """树上 a 到 b 的边数"""
+        return a.depth + b.depth - 2 * self.lca(a, b).depth
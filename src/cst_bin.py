@@ -0,0 +1,334 @@
+from __future__ import annotations
+import struct
+from typing import BinaryIO, Dict, List, Optional, Sequence
+
+# ============================================================
+# 二进制 CST 格式（.cstb）
+#
+#   header  magic "YCST" | u16 version | vocab(rule 名) | vocab(token 名)
+#   body    先序遍历的节点流，每个节点一条记录：
+#     rule   tag=0 | rule 下标 | start line Δ | start col | end line Δ | end col | 子节点数
+#     token  tag=1 | text | token 名下标 | zigzag(type id) | channel | line Δ | col
+#
+# - 所有整数都是 LEB128 varint
+# - 行号存相对上一个行号的 zigzag 差值，列号 +1（0 表示 None），
+#   绝大多数位置因此只占 1 字节
+# - token 文本内联去重：首次出现写 (0, len, utf-8)，之后写 (下标 + 1)
+# - rule / token 名取自 header 里的词表，解码不依赖 grammar
+#
+# 写读都是流式的：写端边遍历边输出，读端按块从文件读取，
+# 结果与 parse_cst_to_dict 的 dict 完全一致。
+# ============================================================
+
+MAGIC = b"YCST"
+VERSION = 1
+
+_TAG_RULE = 0
+_TAG_TOKEN = 1
+
+_CHUNK = 1 << 16
+
+
+class CstFormatError(Exception):
+    pass
+
+
+# ============================================================
+# write
+# ============================================================
+
+class _Out:
+    """按块刷出的输出缓冲"""
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.buf = bytearray()
+
+    def u(self, n: int):
+        buf = self.buf
+        while n >= 0x80:
+            buf.append((n & 0x7F) | 0x80)
+            n >>= 7
+        buf.append(n)
+
+    def raw(self, data: bytes):
+        self.buf += data
+
+    def maybe_flush(self):
+        if len(self.buf) >= _CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self.f.write(self.buf)
+            self.buf = bytearray()
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _opt(n: Optional[int]) -> int:
+    return 0 if n is None else n + 1
+
+
+def write_cst_bin(
+    cst: dict,
+    f: BinaryIO,
+    rule_names: Sequence[str],
+    token_names: Sequence[str],
+):
+    out = _Out(f)
+    out.raw(struct.pack("<4sH", MAGIC, VERSION))
+    for vocab in (rule_names, token_names):
+        out.u(len(vocab))
+        for name in vocab:
+            data = name.encode("utf-8")
+            out.u(len(data))
+            out.raw(data)
+
+    rule_ids = {name: i for i, name in enumerate(rule_names)}
+    token_ids = {name: i for i, name in enumerate(token_names)}
+    texts: Dict[str, int] = {}
+    last_line = 0
+
+    def line_delta(line: Optional[int]) -> int:
+        # None 编码为 0，其余为 zigzag(Δ) + 1
+        nonlocal last_line
+        if line is None:
+            return 0
+        d = _zigzag(line - last_line) + 1
+        last_line = line
+        return d
+
+    stack = [cst]
+    while stack:
+        node = stack.pop()
+        if node["node-type"] == "rule":
+            rule = rule_ids.get(node["rule"])
+            if rule is None:
+                raise CstFormatError(f"rule `{node['rule']}` is not in the vocabulary")
+            out.u(_TAG_RULE)
+            out.u(rule)
+            out.u(line_delta(node["start"]["line"]))
+            out.u(_opt(node["start"]["column"]))
+            out.u(line_delta(node["end"]["line"]))
+            out.u(_opt(node["end"]["column"]))
+            children = node["children"]
+            out.u(len(children))
+            stack.extend(reversed(children))
+
+        elif node["node-type"] == "token":
+            ttype = token_ids.get(node["token-type"])
+            if ttype is None:
+                raise CstFormatError(f"token type `{node['token-type']}` is not in the vocabulary")
+            out.u(_TAG_TOKEN)
+            text = node["text"]
+            idx = texts.get(text)
+            if idx is not None:
+                out.u(idx + 1)
+            else:
+                data = (text or "").encode("utf-8")
+                out.u(0)
+                # text 可能是 None：长度写 0，标记位区分空串
+                out.u(1 if text is None else 0)
+                out.u(len(data))
+                out.raw(data)
+                texts[text] = len(texts)
+            out.u(ttype)
+            out.u(_zigzag(node["token-type-id"]))
+            out.u(node["channel"])
+            out.u(line_delta(node["line"]))
+            out.u(_opt(node["column"]))
+
+        else:
+            raise CstFormatError(f"Unknown node-type: {node['node-type']}")
+
+        out.maybe_flush()
+
+    out.flush()
+
+
+# ============================================================
+# read
+# ============================================================
+
+# 一条记录里除 token 文本外最多十来个 varint，保证缓冲里至少留这么多字节，
+# 主循环里就不必在每个 varint 上检查边界
+_SLACK = 256
+
+
+class _In:
+    """按块读取的输入"""
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.buf = b""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, need: int):
+        """保证 pos 之后至少有 need 字节（到文件尾为止）"""
+        if len(self.buf) - self.pos >= need or self.eof:
+            return
+        parts = [self.buf[self.pos:]]
+        have = len(parts[0])
+        while have < need:
+            chunk = self.f.read(max(_CHUNK, need - have))
+            if not chunk:
+                self.eof = True
+                break
+            parts.append(chunk)
+            have += len(chunk)
+        self.buf = b"".join(parts)
+        self.pos = 0
+
+    def u(self) -> int:
+        self.fill(10)
+        n, self.pos = _varint(self.buf, self.pos)
+        return n
+
+    def raw(self, n: int) -> bytes:
+        self.fill(n)
+        if len(self.buf) - self.pos < n:
+            raise CstFormatError("unexpected end of CST stream")
+        data = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+
+def _varint(buf: bytes, pos: int):
+    n = 0
+    shift = 0
+    while True:
+        try:
+            b = buf[pos]
+        except IndexError:
+            raise CstFormatError("unexpected end of CST stream") from None
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def read_cst_bin(f: BinaryIO) -> dict:
+    inp = _In(f)
+    magic, version = struct.unpack("<4sH", inp.raw(6))
+    if magic != MAGIC:
+        raise CstFormatError("not a binary CST stream")
+    if version != VERSION:
+        raise CstFormatError(f"unsupported binary CST version {version}")
+
+    vocabs: List[List[str]] = []
+    for _ in range(2):
+        vocabs.append([inp.raw(inp.u()).decode("utf-8") for _ in range(inp.u())])
+    rule_names, token_names = vocabs
+
+    texts: List[Optional[str]] = []
+    last_line = 0
+
+    root = None
+    # [children 列表, 还差几个子节点]
+    stack: List[list] = []
+
+    # 主循环直接在 bytes 上解码；单字节 varint（绝大多数）走快路径
+    while True:
+        inp.fill(_SLACK)
+        buf = inp.buf
+        pos = inp.pos
+
+        vals = []
+        tag = buf[pos]
+        pos += 1
+        # rule: rule, sl, sc, el, ec, n  /  token: ref（之后视情况读文本）
+        count = 6 if tag == _TAG_RULE else 1
+        for _ in range(count):
+            b = buf[pos]
+            if b < 0x80:
+                pos += 1
+                vals.append(b)
+            else:
+                v, pos = _varint(buf, pos)
+                vals.append(v)
+
+        if tag == _TAG_RULE:
+            rule, sl, sc, el, ec, n = vals
+            if sl:
+                last_line += _unzigzag(sl - 1)
+                sl = last_line
+            else:
+                sl = None
+            if el:
+                last_line += _unzigzag(el - 1)
+                el = last_line
+            else:
+                el = None
+            node = {
+                "node-type": "rule",
+                "rule": rule_names[rule],
+                "start": {"line": sl, "column": sc - 1 if sc else None},
+                "end": {"line": el, "column": ec - 1 if ec else None},
+                "children": [],
+            }
+            inp.pos = pos
+
+        elif tag == _TAG_TOKEN:
+            ref = vals[0]
+            if ref:
+                text = texts[ref - 1]
+            else:
+                inp.pos = pos
+                is_none = inp.u()
+                data = inp.raw(inp.u())
+                text = None if is_none else data.decode("utf-8")
+                texts.append(text)
+                inp.fill(_SLACK)
+                buf = inp.buf
+                pos = inp.pos
+            vals = []
+            for _ in range(5):
+                b = buf[pos]
+                if b < 0x80:
+                    pos += 1
+                    vals.append(b)
+                else:
+                    v, pos = _varint(buf, pos)
+                    vals.append(v)
+            inp.pos = pos
+            ttype, tid, channel, ln, col = vals
+            ttype = token_names[ttype]
+            tid = _unzigzag(tid)
+            if ln:
+                last_line += _unzigzag(ln - 1)
+                ln = last_line
+            else:
+                ln = None
+            n = 0
+            node = {
+                "node-type": "token",
+                "text": text,
+                "token-type": ttype,
+                "token-type-id": tid,
+                "channel": channel,
+                "line": ln,
+                "column": col - 1 if col else None,
+            }
+
+        else:
+            raise CstFormatError(f"bad CST record tag {tag}")
+
+        if stack:
+            top = stack[-1]
+            top[0].append(node)
+            top[1] -= 1
+        else:
+            root = node
+        if n:
+            stack.append([node["children"], n])
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+        if not stack:
+            return root
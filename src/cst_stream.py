@@ -0,0 +1,286 @@
+from __future__ import annotations
+import json
+from typing import Iterator, Optional, TextIO
+
+# ============================================================
+# 流式 CST 输出（XML / JSON）
+#
+# 不建 ElementTree，也不要求 CST 先转成 dict：直接遍历
+# parse_cst_to_dict 的 dict，或者 ANTLR 的 parse tree（需传 parser），
+# 边走边生成文本，按块 yield。
+# 遍历用显式栈，内存只和树深有关。
+#
+# 输出与现有路径逐字节一致：
+#   XML  —— ET.tostring(indent_xml(cst_dict_to_xml(cst)), encoding="unicode")
+#   JSON —— json.dumps(cst, indent=indent)
+# ============================================================
+
+CHUNK_SIZE = 1 << 16
+
+_END = object()
+
+
+# ============================================================
+# 节点适配：dict 与 ANTLR tree 统一成同一组字段
+# ============================================================
+
+def _rule_fields(node, parser):
+    """(rule 名, start line, start col, end line, end col, 子节点数, 子节点迭代器)"""
+    if isinstance(node, dict):
+        children = node["children"]
+        return (
+            node["rule"],
+            node["start"]["line"], node["start"]["column"],
+            node["end"]["line"], node["end"]["column"],
+            len(children), iter(children),
+        )
+    start, stop = node.start, node.stop
+    return (
+        parser.ruleNames[node.getRuleIndex()],
+        start.line if start else None, start.column if start else None,
+        stop.line if stop else None, stop.column if stop else None,
+        node.getChildCount(), iter(node.getChildren()),
+    )
+
+
+def _token_fields(node, parser):
+    """(text, token 名, token id, channel, line, column)"""
+    if isinstance(node, dict):
+        return (
+            node["text"], node["token-type"], node["token-type-id"],
+            node["channel"], node["line"], node["column"],
+        )
+    sym = node.getSymbol()
+    return (
+        sym.text, parser.symbolicNames[sym.type], sym.type,
+        sym.channel, sym.line, sym.column,
+    )
+
+
+def _is_rule(node) -> bool:
+    if isinstance(node, dict):
+        node_type = node["node-type"]
+        if node_type not in ("rule", "token"):
+            raise ValueError(f"Unknown node-type: {node_type}")
+        return node_type == "rule"
+    # ANTLR：ParserRuleContext 有 getRuleIndex，TerminalNode 没有
+    return hasattr(node, "getRuleIndex")
+
+
+# ============================================================
+# XML
+# ============================================================
+
+def _escape_attr(s: str) -> str:
+    # 与 ElementTree 的属性转义一致
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    if '"' in s:
+        s = s.replace('"', "&quot;")
+    if "\r" in s:
+        s = s.replace("\r", "&#13;")
+    if "\n" in s:
+        s = s.replace("\n", "&#10;")
+    if "\t" in s:
+        s = s.replace("\t", "&#09;")
+    return s
+
+
+def _xml_rule_open(f) -> str:
+    name, sl, sc, el, ec = f[:5]
+    return (
+        f'<node name="{_escape_attr(name)}"'
+        f' start-line="{sl or "0"}" start-column="{sc or "0"}"'
+        f' end-line="{el or "0"}" end-column="{ec or "0"}"'
+    )
+
+
+def _xml_token(f) -> str:
+    text, ttype, tid, channel, line, col = f
+    return (
+        f'<token text="{_escape_attr(text or "")}"'
+        f' token-type="{_escape_attr(ttype)}" token-type-id="{tid}"'
+        f' channel="{channel}" line="{line}" column="{col}" />'
+    )
+
+
+def iter_cst_xml(
+    root,
+    parser=None,
+    indent: int = 2,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    parts = []
+    size = 0
+    # level -> 换行 + 缩进
+    pads = ["\n"]
+
+    def pad(level: int) -> str:
+        while len(pads) <= level:
+            pads.append("\n" + " " * (indent * len(pads)))
+        return pads[level]
+
+    stack = []
+
+    if _is_rule(root):
+        f = _rule_fields(root, parser)
+        if f[5]:
+            parts.append(_xml_rule_open(f) + ">")
+            stack.append((f[6], 0))
+        else:
+            parts.append(_xml_rule_open(f) + " />")
+    else:
+        parts.append(_xml_token(_token_fields(root, parser)))
+
+    while stack:
+        it, level = stack[-1]
+        child = next(it, _END)
+        if child is _END:
+            stack.pop()
+            s = pad(level) + "</node>"
+        elif _is_rule(child):
+            f = _rule_fields(child, parser)
+            if f[5]:
+                s = pad(level + 1) + _xml_rule_open(f) + ">"
+                stack.append((f[6], level + 1))
+            else:
+                s = pad(level + 1) + _xml_rule_open(f) + " />"
+        else:
+            s = pad(level + 1) + _xml_token(_token_fields(child, parser))
+
+        parts.append(s)
+        size += len(s)
+        if size >= chunk_size:
+            yield "".join(parts)
+            parts = []
+            size = 0
+
+    if parts:
+        yield "".join(parts)
+
+
+# ============================================================
+# JSON
+# ============================================================
+
+def _js(v) -> str:
+    if v is None:
+        return "null"
+    if isinstance(v, str):
+        return json.dumps(v)
+    return str(v)
+
+
+def iter_cst_json(
+    root,
+    parser=None,
+    indent: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    if indent is None:
+        sep = ", "
+        pads = None
+    else:
+        sep = ","
+        pads = ["\n"]
+
+    def nl(level: int) -> str:
+        if pads is None:
+            return ""
+        while len(pads) <= level:
+            pads.append("\n" + " " * (indent * len(pads)))
+        return pads[level]
+
+    def token(node, level: int) -> str:
+        text, ttype, tid, channel, line, col = _token_fields(node, parser)
+        i = nl(level + 1)
+        return (
+            "{" + i + '"node-type": "token"' + sep
+            + i + '"text": ' + _js(text) + sep
+            + i + '"token-type": ' + _js(ttype) + sep
+            + i + '"token-type-id": ' + _js(tid) + sep
+            + i + '"channel": ' + _js(channel) + sep
+            + i + '"line": ' + _js(line) + sep
+            + i + '"column": ' + _js(col)
+            + nl(level) + "}"
+        )
+
+    def rule_head(f, level: int) -> str:
+        name, sl, sc, el, ec = f[:5]
+        i = nl(level + 1)
+        j = nl(level + 2)
+        return (
+            "{" + i + '"node-type": "rule"' + sep
+            + i + '"rule": ' + _js(name) + sep
+            + i + '"start": {' + j + '"line": ' + _js(sl) + sep
+            + j + '"column": ' + _js(sc) + i + "}" + sep
+            + i + '"end": {' + j + '"line": ' + _js(el) + sep
+            + j + '"column": ' + _js(ec) + i + "}" + sep
+            + i + '"children": '
+        )
+
+    parts = []
+    size = 0
+    # [子节点迭代器, 所属 rule 的 level, 是否还没输出过子节点]
+    stack = []
+
+    def open_node(node, level: int) -> str:
+        if not _is_rule(node):
+            return token(node, level)
+        f = _rule_fields(node, parser)
+        if f[5]:
+            stack.append([f[6], level, True])
+            return rule_head(f, level) + "["
+        return rule_head(f, level) + "[]" + nl(level) + "}"
+
+    parts.append(open_node(root, 0))
+    while stack:
+        top = stack[-1]
+        it, level, first = top
+        child = next(it, _END)
+        if child is _END:
+            stack.pop()
+            s = nl(level + 1) + "]" + nl(level) + "}"
+        else:
+            top[2] = False
+            s = ("" if first else sep) + nl(level + 2) + open_node(child, level + 2)
+
+        parts.append(s)
+        size += len(s)
+        if size >= chunk_size:
+            yield "".join(parts)
+            parts = []
+            size = 0
+
+    if parts:
+        yield "".join(parts)
+
+
+# ============================================================
+# 写文件
+# ============================================================
+
+def write_cst(
+    root,
+    f: TextIO,
+    fmt: str = "xml",
+    parser=None,
+    indent: Optional[int] = 2,
+) -> int:
+    """把 CST 流式写入 f，返回写出的字符数"""
+    if fmt == "xml":
+        chunks = iter_cst_xml(root, parser, indent=indent if indent is not None else 2)
+    elif fmt == "json":
+        chunks = iter_cst_json(root, parser, indent=indent)
+    else:
+        raise ValueError(f"unknown CST format: {fmt}")
+
+    total = 0
+    for chunk in chunks:
+        f.write(chunk)
+        total += len(chunk)
+    return total
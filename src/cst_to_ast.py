@@ -15,6 +15,15 @@ from ast_types import (
 import ast
 
 from intr import INTRINSIC
+from source_span import SpanTable
+
+# build_ast(cst, source=...) 期间的 span 表；为 None 时 cstPointer 仍指向 CST dict
+_spans = None
+
+def _ptr(cst):
+    if _spans is None:
+        return cst
+    return _spans.span(cst)
 
 def parse_string_literal(token: str) -> bytes:
     """
@@ -90,10 +99,10 @@ def build_literal(cst: dict) -> Literal:
         literal_ast_node = AstList(items=crlist)
         for wrap in crlist:
             wrap.setParent(literal_ast_node)
-        literal_ast_node.setCstPointer(cst)
+        literal_ast_node.setCstPointer(_ptr(cst))
         return literal_ast_node
     literal_ast_node = Literal(raw=tok["text"], type=ty)
-    literal_ast_node.setCstPointer(cst)
+    literal_ast_node.setCstPointer(_ptr(cst))
     return literal_ast_node
 
 
@@ -110,7 +119,7 @@ def build_list(cst: dict) -> AstList:
         and is_token(children[0], "LPAREN")
         and is_token(children[1], "RPAREN")
     ):
-        return AstList([]).setCstPointer(cst)
+        return AstList([]).setCstPointer(_ptr(cst))
 
     # (id: expr)
     if (
@@ -124,7 +133,7 @@ def build_list(cst: dict) -> AstList:
             "rule": "list_element",
             "children": [children[1]],
         })
-        list_ast_node = AstList([item]).setCstPointer(cst)
+        list_ast_node = AstList([item]).setCstPointer(_ptr(cst))
         item.setParent(list_ast_node)
         return list_ast_node
 
@@ -136,7 +145,7 @@ def build_list(cst: dict) -> AstList:
     list_ast_node = AstList(items)
     for child in items:
         child.setParent(list_ast_node)
-    return list_ast_node.setCstPointer(cst)
+    return list_ast_node.setCstPointer(_ptr(cst))
 
 
 
@@ -158,15 +167,15 @@ def build_list_item(cst: dict) -> ListItem:
         )
         value_expr.setParent(li)
         key.setParent(li)
-        key.setCstPointer(key_tok)
-        return li.setCstPointer(cst)
+        key.setCstPointer(_ptr(key_tok))
+        return li.setCstPointer(_ptr(cst))
 
     # non-indexed: expression
     if is_rule(inner, "list_non_indexed_element"):
         expr = build_expr(inner["children"][0])
         li = ListItem(value=expr, key=None)
         expr.setParent(li)
-        li.setCstPointer(cst)
+        li.setCstPointer(_ptr(cst))
         return li
 
     raise RuntimeError("invalid list_element structure")
@@ -194,7 +203,7 @@ def build_call(cst: dict) -> Call:
             arg_li = ListItem(value=arg)
             arg_list_ast = AstList([arg_li])
 
-            call = Call(fn=fn, arg=arg_list_ast).setCstPointer(cst)
+            call = Call(fn=fn, arg=arg_list_ast).setCstPointer(_ptr(cst))
 
             arg.setParent(arg_li)
             arg_li.setParent(arg_list_ast)
@@ -208,7 +217,7 @@ def build_call(cst: dict) -> Call:
             list_node = arg_list_children[0]
             arg = build_list(list_node)
 
-            call = Call(fn=fn, arg=arg).setCstPointer(cst)
+            call = Call(fn=fn, arg=arg).setCstPointer(_ptr(cst))
             arg.setParent(call)
             fn.setParent(call)
 
@@ -221,7 +230,7 @@ def build_call(cst: dict) -> Call:
     fn = build_expr(children[1])
     arg = build_expr(children[3])
 
-    call = Call(fn=fn, arg=arg).setCstPointer(cst)
+    call = Call(fn=fn, arg=arg).setCstPointer(_ptr(cst))
     fn.setParent(call)
     arg.setParent(call)
     return call
@@ -298,7 +307,7 @@ def build_function_params(cst: dict) -> Expr:
 
     # case 1: ID_IDENTIFIER
     if len(children) == 1 and is_token(children[0], "ID_IDENTIFIER"):
-        return build_identifier(children[0]["text"]).setCstPointer(children[0])
+        return build_identifier(children[0]["text"]).setCstPointer(_ptr(children[0]))
 
     # case 2: list
     if len(children) == 1 and is_rule(children[0], "list"):
@@ -311,7 +320,7 @@ def build_function_params(cst: dict) -> Expr:
         and is_rule(children[1], "expression")
         and is_token(children[2], "RPAREN")
     ):
-        return build_expr(children[1]).setCstPointer(children[1])
+        return build_expr(children[1]).setCstPointer(_ptr(children[1]))
 
     raise RuntimeError(
         "invalid function_params structure, grammar violated"
@@ -345,14 +354,14 @@ def build_function(cst: dict) -> Function:
     body_wrap = children[idx]['children']
     assert len(body_wrap) == 3
     assert is_rule(body_wrap[1], 'block')
-    body = build_block(body_wrap[1]).setCstPointer(body_wrap[1])
+    body = build_block(body_wrap[1]).setCstPointer(_ptr(body_wrap[1]))
 
     fn = Function(
         params=params_expr,
         body=body,
         ret=ret,
         ann=ann,
-    ).setCstPointer(cst)
+    ).setCstPointer(_ptr(cst))
     params_expr.setParent(fn)
     body.setParent(fn)
     if ret is not None:
@@ -371,7 +380,7 @@ def build_expr(cst: dict) -> Expr:
     if cst["node-type"] == "token":
         # 语义 token
         if cst["token-type"] == "ID_IDENTIFIER":
-            return build_identifier(cst["text"]).setCstPointer(cst)
+            return build_identifier(cst["text"]).setCstPointer(_ptr(cst))
 
         # 结构性 token：直接忽略，让上层 rule 负责结构
         if cst["token-type"] in {
@@ -426,7 +435,7 @@ def build_program(cst: dict) -> Program:
     block = block_list[0]
     assert is_rule(block, 'block')
     block_ast_node = build_block(block)
-    block_ast_node.setCstPointer(block)
+    block_ast_node.setCstPointer(_ptr(block))
     program_ast_node = Program(block_ast_node)
     block_ast_node.setParent(program_ast_node)
     return program_ast_node
@@ -437,7 +446,7 @@ def build_block(cst: dict) -> Block:
     for child in cst["children"]:
         if is_rule(child, "statement"):
             stmt_ast_node = build_stmt(child)
-            stmt_ast_node.setCstPointer(child)
+            stmt_ast_node.setCstPointer(_ptr(child))
             stmts.append(stmt_ast_node)
     block_ast_node = Block(stmts)
     for stmt in block_ast_node.stmts:
@@ -456,7 +465,7 @@ def build_stmt(cst: dict) -> Stmt:
         and is_token(children[1], "OP_BIND")
     ):
         target = build_identifier(children[0]["text"])
-        target.setCstPointer(children[0])
+        target.setCstPointer(_ptr(children[0]))
         value = build_expr(children[2])
         stmt_ast_node = Stmt(expr=value, target=target)
         target.setParent(stmt_ast_node)
@@ -476,11 +485,37 @@ def build_identifier(name: str):
 # Entry
 # ==================================================
 
-def build_ast(cst: dict) -> Program:
-    program_ast_node = build_program(cst)
-    program_ast_node.setCstPointer(cst)
+def build_ast(cst: dict, source: str = None, file_id: int = 0, source_map=None) -> Program:
+    """
+    给出 source 时，AST 的 cstPointer 是 SourceSpan 而不是 CST dict，
+    返回之后 AST 不再引用 CST，调用方可以直接释放它。
+    """
+    global _spans
+    _spans = SpanTable(source, file_id, source_map) if source is not None else None
+    try:
+        program_ast_node = build_program(cst)
+        program_ast_node.setCstPointer(_ptr(cst))
+    finally:
+        _spans = None
     return program_ast_node
 
+def build_statements(csts: List[dict], source: str = None, file_id: int = 0, source_map=None) -> List[Stmt]:
+    """
+    逐条建 statement 的 Stmt（incremental 只重建改动过的顶层语句），
+    source / file_id / source_map 与 build_ast 相同
+    """
+    global _spans
+    _spans = SpanTable(source, file_id, source_map) if source is not None else None
+    try:
+        stmts = []
+        for cst in csts:
+            stmt_ast_node = build_stmt(cst)
+            stmt_ast_node.setCstPointer(_ptr(cst))
+            stmts.append(stmt_ast_node)
+    finally:
+        _spans = None
+    return stmts
+
 def dump_ast(node: Any, level: int = 0, INDENT = "  "):
     pad = INDENT * level
 
@@ -0,0 +1,461 @@
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+# ============================================================
+# ANTLR DFA 缓存 —— 把预热过的 lexer / parser DFA 存盘，下次启动直接装回
+#
+# MainLexer / MainParser 的 decisionsToDFA 是类属性，adaptive prediction 边解析
+# 边往里加状态；新进程第一次解析要从 ATN 重新模拟，test.txt 第一遍比第二遍
+# 慢好几倍。这里在训练后把 DFA 写成只含 int / tuple 的结构：
+#
+#   contexts    —— PredictionContext 图，0 是 EMPTY；父节点先于子节点
+#   lexer / parser —— 每个 decision：(decision, states, s0)
+#       state   = (stateNumber, configs, edges, isAcceptState, prediction,
+#                  lexerActionExecutor, requiresFullContext, 是否在 dfa.states 里)
+#       configs = (ordered, fullCtx, uniqueAlt, conflictingAlts, hasSemanticContext,
+#                  dipsIntoOuterContext, [(ATN state 编号, alt, context, ...)])
+#       edges   里 -1 = None，-2 = ATNSimulator.ERROR
+#       precedence DFA 的 s0 是按 precedence 索引的起始状态表
+#   ATN 状态和 lexer action 都存编号，装回时取当前 ATN 里的对象。
+#
+# 文件用 marshal 写：只含 int / str / bool / None / tuple / dict，读回来不会执行
+# 任何代码（pickle 会按文件内容调用任意可调用对象）。
+# 文件头记录 FORMAT_VERSION 和 grammar 哈希（两份 serializedATN 的 sha256），
+# 对不上就整份忽略。只在 DFA 还是空的时候装入（每个进程最多一次）。
+# 先把一个 recognizer 的全部 DFA 建好再一起装上；内容不合法时一个都不装，
+# 整份当作没有缓存。
+# grammar 没有语义谓词；遇到带谓词的状态 save 会报错。
+#
+#   python dfa_cache.py train [files...]   用 test 文件 + 生成的程序训练并写出
+#   python dfa_cache.py info               文件是否可用、状态数
+#   python dfa_cache.py bench FILE         新进程里第一次解析 FILE 的耗时（有 / 无缓存）
+# ============================================================
+
+FORMAT_VERSION = 2
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar", "MainDFA.cache")
+
+# pipeline --dfa-cache / --no-dfa-cache 修改；None 表示不用缓存
+cache_path: Optional[str] = DEFAULT_PATH
+
+_data: Optional[dict] = None
+_loaded: Dict[str, bool] = {}
+
+
+def grammar_hash() -> str:
+    from grammar import MainLexer, MainParser
+    h = hashlib.sha256()
+    h.update(MainLexer.serializedATN().encode("utf-8", "surrogatepass"))
+    h.update(b"\0")
+    h.update(MainParser.serializedATN().encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+def _recognizer(kind: str):
+    if kind == "lexer":
+        from grammar.MainLexer import MainLexer
+        return MainLexer
+    from grammar.MainParser import MainParser
+    return MainParser
+
+
+# ============================================================
+# 写出
+# ============================================================
+
+class _Writer:
+    def __init__(self):
+        from antlr4.PredictionContext import PredictionContext
+        self.contexts: List[tuple] = [("empty",)]
+        self._contexts: Dict[int, int] = {id(PredictionContext.EMPTY): 0}
+        self.executors: List[tuple] = []
+        self._executors: Dict[int, int] = {}
+
+    def context(self, ctx) -> int:
+        if ctx is None:
+            return -1
+        k = self._contexts.get(id(ctx))
+        if k is not None:
+            return k
+        if hasattr(ctx, "parents"):
+            entry = ("array", tuple(self.context(p) for p in ctx.parents), tuple(ctx.returnStates))
+        else:
+            entry = ("single", self.context(ctx.parentCtx), ctx.returnState)
+        k = self._contexts[id(ctx)] = len(self.contexts)
+        self.contexts.append(entry)
+        return k
+
+    def executor(self, ex, actions: list) -> int:
+        if ex is None:
+            return -1
+        k = self._executors.get(id(ex))
+        if k is not None:
+            return k
+        indices = []
+        for action in ex.lexerActions:
+            i = next((i for i, a in enumerate(actions) if a is action), None)
+            if i is None:
+                raise ValueError(f"lexer action {action} is not in the ATN's action table")
+            indices.append(i)
+        k = self._executors[id(ex)] = len(self.executors)
+        self.executors.append(tuple(indices))
+        return k
+
+    def configs(self, cs, actions: list) -> tuple:
+        from antlr4.atn.ATNConfigSet import OrderedATNConfigSet
+        from antlr4.atn.SemanticContext import SemanticContext
+        items = []
+        for c in cs.configs:
+            if c.semanticContext is not SemanticContext.NONE:
+                raise ValueError("DFA states with semantic predicates cannot be cached")
+            item = (c.state.stateNumber, c.alt, self.context(c.context),
+                    c.reachesIntoOuterContext, c.precedenceFilterSuppressed)
+            if hasattr(c, "lexerActionExecutor"):
+                item += (self.executor(c.lexerActionExecutor, actions), c.passedThroughNonGreedyDecision)
+            items.append(item)
+        alts = cs.conflictingAlts
+        return (
+            isinstance(cs, OrderedATNConfigSet), cs.fullCtx, cs.uniqueAlt,
+            None if alts is None else tuple(sorted(alts)),
+            cs.hasSemanticContext, cs.dipsIntoOuterContext, tuple(items),
+        )
+
+    def dfa(self, dfa, error, actions: list) -> tuple:
+        index: Dict[int, int] = {}
+        order = []
+
+        def visit(s):
+            if s is None:
+                return -1
+            if s is error:
+                return -2
+            k = index.get(id(s))
+            if k is None:
+                k = index[id(s)] = len(order)
+                order.append(s)
+            return k
+
+        in_dict = set()
+        for s in dfa.states:
+            in_dict.add(id(s))
+            visit(s)
+        if dfa.precedenceDfa:
+            s0 = tuple(visit(s) for s in dfa.s0.edges)
+        else:
+            s0 = visit(dfa.s0)
+
+        states = []
+        i = 0
+        # edges 里可能引用 dict 之外的状态，order 会在遍历中增长
+        while i < len(order):
+            s = order[i]
+            if s.predicates is not None:
+                raise ValueError("DFA states with semantic predicates cannot be cached")
+            edges = None if s.edges is None else tuple(visit(t) for t in s.edges)
+            states.append((
+                s.stateNumber, self.configs(s.configs, actions), edges, s.isAcceptState,
+                s.prediction, self.executor(s.lexerActionExecutor, actions),
+                s.requiresFullContext, id(s) in in_dict,
+            ))
+            i += 1
+        return (dfa.decision, dfa.precedenceDfa, tuple(states), s0)
+
+
+def snapshot() -> dict:
+    """当前进程里 MainLexer / MainParser 的 DFA"""
+    from antlr4.atn.ATNSimulator import ATNSimulator
+    from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+    lexer, parser = _recognizer("lexer"), _recognizer("parser")
+    w = _Writer()
+    actions = lexer.atn.lexerActions or []
+    return {
+        "version": FORMAT_VERSION,
+        "grammar": grammar_hash(),
+        "lexer": tuple(w.dfa(d, LexerATNSimulator.ERROR, actions) for d in lexer.decisionsToDFA),
+        "parser": tuple(w.dfa(d, ATNSimulator.ERROR, []) for d in parser.decisionsToDFA),
+        "contexts": tuple(w.contexts),
+        "executors": tuple(w.executors),
+    }
+
+
+def save(path: str) -> dict:
+    data = snapshot()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        marshal.dump(data, f)
+    os.replace(tmp, path)
+    return data
+
+
+# ============================================================
+# 装回
+# ============================================================
+
+def read(path: str) -> Optional[dict]:
+    """读文件并检查版本 / grammar 哈希；不可用时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+        return None
+    if data.get("grammar") != grammar_hash():
+        return None
+    return data
+
+
+class _Reader:
+    def __init__(self, data: dict):
+        from antlr4.PredictionContext import (
+            PredictionContext, SingletonPredictionContext, ArrayPredictionContext,
+        )
+        contexts = [PredictionContext.EMPTY]
+        for entry in data["contexts"][1:]:
+            if entry[0] == "single":
+                parent = None if entry[1] < 0 else contexts[entry[1]]
+                contexts.append(SingletonPredictionContext(parent, entry[2]))
+            else:
+                parents = [None if p < 0 else contexts[p] for p in entry[1]]
+                contexts.append(ArrayPredictionContext(parents, list(entry[2])))
+        self.contexts = contexts
+        self.data = data
+        self._executors: Dict[int, object] = {}
+
+    def executor(self, k: int, actions: list):
+        if k < 0:
+            return None
+        ex = self._executors.get(k)
+        if ex is None:
+            from antlr4.atn.LexerActionExecutor import LexerActionExecutor
+            ex = self._executors[k] = LexerActionExecutor([actions[i] for i in self.data["executors"][k]])
+        return ex
+
+    def configs(self, spec: tuple, atn, actions: list):
+        from antlr4.atn.ATNConfig import ATNConfig, LexerATNConfig
+        from antlr4.atn.ATNConfigSet import ATNConfigSet, OrderedATNConfigSet
+        ordered, full_ctx, unique_alt, alts, has_sem, dips, items = spec
+        cs = OrderedATNConfigSet() if ordered else ATNConfigSet(full_ctx)
+        cs.fullCtx = full_ctx
+        for item in items:
+            state = atn.states[item[0]]
+            ctx = None if item[2] < 0 else self.contexts[item[2]]
+            if len(item) > 5:
+                c = LexerATNConfig(state, item[1], ctx, lexerActionExecutor=self.executor(item[5], actions))
+                c.passedThroughNonGreedyDecision = item[6]
+            else:
+                c = ATNConfig(state, item[1], ctx)
+            c.reachesIntoOuterContext = item[3]
+            c.precedenceFilterSuppressed = item[4]
+            cs.configs.append(c)
+        cs.uniqueAlt = unique_alt
+        cs.conflictingAlts = None if alts is None else set(alts)
+        cs.hasSemanticContext = has_sem
+        cs.dipsIntoOuterContext = dips
+        cs.setReadonly(True)
+        return cs
+
+    def dfa(self, dfa, spec: tuple, error, atn, actions: list):
+        """按 spec 建出 dfa 的 (states, s0)，不改动 dfa 本身"""
+        from antlr4.dfa.DFAState import DFAState
+        decision, precedence, state_specs, s0 = spec
+        if decision != dfa.decision or precedence != dfa.precedenceDfa:
+            raise ValueError(f"decision {dfa.decision} does not match the cache")
+        states = []
+        for number, configs, _, accept, prediction, executor, full_ctx, _ in state_specs:
+            s = DFAState(number, self.configs(configs, atn, actions))
+            s.isAcceptState = accept
+            s.prediction = prediction
+            s.lexerActionExecutor = self.executor(executor, actions)
+            s.requiresFullContext = full_ctx
+            states.append(s)
+
+        def ref(k):
+            return None if k == -1 else error if k == -2 else states[k]
+
+        for s, state_spec in zip(states, state_specs):
+            edges = state_spec[2]
+            if edges is not None:
+                s.edges = [ref(k) for k in edges]
+        in_dict = {s: s for s, state_spec in zip(states, state_specs) if state_spec[7]}
+        if precedence:
+            return in_dict, [ref(k) for k in s0]
+        return in_dict, ref(s0)
+
+
+def _install(kind: str, data: dict) -> bool:
+    """
+    全部 DFA 建好才装上；建的过程中出错（文件内容不合法）直接抛出，
+    此时 decisionsToDFA 还没有被改动
+    """
+    from antlr4.atn.ATNSimulator import ATNSimulator
+    from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+    cls = _recognizer(kind)
+    dfas = cls.decisionsToDFA
+    # 已经开始解析的进程不合并
+    if any(d._states or (d.s0 is not None and not d.precedenceDfa) for d in dfas):
+        return False
+    if len(data[kind]) != len(dfas):
+        return False
+    reader = _Reader(data)
+    if kind == "lexer":
+        error, actions = LexerATNSimulator.ERROR, cls.atn.lexerActions or []
+    else:
+        error, actions = ATNSimulator.ERROR, []
+    built = [reader.dfa(dfa, spec, error, cls.atn, actions) for dfa, spec in zip(dfas, data[kind])]
+    for dfa, (states, s0) in zip(dfas, built):
+        dfa._states = states
+        if dfa.precedenceDfa:
+            dfa.s0.edges = s0
+        else:
+            dfa.s0 = s0
+    if kind == "parser":
+        for ctx in reader.contexts[1:]:
+            cls.sharedContextCache.add(ctx)
+    return True
+
+
+def ensure_loaded(kind: str) -> bool:
+    """第一次用 ANTLR lexer / parser 前调用；kind 是 "lexer" 或 "parser" """
+    global _data
+    if kind in _loaded:
+        return _loaded[kind]
+    _loaded[kind] = False
+    if cache_path is None:
+        return False
+    if _data is None:
+        _data = read(cache_path) or {}
+    if _data:
+        try:
+            _loaded[kind] = _install(kind, _data)
+        except Exception:
+            # 损坏 / 被改过的文件：另一半也不可信，整份当作没有缓存
+            _data = {}
+    if all(k in _loaded for k in ("lexer", "parser")):
+        _data = None
+    return _loaded[kind]
+
+
+def state_counts() -> Dict[str, int]:
+    return {
+        kind: sum(len(d._states) for d in _recognizer(kind).decisionsToDFA)
+        for kind in ("lexer", "parser")
+    }
+
+
+# ============================================================
+# main
+# ============================================================
+
+def _training_inputs(files: List[str], count: int):
+    from yafl_gen import generate_program, random_program
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            yield f.read()
+    for n in (20, 200):
+        yield generate_program(0, statements=n)
+    for k in range(count):
+        yield random_program(k)
+
+
+def _first_parse(path: str) -> None:
+    """子进程：计时第一次 build_cst，输出 "装入 ms 解析 ms CST 摘要" """
+    import logging
+    from src_to_cst import build_cst
+    logging.disable(logging.CRITICAL)
+    with open(path, "r", encoding="utf-8") as f:
+        src = f.read()
+    t0 = time.perf_counter()
+    ensure_loaded("lexer")
+    ensure_loaded("parser")
+    t1 = time.perf_counter()
+    cst = build_cst(src)
+    t2 = time.perf_counter()
+    t3 = time.perf_counter()
+    build_cst(src)
+    t4 = time.perf_counter()
+    digest = hashlib.sha256(repr(cst).encode("utf-8")).hexdigest()[:16]
+    print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {(t4 - t3) * 1000:.1f} {digest}")
+
+
+def main():
+    global cache_path
+    import argparse
+    import subprocess
+    parser = argparse.ArgumentParser(description="Persisted ANTLR DFA cache")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="Cache file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="Warm the DFAs on sample inputs and write the cache")
+    p_train.add_argument("files", nargs="*", help="Representative source files")
+    p_train.add_argument("-n", "--count", type=int, default=0,
+                         help="Random programs to add (they grow the DFA a lot, which makes loading slower)")
+    sub.add_parser("info", help="Show whether the cache is usable")
+    p_bench = sub.add_parser("bench", help="First-parse latency in a fresh process with and without the cache")
+    p_bench.add_argument("file")
+    p_bench.add_argument("--repeat", type=int, default=3)
+    p_first = sub.add_parser("first-parse", help=argparse.SUPPRESS)
+    p_first.add_argument("file")
+    p_first.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "first-parse":
+        cache_path = None if args.no_cache else args.path
+        _first_parse(args.file)
+        return
+
+    if args.command == "train":
+        import logging
+        from src_to_cst import build_cst
+        logging.disable(logging.CRITICAL)
+        cache_path = None
+        rejected = 0
+        for src in _training_inputs(args.files, args.count):
+            try:
+                build_cst(src)
+            except Exception:
+                rejected += 1
+        data = save(args.path)
+        counts = state_counts()
+        print(
+            f"wrote {args.path}: {counts['lexer']} lexer / {counts['parser']} parser DFA states, "
+            f"{len(data['contexts'])} contexts, {os.path.getsize(args.path)} bytes "
+            f"({rejected} training input(s) rejected)"
+        )
+        return
+
+    if args.command == "info":
+        data = read(args.path)
+        if data is None:
+            print(f"{args.path}: missing, unreadable or built for another grammar ({grammar_hash()[:16]})")
+            sys.exit(1)
+        n = {k: sum(sum(1 for s in d[2] if s[7]) for d in data[k]) for k in ("lexer", "parser")}
+        print(
+            f"{args.path}: grammar {data['grammar'][:16]}, {n['lexer']} lexer / {n['parser']} parser "
+            f"DFA states, {len(data['contexts'])} contexts, {os.path.getsize(args.path)} bytes"
+        )
+        return
+
+    # bench
+    print(f"{'':<10} {'load ms':>8} {'1st parse':>10} {'2nd parse':>10}  cst")
+    for label, extra in (("no cache", ["--no-cache"]), ("cache", [])):
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--path", args.path, "first-parse", args.file] + extra,
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            runs.append(out)
+        best = min(runs, key=lambda r: float(r[1]))
+        print(f"{label:<10} {float(best[0]):>8.1f} {float(best[1]):>10.1f} {float(best[2]):>10.1f}  {best[3]}")
+
+
+if __name__ == "__main__":
+    # 经 import 运行，src_to_cst / fast_lexer 里 import 的才是同一个模块（同一份 cache_path）
+    import dfa_cache
+    dfa_cache.main()
@@ -0,0 +1,326 @@
+import argparse
+import io
+import json
+import os
+import random
+import sys
+from typing import Callable, Dict, List, Optional
+
+from src_to_cst import PARSERS, build_cst, cst_dict_to_bin
+from cst_to_ast import build_ast
+from cst_bin import read_cst_bin
+from cst_stream import write_cst
+from fast_lexer import LEXERS
+from incremental import Document
+from ast_to_bdg import build_bdg
+from bdg_to_vg import build_value_graph
+from vg_prune import prune_value_graph
+from struct_hash import StructHash, ast_records, first_difference
+from yafl_gen import random_program
+
+
+# ============================================================
+# 差分测试：参考实现 vs. 候选前端
+#
+# Engine 由四个阶段组成，没给的阶段用参考实现：
+#   cst(src)                         -> CST dict
+#   ast(cst, src)                    -> Program
+#   bdg(ast)                         -> (ast, block_index, point_index, bindphi_index)
+#   vg(ast, blocks, points, bphis)   -> ValueGraph
+# 两边各跑一遍，比较 struct_hash 的 ast / bdg / vg / pruned 四段摘要。
+# 不一致时按行（= 顶层语句）缩减程序，保存最小的失败用例。
+#
+# 新的优化实现在 ENGINES 里注册一项即可：
+#   ENGINES["indexed-scopes"] = Engine("indexed-scopes", bdg=build_bdg_indexed)
+# ============================================================
+
+STAGES = ["ast", "bdg", "vg", "pruned"]
+
+
+def _ref_cst(src: str) -> dict:
+    return build_cst(src)
+
+
+def _ref_ast(cst: dict, src: str):
+    return build_ast(cst, source=src)
+
+
+class Engine:
+    def __init__(
+        self,
+        name: str,
+        cst: Optional[Callable] = None,
+        ast: Optional[Callable] = None,
+        bdg: Optional[Callable] = None,
+        vg: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.cst = cst or _ref_cst
+        self.ast = ast or _ref_ast
+        self.bdg = bdg or build_bdg
+        self.vg = vg or build_value_graph
+
+    def run(self, src: str) -> StructHash:
+        ast = self.ast(self.cst(src), src)
+        bdg = self.bdg(ast)
+        vg = self.vg(*bdg)
+        h = StructHash(ast, bdg, vg)
+        prune_value_graph(vg, bdg[1])
+        h.add_graph("pruned", vg)
+        return h
+
+
+# ============================================================
+# 树里已有的几条替代路径
+# ============================================================
+
+def _cst_via_bin(src: str) -> dict:
+    buf = io.BytesIO()
+    cst_dict_to_bin(build_cst(src), buf)
+    buf.seek(0)
+    return read_cst_bin(buf)
+
+
+def _cst_via_json(src: str) -> dict:
+    buf = io.StringIO()
+    write_cst(build_cst(src), buf, "json")
+    return json.loads(buf.getvalue())
+
+
+def _cst_recovering(src: str) -> dict:
+    return build_cst(src, errors=[])
+
+
+def _cst_fast_lexer(src: str) -> dict:
+    return build_cst(src, lexer="fast")
+
+
+def _cst_rd_parser(src: str) -> dict:
+    return build_cst(src, parser="rd")
+
+
+def _ast_without_spans(cst: dict, src: str):
+    return build_ast(cst)
+
+
+def _bdg_parallel(ast):
+    # min_parallel=0：小程序也走进程池，才能测到 merge 的确定性
+    return build_bdg(ast, jobs=2, min_parallel=0)
+
+
+ENGINES: Dict[str, Engine] = {
+    "reference": Engine("reference"),
+    "cst-bin": Engine("cst-bin", cst=_cst_via_bin),
+    "cst-json": Engine("cst-json", cst=_cst_via_json),
+    "recovering": Engine("recovering", cst=_cst_recovering),
+    "fast-lexer": Engine("fast-lexer", cst=_cst_fast_lexer),
+    "rd-parser": Engine("rd-parser", cst=_cst_rd_parser),
+    "no-spans": Engine("no-spans", ast=_ast_without_spans),
+    "parallel-bdg": Engine("parallel-bdg", bdg=_bdg_parallel),
+}
+
+
+# ============================================================
+# 带语法错误的输入（--syntax-errors）
+#
+# 参考实现不接受这些程序，上面的引擎比较覆盖不到。每个用例在所有
+# lexer / parser 组合下用恢复模式解析，检查报出的错误位置（行号 1 起、
+# 列号 0 起）和保留下来的顶层语句数。
+#
+# 同一批用例和 -n 个随机程序再做编辑 fuzz（check_edits）：对 incremental.Document
+# 随机编辑 --edits 次（用例先逐个字符做一遍不改内容的替换），每一步的语句
+# 和错误都必须与直接打开同样文本的 Document 相同，即与编辑历史无关。
+# ============================================================
+
+# (源码, [(行, 列)], 语句数)
+RECOVERY_CASES = [
+    # 没闭合的 ( 到 ; 为止：之后的 := 照常是 OP_BIND；错误报在这条语句自己的 ; 上
+    ("a := 1;\nb := (2, ;\nd := a;\nd;\n", [(2, 9)], 3),
+]
+
+
+def check_recovery(src: str, expected_errors, expected_statements: int) -> List[str]:
+    failures = []
+    for parser in PARSERS:
+        for lexer in sorted(LEXERS):
+            errors = []
+            ast = build_ast(build_cst(src, errors=errors, lexer=lexer, parser=parser), source=src)
+            got = [(e["line"], e["column"]) for e in errors]
+            if got != expected_errors or len(ast.block.stmts) != expected_statements:
+                failures.append(
+                    f"[{parser}/{lexer}] errors at {got}, {len(ast.block.stmts)} statement(s); "
+                    f"expected {expected_errors}, {expected_statements}"
+                )
+    return failures
+
+
+EDIT_SNIPPETS = ["x", " ", "\n", ";", "(", ")", "[", "]", "{", "}", ":=", "a := 1;", "//", "\""]
+
+
+def _document_state(doc: Document):
+    diagnostics = [(d["line"], d["column"], d["message"]) for d in doc.diagnostics()]
+    return ast_records(doc.program()), diagnostics
+
+
+def check_edits(src: str, seed: int, edits: int, every_char: bool = False) -> Optional[str]:
+    rng = random.Random(seed)
+    doc = Document(src)
+    text = src
+    steps = [(a, a + 1, src[a]) for a in range(len(src))] if every_char else []
+    steps += [None] * edits
+    for step, edit in enumerate(steps):
+        if edit is None:
+            a = rng.randrange(len(text) + 1)
+            b = min(len(text), a + rng.choice([0, 0, 1, 2, 5]))
+            # 偶尔原样替换：不改内容的编辑
+            new = rng.choice(EDIT_SNIPPETS) if rng.random() < 0.8 else text[a:b]
+            edit = (a, b, new)
+        a, b, new = edit
+        doc.edit(a, b, new)
+        text = text[:a] + new + text[b:]
+        if _document_state(doc) != _document_state(Document(text)):
+            return f"step {step}: replacing [{a}, {b}) with {new!r} differs from opening {text!r}"
+    return None
+
+
+# ============================================================
+# 比较 / 缩减
+# ============================================================
+
+class Mismatch:
+    def __init__(self, stage: str, index: int, expected, actual):
+        self.stage = stage
+        self.index = index
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return (
+            f"{self.stage} differs at record {self.index}\n"
+            f"    reference: {self.expected}\n"
+            f"    candidate: {self.actual}"
+        )
+
+
+def compare(src: str, reference: Engine, candidate: Engine) -> Optional[Mismatch]:
+    """参考实现本身失败（语法错误等）时抛出；候选实现的异常算作不一致"""
+    expected = reference.run(src)
+    try:
+        actual = candidate.run(src)
+    except Exception as e:
+        return Mismatch("crash", 0, None, f"{type(e).__name__}: {e}")
+    ed, ad = expected.digests, actual.digests
+    for stage in STAGES:
+        if ed.get(stage) != ad.get(stage):
+            diff = first_difference(expected.records[stage], actual.records[stage])
+            index, a, b = diff if diff else (0, None, None)
+            return Mismatch(stage, index, a, b)
+    return None
+
+
+def shrink(src: str, reference: Engine, candidate: Engine) -> str:
+    """逐行删除，只要仍然不一致就保留删除"""
+    lines = src.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        trial = "".join(lines[:i] + lines[i + 1:])
+        try:
+            still = compare(trial, reference, candidate) is not None
+        except Exception:
+            still = False
+        if still:
+            lines = lines[:i] + lines[i + 1:]
+        else:
+            i += 1
+    return "".join(lines)
+
+
+# ============================================================
+# main
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test of front-end engines")
+    parser.add_argument("sources", nargs="*", help="Check these files instead of random programs")
+    parser.add_argument(
+        "--engine",
+        action="append",
+        choices=[name for name in ENGINES if name != "reference"],
+        help="Candidate engine(s) to compare against the reference (default: all)",
+    )
+    parser.add_argument("-n", "--count", type=int, default=100, help="Number of random programs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--statements", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=5, help="Expression nesting budget")
+    parser.add_argument("--save-dir", help="Write shrunk failing programs here")
+    parser.add_argument("--syntax-errors", action="store_true",
+                        help="Check error recovery and incremental edits instead of comparing engines")
+    parser.add_argument("--edits", type=int, default=50,
+                        help="Random edits per program with --syntax-errors")
+    args = parser.parse_args()
+
+    if args.syntax_errors:
+        failed = 0
+        for src, expected_errors, expected_statements in RECOVERY_CASES:
+            for failure in check_recovery(src, expected_errors, expected_statements):
+                failed += 1
+                print(f"{src!r}: {failure}", file=sys.stderr)
+        fuzzed = [(src, True) for src, _, _ in RECOVERY_CASES] + [
+            (random_program(args.seed + k, args.statements, args.budget), False) for k in range(args.count)
+        ]
+        for k, (src, every_char) in enumerate(fuzzed):
+            failure = check_edits(src, args.seed + k, args.edits, every_char)
+            if failure is not None:
+                failed += 1
+                print(f"{src!r}: {failure}", file=sys.stderr)
+        print(f"{len(RECOVERY_CASES)} recovery case(s), {len(fuzzed)} edit fuzz program(s) checked, "
+              f"{failed} failure(s)")
+        if failed:
+            sys.exit(1)
+        return
+
+    reference = ENGINES["reference"]
+    candidates = [ENGINES[name] for name in (args.engine or ENGINES) if name != "reference"]
+
+    if args.sources:
+        programs = []
+        for path in args.sources:
+            with open(path, "r", encoding="utf-8") as f:
+                programs.append((path, f.read()))
+    else:
+        programs = (
+            (f"seed {args.seed + k}", random_program(args.seed + k, args.statements, args.budget))
+            for k in range(args.count)
+        )
+
+    checked = rejected = failed = 0
+    for label, src in programs:
+        try:
+            reference.run(src)
+        except Exception:
+            # 参考实现不接受的程序（生成器只保证语法层面的形状）
+            rejected += 1
+            continue
+        checked += 1
+        for engine in candidates:
+            mismatch = compare(src, reference, engine)
+            if mismatch is None:
+                continue
+            failed += 1
+            small = shrink(src, reference, engine)
+            print(f"[{engine.name}] {label}: {mismatch}", file=sys.stderr)
+            print(small, file=sys.stderr)
+            if args.save_dir:
+                os.makedirs(args.save_dir, exist_ok=True)
+                name = f"{engine.name}-{label.replace(' ', '-').replace(os.sep, '_')}.yafl"
+                with open(os.path.join(args.save_dir, name), "w", encoding="utf-8") as f:
+                    f.write(small)
+
+    names = ", ".join(e.name for e in candidates)
+    print(f"{checked} program(s) checked against [{names}], {rejected} rejected, {failed} mismatch(es)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
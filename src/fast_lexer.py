@@ -0,0 +1,272 @@
+from __future__ import annotations
+import re
+from typing import List, Optional
+
+from antlr4 import InputStream, Token
+from antlr4.Lexer import TokenSource
+from antlr4.Recognizer import Recognizer
+from antlr4.Token import CommonToken
+
+from grammar.MainLexer import MainLexer
+from source_text import Source, char_stream
+
+# ============================================================
+# FastLexer —— 一个预编译的 master regex 代替 MainLexer 的 ATN 模拟
+#
+# 产出与 MainLexer 相同的 token：type / channel / text / line / column /
+# start / stop 都一致，可以直接交给 WarpedTokenStream 和 MainParser。
+#
+# ANTLR lexer 的语义是"最长匹配，等长时取先定义的规则"，规则顺序为
+#   INTEGER < FLOAT < NAN/INF < BOOLEAN/NULL < STRING < 运算符 < ID < COMMENT < WS
+# 除 ID_IDENTIFIER 外，各族 token 之间要么首字符不相交，要么前面的分支
+# 一旦匹配就一定更长（FLOAT 放在 INTEGER 前），所以 master regex 按顺序
+# 取第一个分支即可。唯一的例外是 ID：它的首字符集包含 + - . / * 等，
+# 和带符号的数字、nan / inf / true、注释都可能重叠，于是这几族匹配上时
+# 再单独匹配一次 ID，比较长度：
+#   ID 更长                      -> ID
+#   等长且另一方是注释（规则在后） -> ID      （如 "//x" 行尾时是 ID）
+#   其他等长                     -> 另一方    （如 "-1"、"true"）
+#
+# 出错时与 MainLexer 相同：跳过并报告 ATN 已经读过的前缀连同第一个读不下去
+# 的字符。能走出多个字符才失败的只有没闭合的字符串：' / " 读到换行（含）
+# 或文件末尾，` 读到文件末尾；其余情况是单个字符。
+# ============================================================
+
+L = MainLexer
+
+_D = r"[0-9](?:_?[0-9])*"
+_H = r"[0-9a-fA-F](?:_?[0-9a-fA-F])*"
+_B = r"[01](?:_?[01])*"
+_O = r"[0-7](?:_?[0-7])*"
+_EXP = rf"[eEpP][+-]?{_D}"
+_HEXP = rf"[pP][+-]?{_D}"
+_FSUF = r"[fFlL]?"
+
+
+def _frac(d: str) -> str:
+    return rf"(?:(?:{d})?\.(?:{d})|(?:{d})\.)"
+
+
+_FLOAT = (
+    r"[+-]?(?:"
+    rf"{_frac(_D)}(?:{_EXP})?{_FSUF}"
+    rf"|{_D}{_EXP}{_FSUF}"
+    rf"|0[xX](?:{_frac(_H)}(?:{_HEXP})?|{_H}{_HEXP}){_FSUF}"
+    rf"|0[bB](?:{_frac(_B)}(?:{_EXP})?|{_B}{_EXP}){_FSUF}"
+    rf"|0[oO](?:{_frac(_O)}(?:{_EXP})?|{_O}{_EXP}){_FSUF}"
+    r")"
+)
+
+_INTEGER = (
+    r"[+-]?(?:"
+    rf"0[xX]{_H}|0[oO]{_O}|0[bB]{_B}|0{_O}|0|[1-9](?:_?[0-9])*"
+    r")(?:[uU](?:[lL][lL]?)?|[lL][lL]?[uU]?)?"
+)
+
+_ID_START = r"(?:[A-Za-z_\u00A0-\uD7FF\uF900-\uFDCF\uFDF0-\uFFEF+\-*/<>!?$%&^~|@#.]|=(?!>))"
+_ID = rf"{_ID_START}(?:{_ID_START}|[0-9])*"
+
+# (组名, 模式)；组名就是 MainLexer 里的 token 名
+_RULES = [
+    ("WS", r"\r\n|[ \t\r]+|\n"),
+    ("STRING_CONSTANT", r"'(?:\\[\s\S]|[^'\\\r\n])*'|\"(?:\\[\s\S]|[^\"\\\r\n])*\"|`[^`]*`"),
+    ("FLOAT_CONSTANT", _FLOAT),
+    ("FLOAT_NAN", r"[nN][aA][nN]"),
+    ("FLOAT_INF", r"[+-]?[iI][nN][fF](?:[iI][nN](?:[iI][tT][yY])?)?"),
+    ("INTEGER_CONSTANT", _INTEGER),
+    ("BOOLEAN_CONSTANT", r"true|false"),
+    ("NULL_CONSTANT", r"null"),
+    ("OP_BIND", r":="),
+    ("OP_ARROW", r"=>"),
+    ("LPAREN", r"\("),
+    ("RPAREN", r"\)"),
+    ("LBRACE", r"\{"),
+    ("RBRACE", r"\}"),
+    ("LBRACK", r"\["),
+    ("RBRACK", r"\]"),
+    ("COMMA", r","),
+    ("COLON", r":"),
+    ("SEMICOLON", r";"),
+    ("LINE_COMMENT", r"//[^\n]*"),
+    ("BLOCK_COMMENT", r"/\*[\s\S]*?\*/"),
+    ("ID_IDENTIFIER", _ID),
+]
+
+# 没闭合的字符串：STRING_CONSTANT 各分支去掉结尾引号，匹配的就是 MainLexer 读过的前缀
+_UNCLOSED = {
+    "'": r"'(?:\\[\s\S]|[^'\\\r\n])*",
+    '"': r"\"(?:\\[\s\S]|[^\"\\\r\n])*",
+    "`": r"`[^`]*",
+}
+
+# 编译 master regex 要十几 ms，第一次创建 FastLexer 时才做（见 bench_startup）
+_compiled = None
+_unclosed = None
+
+
+def compiled_patterns():
+    """(master regex, ID regex)"""
+    global _compiled
+    if _compiled is None:
+        master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _RULES))
+        _compiled = (master, re.compile(_ID))
+    return _compiled
+
+
+_TYPES = {name: getattr(L, name) for name, _ in _RULES}
+_HIDDEN = {L.WS, L.LINE_COMMENT, L.BLOCK_COMMENT}
+_COMMENTS = {L.LINE_COMMENT, L.BLOCK_COMMENT}
+# 可能跨行的 token
+_MULTILINE = {L.WS, L.STRING_CONSTANT, L.LINE_COMMENT, L.BLOCK_COMMENT}
+# 可能和 ID 重叠的族；空白 / 字符串 / 标点的首字符都不能开始 ID
+_ID_OVERLAP = {
+    L.INTEGER_CONSTANT, L.FLOAT_CONSTANT, L.FLOAT_NAN, L.FLOAT_INF,
+    L.BOOLEAN_CONSTANT, L.NULL_CONSTANT, L.LINE_COMMENT, L.BLOCK_COMMENT,
+}
+
+
+class FastLexer(Recognizer, TokenSource):
+    # WarpedTokenStream / 恢复模式按名字取 token 类型
+    INTEGER_CONSTANT = L.INTEGER_CONSTANT
+    FLOAT_CONSTANT = L.FLOAT_CONSTANT
+    FLOAT_NAN = L.FLOAT_NAN
+    FLOAT_INF = L.FLOAT_INF
+    BOOLEAN_CONSTANT = L.BOOLEAN_CONSTANT
+    NULL_CONSTANT = L.NULL_CONSTANT
+    STRING_CONSTANT = L.STRING_CONSTANT
+    OP_BIND = L.OP_BIND
+    OP_ARROW = L.OP_ARROW
+    LPAREN = L.LPAREN
+    RPAREN = L.RPAREN
+    LBRACE = L.LBRACE
+    RBRACE = L.RBRACE
+    LBRACK = L.LBRACK
+    RBRACK = L.RBRACK
+    COMMA = L.COMMA
+    COLON = L.COLON
+    SEMICOLON = L.SEMICOLON
+    ID_IDENTIFIER = L.ID_IDENTIFIER
+    LINE_COMMENT = L.LINE_COMMENT
+    BLOCK_COMMENT = L.BLOCK_COMMENT
+    WS = L.WS
+
+    symbolicNames = L.symbolicNames
+    ruleNames = L.ruleNames
+    grammarFileName = L.grammarFileName
+
+    def __init__(self, input: InputStream):
+        super().__init__()
+        self.inputStream = input
+        self._input = input
+        # MappedInputStream 在这里整体解码一次（见 source_text）
+        self._text = str(input)
+        self.pos = 0
+        # 下一个 token 的起始位置（CommonToken 构造时读取）
+        self.line = 1
+        self.column = 0
+        self._source_pair = (self, input)
+        self._master, self._id_re = compiled_patterns()
+
+    def getSourceName(self):
+        return self.inputStream.getSourceName()
+
+    def getInputStream(self):
+        return self.inputStream
+
+    # ---------------- 扫描 ----------------
+
+    def _advance(self, start: int, end: int, ttype: Optional[int]):
+        text = self._text
+        if ttype is None or ttype in _MULTILINE:
+            nl = text.count("\n", start, end)
+            if nl:
+                self.line += nl
+                self.column = end - text.rfind("\n", start, end) - 1
+                return
+        self.column += end - start
+
+    def _match(self, pos: int):
+        """(token 类型, 结束位置)；没有规则能匹配时返回 None"""
+        text = self._text
+        m = self._master.match(text, pos)
+        if m is None:
+            return None
+        ttype = _TYPES[m.lastgroup]
+        end = m.end()
+        if ttype in _ID_OVERLAP:
+            idm = self._id_re.match(text, pos)
+            if idm is not None:
+                id_end = idm.end()
+                if id_end > end or (id_end == end and ttype in _COMMENTS):
+                    return L.ID_IDENTIFIER, id_end
+        return ttype, end
+
+    def nextToken(self) -> Token:
+        text = self._text
+        n = len(text)
+        while self.pos < n:
+            start = self.pos
+            hit = self._match(start)
+            if hit is None:
+                end = self._error_end(start)
+                self._error(start, end)
+                self._advance(start, end, None)
+                self.pos = end
+                continue
+            ttype, end = hit
+            tok = CommonToken(
+                self._source_pair, ttype,
+                Token.HIDDEN_CHANNEL if ttype in _HIDDEN else Token.DEFAULT_CHANNEL,
+                start, end - 1,
+            )
+            tok.text = text[start:end]
+            self._advance(start, end, ttype)
+            self.pos = end
+            return tok
+
+        eof = CommonToken(self._source_pair, Token.EOF, Token.DEFAULT_CHANNEL, n, n - 1)
+        eof.text = "<EOF>"
+        return eof
+
+    def getAllTokens(self) -> List[Token]:
+        tokens = []
+        while True:
+            t = self.nextToken()
+            if t.type == Token.EOF:
+                return tokens
+            tokens.append(t)
+
+    def _error_end(self, pos: int) -> int:
+        """出错时跳到哪里：读过的前缀 + 第一个读不下去的字符（文件末尾时没有）"""
+        global _unclosed
+        if _unclosed is None:
+            _unclosed = {q: re.compile(p) for q, p in _UNCLOSED.items()}
+        text = self._text
+        pattern = _unclosed.get(text[pos])
+        if pattern is None:
+            return pos + 1
+        return min(pattern.match(text, pos).end() + 1, len(text))
+
+    def _error(self, start: int, end: int):
+        text = self._text[start:end]
+        text = text.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
+        msg = "token recognition error at: '" + text + "'"
+        self.getErrorListenerDispatch().syntaxError(self, None, self.line, self.column, msg, None)
+
+
+LEXERS = {
+    "antlr": MainLexer,
+    "fast": FastLexer,
+}
+
+
+def make_lexer(input_text: Source, kind: str = "antlr"):
+    try:
+        cls = LEXERS[kind]
+    except KeyError:
+        raise ValueError(f"unknown lexer: {kind}") from None
+    if cls is MainLexer:
+        # 预热过的 DFA（见 dfa_cache）
+        import dfa_cache
+        dfa_cache.ensure_loaded("lexer")
+    return cls(char_stream(input_text))
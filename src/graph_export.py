@@ -0,0 +1,542 @@
+from __future__ import annotations
+from bisect import bisect_right
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from ast_types import AstList, BindPhi, BlockInfo, Call, Function, Point
+from vg_emit import Emitter
+from vg_types import PhiNode, ValueGraph, ValueNode
+
+# ============================================================
+# BDG / value graph 的 Graphviz DOT / GraphML 导出，可只导出一部分
+#
+# 两种图都包装成同一个 view 接口（nodes / arcs / neighbors / key / kind ...）：
+#   BdgView  —— Point（定义）-> use（BindPhi），标 depth；与 bdg_debug 相同的图
+#   VgView   —— value -> phi（候选，标 depth）-> edge（输入标序号，transform 虚线）
+#               -> value（输出，粗线）
+#
+# 过滤（同时给出时取交集），箭头只在两端都保留时写出：
+#   blocks   —— 只保留这些 BlockInfo 子树里的节点（builtin / import 没有 block）
+#   kinds    —— 节点种类（point / symbol / builtin / import / use；
+#               literal / symbol / block / expr / phi / call / listdef / kvdef / fndef）
+#               或分组名（point / use；value / phi / edge）
+#   around   —— 离某个节点（如 v12、p3、use_7）不超过 radius 步的节点，不分方向
+#
+# builtin 折叠（默认）：每个用到 + / i32 的标识符都有一条来自 builtin 的箭头，
+# 大程序里它们是扇出最大的节点。折叠时不输出 builtin 节点和这些箭头，
+# 改为在被引用处的标签里列出名字；BFS 也不经过它们。
+# max_fan_in：同名绑定很多时，一个 use 的候选可以有上千个定义；
+# 每个节点只画前 N 条入边，其余合并成一个 "+K more" 节点。
+#
+# 输出是流式的：先遍历一遍节点，再遍历一遍箭头，边生成边写（经 Emitter 缓冲）。
+# 除 around 的 BFS 结果和反向邻接表（只有 around 时才建）外不保存中间结果。
+#
+#   python graph_export.py SOURCE [--graph bdg|vg] [--format dot|graphml] [-o OUT]
+#                          [--block N ...] [--kind K ...] [--around KEY --radius R]
+#                          [--expand-builtins] [--max-fan-in N]
+# ============================================================
+
+FORMATS = ["dot", "graphml"]
+
+GRAPHS = ["bdg", "vg"]
+
+# (起点, 终点, 标签, DOT style)
+Arc = Tuple[object, object, str, Optional[str]]
+
+
+def _join_builtins(names: Set[str]) -> str:
+    return "\nbuiltins: " + ", ".join(sorted(names)) if names else ""
+
+
+# ============================================================
+# BDG
+# ============================================================
+
+class BdgView:
+    def __init__(
+        self,
+        block_index: List[BlockInfo],
+        point_index: List[Point],
+        bindphi_index: List[BindPhi],
+        collapse_builtins: bool = True,
+    ):
+        self.block_index = block_index
+        self.point_index = point_index
+        self.bindphi_index = bindphi_index
+        self.collapse_builtins = collapse_builtins
+        self._reverse: Optional[Dict[int, List[BindPhi]]] = None
+        self._blocks: Optional[Dict[int, BlockInfo]] = None
+
+    def key(self, n) -> str:
+        return f"p{n.id}" if isinstance(n, Point) else f"use_{n.id}"
+
+    def group(self, n) -> str:
+        return "point" if isinstance(n, Point) else "use"
+
+    def kind(self, n) -> str:
+        return n.type if isinstance(n, Point) else "use"
+
+    def shape(self, n) -> str:
+        return "box" if isinstance(n, Point) else "ellipse"
+
+    def block(self, n) -> Optional[BlockInfo]:
+        if isinstance(n, BindPhi):
+            return n.scope
+        if n.block is not None or n.identifier is None:
+            return n.block
+        # list key 的 symbol point 不属于 block，按 key 在 AST 里的位置算
+        if self._blocks is None:
+            self._blocks = ast_blocks(self.block_index)
+        return self._blocks.get(id(n.identifier))
+
+    def is_builtin(self, n) -> bool:
+        return isinstance(n, Point) and n.type == "builtin"
+
+    def hidden(self, n) -> bool:
+        return self.collapse_builtins and self.is_builtin(n)
+
+    def label(self, n) -> str:
+        if isinstance(n, Point):
+            block_id = n.block.id if n.block else "None"
+            return f"Point#{n.id}\nname: {n.name}\nblock: {block_id}\ndefine_depth: {n.define_depth}"
+        builtins = set()
+        if self.collapse_builtins:
+            builtins = {pt.name for pts in n.candidates.values() for pt in pts if pt.type == "builtin"}
+        return f"use {n.name}\nBindPhi#{n.id}" + _join_builtins(builtins)
+
+    def nodes(self) -> Iterator[object]:
+        for p in self.point_index:
+            if not self.hidden(p):
+                yield p
+        yield from self.bindphi_index
+
+    def arcs(self) -> Iterator[Arc]:
+        for bp in self.bindphi_index:
+            for depth, defs in sorted(bp.candidates.items()):
+                for pt in sorted(defs, key=lambda p: p.id):
+                    if not self.hidden(pt):
+                        yield pt, bp, f"depth={depth}", None
+
+    def neighbors(self, n) -> Iterator[object]:
+        if isinstance(n, BindPhi):
+            for defs in n.candidates.values():
+                yield from defs
+            return
+        if self._reverse is None:
+            self._reverse = {}
+            for bp in self.bindphi_index:
+                for defs in bp.candidates.values():
+                    for pt in defs:
+                        self._reverse.setdefault(pt.id, []).append(bp)
+        yield from self._reverse.get(n.id, ())
+
+    def find(self, key: str):
+        if key.startswith("use_"):
+            table, k = self.bindphi_index, key[len("use_"):]
+        elif key.startswith("p"):
+            table, k = self.point_index, key[1:]
+        else:
+            return None
+        return next((n for n in table if str(n.id) == k), None)
+
+
+# ============================================================
+# value graph
+# ============================================================
+
+def ast_blocks(block_index: List[BlockInfo]) -> Dict[int, BlockInfo]:
+    """
+    id(AST 节点) -> 所在的 BlockInfo
+    函数体的语句属于函数体自己的 BlockInfo；函数体这个 Block 节点本身
+    （block value 的 ast）算在定义函数的那一层
+    """
+    index: Dict[int, BlockInfo] = {}
+    for bi in block_index:
+        stack = []
+        for stmt in bi.ast_block.stmts:
+            index[id(stmt)] = bi
+            stack.append(stmt.expr)
+            if stmt.target is not None:
+                stack.append(stmt.target)
+        while stack:
+            node = stack.pop()
+            index[id(node)] = bi
+            if isinstance(node, Call):
+                stack += (node.fn, node.arg)
+            elif isinstance(node, AstList):
+                for item in node.items:
+                    index[id(item)] = bi
+                    stack.append(item.value)
+                    if item.key is not None:
+                        stack.append(item.key)
+            elif isinstance(node, Function):
+                stack.append(node.params)
+                if node.ret is not None:
+                    stack.append(node.ret)
+                stack += node.ann
+                index[id(node.body)] = bi
+    return index
+
+
+def is_builtin_value(v: ValueNode) -> bool:
+    # connect_identifiers 给 builtin 建的 symbol 没有源码位置（dump 里的 <builtin>）
+    return v.kind == "symbol" and v.ast is not None and v.ast.getCstPointer() is None
+
+
+class VgView:
+    def __init__(self, graph: ValueGraph, block_index: List[BlockInfo], collapse_builtins: bool = True):
+        self.graph = graph
+        self.collapse_builtins = collapse_builtins
+        self._blocks = ast_blocks(block_index)
+        self._reverse: Optional[Dict[object, List[object]]] = None
+
+    def key(self, n) -> str:
+        if isinstance(n, ValueNode):
+            return f"v{n.id}"
+        if isinstance(n, PhiNode):
+            return f"p{n.id}"
+        return f"e{n.id}"
+
+    def group(self, n) -> str:
+        if isinstance(n, ValueNode):
+            return "value"
+        return "phi" if isinstance(n, PhiNode) else "edge"
+
+    def kind(self, n) -> str:
+        return "phi" if isinstance(n, PhiNode) else n.kind
+
+    def shape(self, n) -> str:
+        if isinstance(n, ValueNode):
+            return "box"
+        return "diamond" if isinstance(n, PhiNode) else "ellipse"
+
+    def block(self, n) -> Optional[BlockInfo]:
+        if isinstance(n, PhiNode):
+            if n.identifier is not None and id(n.identifier) in self._blocks:
+                return self._blocks[id(n.identifier)]
+            # 结构 phi 与它唯一的候选在同一层
+            for values in n.candidates.values():
+                for v in values:
+                    return self.block(v)
+            return None
+        return self._blocks.get(id(n.ast)) if n.ast is not None else None
+
+    def is_builtin(self, n) -> bool:
+        return isinstance(n, ValueNode) and is_builtin_value(n)
+
+    def hidden(self, n) -> bool:
+        if isinstance(n, ValueNode) and n.placeholder:
+            return True
+        return self.collapse_builtins and self.is_builtin(n)
+
+    def label(self, n) -> str:
+        if isinstance(n, ValueNode):
+            cst = n.ast.getCstPointer() if n.ast is not None else None
+            text = cst.get("text", "<rule>") if cst is not None else "<builtin>"
+            ast = n.ast.__class__.__name__ if n.ast is not None else None
+            return f"v{n.id} {n.kind} {ast}\n{text}"
+        if isinstance(n, PhiNode):
+            name = n.identifier.name if n.identifier is not None else "<not an identifier>"
+            builtins = set()
+            if self.collapse_builtins:
+                builtins = {v.ast.name for vs in n.candidates.values() for v in vs if is_builtin_value(v)}
+            return f"p{n.id} {name}" + _join_builtins(builtins)
+        return f"e{n.id} {n.kind}"
+
+    def nodes(self) -> Iterator[object]:
+        for v in self.graph.values:
+            if not self.hidden(v):
+                yield v
+        yield from self.graph.phis
+        yield from self.graph.edges
+
+    def arcs(self) -> Iterator[Arc]:
+        for p in self.graph.phis:
+            for depth, values in sorted(p.candidates.items()):
+                for v in sorted(values, key=lambda v: v.id):
+                    if not self.hidden(v):
+                        yield v, p, str(depth), None
+        for e in self.graph.edges:
+            if e.transform is not None:
+                yield e.transform, e, "fn", "dashed"
+            for k, p in enumerate(e.inputs):
+                yield p, e, str(k), None
+            yield e, e.output, "", "bold"
+
+    def neighbors(self, n) -> Iterator[object]:
+        if self._reverse is None:
+            self._reverse = {}
+            for a, b, _, _ in self.arcs():
+                self._reverse.setdefault(a, []).append(b)
+                self._reverse.setdefault(b, []).append(a)
+        yield from self._reverse.get(n, ())
+
+    def find(self, key: str):
+        tables = {"v": self.graph.values, "p": self.graph.phis, "e": self.graph.edges}
+        table = tables.get(key[:1])
+        if table is None:
+            return None
+        return next((n for n in table if str(n.id) == key[1:]), None)
+
+
+# ============================================================
+# 过滤
+# ============================================================
+
+def block_intervals(block_index: List[BlockInfo], ids: Iterable[int]) -> Tuple[List[int], List[int]]:
+    """
+    这些 block 子树的前序区间 [pre, post]，合并成按 pre 排序、互不相交的
+    (starts, ends)。子树区间要么嵌套要么不相交，被包含的直接丢掉；
+    之后判断一个 block 在不在任一子树里只要一次二分（in_intervals）
+    """
+    by_id = {bi.id: bi for bi in block_index}
+    starts: List[int] = []
+    ends: List[int] = []
+    for bi in sorted((by_id[i] for i in set(ids) if i in by_id), key=lambda b: b.pre):
+        if ends and bi.pre <= ends[-1]:
+            continue
+        starts.append(bi.pre)
+        ends.append(bi.post)
+    return starts, ends
+
+
+def in_intervals(intervals: Tuple[List[int], List[int]], bi: BlockInfo) -> bool:
+    starts, ends = intervals
+    k = bisect_right(starts, bi.pre) - 1
+    return k >= 0 and bi.pre <= ends[k]
+
+
+def within_radius(view, center, radius: int) -> Set[int]:
+    """center 周围 radius 步以内的节点（id(node)），不分方向"""
+    seen = {id(center)}
+    q = deque([(center, 0)])
+    while q:
+        n, d = q.popleft()
+        if d == radius:
+            continue
+        for m in view.neighbors(n):
+            if id(m) in seen or view.hidden(m):
+                continue
+            seen.add(id(m))
+            q.append((m, d + 1))
+    return seen
+
+
+def make_filter(
+    view,
+    block_index: List[BlockInfo],
+    blocks: Optional[Iterable[int]] = None,
+    kinds: Optional[Iterable[str]] = None,
+    around: Optional[str] = None,
+    radius: int = 2,
+) -> Callable[[object], bool]:
+    intervals = block_intervals(block_index, blocks) if blocks else None
+    kind_set = set(kinds) if kinds else None
+    near = None
+    if around is not None:
+        center = view.find(around)
+        if center is None:
+            raise ValueError(f"no node '{around}' in the graph")
+        if view.hidden(center):
+            raise ValueError(f"'{around}' is a placeholder or a collapsed builtin")
+        near = within_radius(view, center, radius)
+
+    def keep(n) -> bool:
+        if near is not None and id(n) not in near:
+            return False
+        if kind_set is not None and view.kind(n) not in kind_set and view.group(n) not in kind_set:
+            return False
+        if intervals is not None:
+            bi = view.block(n)
+            if bi is None or not in_intervals(intervals, bi):
+                return False
+        return True
+
+    return keep
+
+
+# ============================================================
+# 输出
+# ============================================================
+
+def _dot_str(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _xml_text(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+class _DotWriter:
+    def __init__(self, out: Emitter):
+        self.out = out
+
+    def header(self):
+        self.out.write(
+            "digraph G {\n"
+            "  rankdir=LR;\n"
+            '  node [fontname="monospace", fontsize=10];\n'
+            '  edge [fontname="monospace", fontsize=9];\n'
+        )
+
+    def node(self, key: str, shape: str, kind: str, label: str, block: Optional[int]):
+        self.out.write(f"  {key} [shape={shape}, label={_dot_str(label)}];\n")
+
+    def arc(self, a: str, b: str, label: str, style: Optional[str]):
+        attrs = []
+        if label:
+            attrs.append(f"label={_dot_str(label)}")
+        if style:
+            attrs.append(f"style={style}")
+        suffix = f" [{', '.join(attrs)}]" if attrs else ""
+        self.out.write(f"  {a} -> {b}{suffix};\n")
+
+    def footer(self):
+        self.out.write("}\n")
+
+
+class _GraphmlWriter:
+    def __init__(self, out: Emitter):
+        self.out = out
+
+    def header(self):
+        self.out.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '  <key id="kind" for="node" attr.name="kind" attr.type="string"/>\n'
+            '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+            '  <key id="block" for="node" attr.name="block" attr.type="int"/>\n'
+            '  <key id="arc" for="edge" attr.name="label" attr.type="string"/>\n'
+            '  <graph id="G" edgedefault="directed">\n'
+        )
+
+    def node(self, key: str, shape: str, kind: str, label: str, block: Optional[int]):
+        data = f'<data key="block">{block}</data>' if block is not None else ""
+        self.out.write(
+            f'    <node id="{key}"><data key="kind">{kind}</data>'
+            f'<data key="label">{_xml_text(label)}</data>{data}</node>\n'
+        )
+
+    def arc(self, a: str, b: str, label: str, style: Optional[str]):
+        data = f'<data key="arc">{_xml_text(label)}</data>' if label else ""
+        self.out.write(f'    <edge source="{a}" target="{b}">{data}</edge>\n')
+
+    def footer(self):
+        self.out.write("  </graph>\n</graphml>\n")
+
+
+_WRITERS = {
+    "dot": _DotWriter,
+    "graphml": _GraphmlWriter,
+}
+
+
+def export(
+    view,
+    f: TextIO,
+    fmt: str = "dot",
+    keep: Optional[Callable[[object], bool]] = None,
+    max_fan_in: int = 0,
+) -> Tuple[int, int]:
+    """
+    写出 view 中 keep 保留的部分，返回 (节点数, 箭头数)。
+    max_fan_in > 0 时每个节点最多画这么多条入边，其余的合并成一个
+    "+K more" 节点（在箭头之后写出）
+    """
+    try:
+        w = _WRITERS[fmt](Emitter(f))
+    except KeyError:
+        raise ValueError(f"unknown graph format: {fmt}") from None
+    keep = keep or (lambda n: True)
+
+    w.header()
+    nodes = arcs = 0
+    for n in view.nodes():
+        if keep(n):
+            bi = view.block(n)
+            w.node(view.key(n), view.shape(n), view.kind(n), view.label(n), bi.id if bi is not None else None)
+            nodes += 1
+
+    fan_in: Dict[int, int] = {}
+    overflow: Dict[str, int] = {}
+    for a, b, label, style in view.arcs():
+        if not (keep(a) and keep(b)):
+            continue
+        if max_fan_in > 0:
+            k = fan_in[id(b)] = fan_in.get(id(b), 0) + 1
+            if k > max_fan_in:
+                key = view.key(b)
+                overflow[key] = overflow.get(key, 0) + 1
+                continue
+        w.arc(view.key(a), view.key(b), label, style)
+        arcs += 1
+    for key, more in overflow.items():
+        w.node(f"more_{key}", "plaintext", "more", f"+{more} more", None)
+        w.arc(f"more_{key}", key, "", "dotted")
+        nodes += 1
+        arcs += 1
+
+    w.footer()
+    w.out.flush()
+    return nodes, arcs
+
+
+# ============================================================
+# main
+# ============================================================
+
+def main():
+    import argparse
+    import sys
+    from ast_to_bdg import build_bdg
+    from bdg_to_vg import build_value_graph
+    from cst_to_ast import build_ast
+    from fast_lexer import LEXERS
+    from src_to_cst import PARSERS, build_cst
+    from vg_prune import prune_value_graph
+
+    parser = argparse.ArgumentParser(description="Export (a slice of) the BDG or value graph as DOT / GraphML")
+    parser.add_argument("source", help="Source file")
+    parser.add_argument("--graph", choices=GRAPHS, default="vg")
+    parser.add_argument("--format", choices=FORMATS, default="dot")
+    parser.add_argument("-o", "--output", default=None, help="Output file (default: stdout)")
+    parser.add_argument("--block", type=int, action="append", help="Keep the subtree of this block id (repeatable)")
+    parser.add_argument("--kind", action="append", help="Keep nodes of this kind or group (repeatable)")
+    parser.add_argument("--around", help="Keep nodes near this one, e.g. v12, p3, use_7")
+    parser.add_argument("--radius", type=int, default=2, help="Hops for --around")
+    parser.add_argument("--expand-builtins", action="store_true", help="Draw builtin nodes and their fan-in")
+    parser.add_argument("--max-fan-in", type=int, default=100,
+                        help="Merge incoming arcs beyond N per node into one summary node (0: unlimited)")
+    parser.add_argument("--no-prune", action="store_true", help="Export the value graph before pruning")
+    parser.add_argument("--lexer", choices=sorted(LEXERS), default="antlr")
+    parser.add_argument("--parser", choices=PARSERS, default="antlr")
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        src = f.read()
+    ast = build_ast(build_cst(src, lexer=args.lexer, parser=args.parser), source=src)
+    bdg, block_index, point_index, bindphi_index = build_bdg(ast)
+    collapse = not args.expand_builtins
+    if args.graph == "bdg":
+        view = BdgView(block_index, point_index, bindphi_index, collapse)
+    else:
+        vg = build_value_graph(bdg, block_index, point_index, bindphi_index)
+        if not args.no_prune:
+            prune_value_graph(vg, block_index)
+        view = VgView(vg, block_index, collapse)
+
+    try:
+        keep = make_filter(view, block_index, args.block, args.kind, args.around, args.radius)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            nodes, arcs = export(view, f, args.format, keep, args.max_fan_in)
+    else:
+        nodes, arcs = export(view, sys.stdout, args.format, keep, args.max_fan_in)
+    print(f"{nodes} node(s), {arcs} arc(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ast_types import (
+    AstList, AstNode, BindPhi, Block, Call, Function, Identifier, ImportIdentifier,
+    ListItem, Point, Program, Stmt,
+)
+from source_map import SourceMap
+from source_span import SourceSpan
+
+# ============================================================
+# 编辑器查询用的索引：位置 -> AST 节点，定义 <-> 引用
+#
+# 每次编译建一次（build_bdg 之后），之后的查询都不用再遍历整棵树：
+#
+#   IntervalTree  —— AST 节点的 SourceSpan [start, end) 按 start 排序存成数组，
+#                    隐式平衡二叉树（区间 [lo, hi) 的根是中点），每个子树记
+#                    max(end)。stabbing 查询 O(log n + 命中数)
+#   uses          —— Point.id -> 引用它的 BindPhi 列表
+#
+# 一个 use 解析到哪些定义，与 type_infer 的 phi_values 一致：
+# 取 candidates 里 depth 最大的那一层（函数内的同名绑定遮住外层，
+# 源码里的绑定遮住 builtin / import / symbol）。
+#
+# 行号 1 起、列号 0 起，与 ANTLR / SourceMap 一致。要求 AST 用
+# build_ast(cst, source=...) 建（cstPointer 是 SourceSpan）；
+# 只有同一文件（file_id）的 span 进索引。
+# ============================================================
+
+# hover 最多列出几个定义（同名在同一块里重复绑定时会有很多）
+HOVER_DEFINITIONS = 8
+
+
+class IntervalTree:
+    """静态区间树；建好之后只读"""
+
+    def __init__(self, intervals: List[Tuple[int, int, object]]):
+        intervals = sorted(intervals, key=lambda iv: (iv[0], -iv[1]))
+        self.starts = [iv[0] for iv in intervals]
+        self.ends = [iv[1] for iv in intervals]
+        self.items = [iv[2] for iv in intervals]
+        n = len(intervals)
+        # max_end[mid]：以 mid 为根的子树 [lo, hi) 里最大的 end
+        self.max_end = [0] * n
+
+        def build(lo: int, hi: int) -> int:
+            if lo >= hi:
+                return -1
+            mid = (lo + hi) // 2
+            m = self.ends[mid]
+            left = build(lo, mid)
+            right = build(mid + 1, hi)
+            if left > m:
+                m = left
+            if right > m:
+                m = right
+            self.max_end[mid] = m
+            return m
+
+        build(0, n)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def stab(self, x: int) -> Iterator[object]:
+        """所有满足 start <= x < end 的区间，按 start 升序"""
+        starts, ends, items, max_end = self.starts, self.ends, self.items, self.max_end
+        out: List[Tuple[int, object]] = []
+        stack = [(0, len(items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_end[mid] <= x:
+                continue
+            stack.append((lo, mid))
+            if starts[mid] <= x:
+                if x < ends[mid]:
+                    out.append((mid, items[mid]))
+                stack.append((mid + 1, hi))
+        out.sort(key=lambda hit: hit[0])
+        return (item for _, item in out)
+
+
+def resolved_points(bp: BindPhi) -> List[Point]:
+    """use 实际指向的定义：depth 最大的那层候选"""
+    if not bp.candidates:
+        return []
+    return sorted(bp.candidates[max(bp.candidates)], key=lambda p: p.id)
+
+
+def _start(node) -> int:
+    span = node.getCstPointer()
+    return span.start if isinstance(span, SourceSpan) else -1
+
+
+def ast_children(node) -> Iterator[AstNode]:
+    if isinstance(node, Program):
+        yield node.block
+    elif isinstance(node, Block):
+        yield from node.stmts
+    elif isinstance(node, Stmt):
+        if node.target is not None:
+            yield node.target
+        yield node.expr
+    elif isinstance(node, Call):
+        yield node.fn
+        yield node.arg
+    elif isinstance(node, AstList):
+        yield from node.items
+    elif isinstance(node, ListItem):
+        if node.key is not None:
+            yield node.key
+        yield node.value
+    elif isinstance(node, Function):
+        yield node.params
+        if node.ret is not None:
+            yield node.ret
+        yield from node.ann
+        yield node.body
+
+
+class IdeIndex:
+    def __init__(
+        self,
+        ast: Program,
+        point_index: List[Point],
+        bindphi_index: List[BindPhi],
+        source_map: SourceMap,
+        file_id: int = 0,
+        inference=None,
+    ):
+        self.source_map = source_map
+        self.file_id = file_id
+        self.inference = inference
+
+        # 节点在树里的深度：同一区间上有多个节点（Stmt 和它的 expr）时取更深的
+        self._depth: Dict[int, int] = {}
+        intervals = []
+        stack = [(ast, 0)]
+        while stack:
+            node, depth = stack.pop()
+            span = node.getCstPointer()
+            if isinstance(span, SourceSpan) and span.file_id == file_id and span.end > span.start:
+                self._depth[id(node)] = depth
+                intervals.append((span.start, span.end, node))
+            for child in ast_children(node):
+                stack.append((child, depth + 1))
+        self.tree = IntervalTree(intervals)
+
+        # 按 use 在源码里的位置顺序加入，每个列表天然有序
+        self.uses: Dict[int, List[BindPhi]] = {}
+        for bp in sorted(bindphi_index, key=lambda bp: _start(bp.entry)):
+            if bp.candidates:
+                for p in bp.candidates[max(bp.candidates)]:
+                    self.uses.setdefault(p.id, []).append(bp)
+        self.points = point_index
+        # references 的结果按 (include_definitions, 定义集合) 缓存；索引建好后不变
+        self._refs: Dict[tuple, List[Identifier]] = {}
+
+        # hover 显示类型：AST -> 第一个以它为 ast 的 value（与 vg_prune 相同）
+        self._values = None
+        if inference is not None:
+            self._values = {}
+            for v in inference.graph.values:
+                if v.ast is not None:
+                    self._values.setdefault(id(v.ast), v)
+
+    # ---------------- 位置 ----------------
+
+    def offset(self, line: int, column: int) -> int:
+        return self.source_map.offset(line, column)
+
+    @staticmethod
+    def location(node) -> Optional[Tuple[int, int]]:
+        span = node.getCstPointer() if node is not None else None
+        if span is None:
+            return None
+        if span["node-type"] == "token":
+            return span["line"], span["column"]
+        start = span["start"]
+        return start["line"], start["column"]
+
+    def nodes_at(self, line: int, column: int) -> List[AstNode]:
+        """覆盖该位置的所有节点，由外到内"""
+        hits = list(self.tree.stab(self.offset(line, column)))
+        hits.sort(key=lambda n: (-(n.getCstPointer().end - n.getCstPointer().start), self._depth[id(n)]))
+        return hits
+
+    def node_at(self, line: int, column: int) -> Optional[AstNode]:
+        """覆盖该位置的最内层节点"""
+        best = None
+        best_key = None
+        for n in self.tree.stab(self.offset(line, column)):
+            span = n.getCstPointer()
+            key = (span.end - span.start, -self._depth[id(n)])
+            if best_key is None or key < best_key:
+                best, best_key = n, key
+        return best
+
+    def identifier_at(self, line: int, column: int) -> Optional[Identifier]:
+        """光标在标识符上或紧跟在它后面"""
+        for col in (column, column - 1):
+            if col < 0:
+                break
+            n = self.node_at(line, col)
+            if isinstance(n, Identifier):
+                return n
+        return None
+
+    # ---------------- 定义 / 引用 ----------------
+
+    def definitions(self, line: int, column: int) -> List[Point]:
+        ident = self.identifier_at(line, column)
+        if ident is None:
+            return []
+        if ident.point is not None:
+            return [ident.point]
+        if ident.bindphi is not None:
+            return resolved_points(ident.bindphi)
+        return []
+
+    def uses_of(self, point: Point) -> List[BindPhi]:
+        return self.uses.get(point.id, [])
+
+    def references(self, line: int, column: int, include_definitions: bool = False) -> List[Identifier]:
+        """光标处标识符所指绑定的所有引用（按位置排序）"""
+        points = self.definitions(line, column)
+        key = (include_definitions,) + tuple(p.id for p in points)
+        out = self._refs.get(key)
+        if out is not None:
+            return out
+        if len(points) == 1 and not include_definitions:
+            out = [bp.entry for bp in self.uses_of(points[0])]
+        else:
+            # 同一块里对同名的多次绑定都在同一层，每个 use 会解析到全部，
+            # 各定义的 use 列表大量重叠：先按 BindPhi 去重再排序
+            found: Dict[int, Identifier] = {}
+            for p in points:
+                if include_definitions and p.identifier.getCstPointer() is not None:
+                    found[id(p.identifier)] = p.identifier
+                for bp in self.uses_of(p):
+                    found[id(bp.entry)] = bp.entry
+            out = sorted(found.values(), key=_start)
+        self._refs[key] = out
+        return out
+
+    # ---------------- hover ----------------
+
+    def _describe(self, p: Point) -> str:
+        if p.type == "builtin":
+            return f"{p.name}: builtin"
+        if p.type == "import":
+            return f"{p.name}: imported from {p.identifier.module}" if isinstance(p.identifier, ImportIdentifier) \
+                else f"{p.name}: imported"
+        where = self.location(p.identifier)
+        at = f" at {where[0]}:{where[1]}" if where else ""
+        kind = "list key" if p.type == "symbol" else "binding"
+        return f"{p.name}: {kind}{at}, {len(self.uses_of(p))} use(s)"
+
+    def _type_of(self, node) -> Optional[str]:
+        if self._values is None:
+            return None
+        v = self._values.get(id(node))
+        if v is None:
+            return None
+        tid, ctype, _ = self.inference.info(v)
+        t = self.inference.table
+        return t.render(tid) + (f" = {t.render(ctype)}" if ctype is not None else "")
+
+    def hover(self, line: int, column: int) -> Optional[str]:
+        ident = self.identifier_at(line, column)
+        node = ident or self.node_at(line, column)
+        if node is None:
+            return None
+        lines = []
+        if ident is not None:
+            points = self.definitions(line, column)
+            lines += [self._describe(p) for p in points[:HOVER_DEFINITIONS]] or [f"{ident.name}: unresolved"]
+            if len(points) > HOVER_DEFINITIONS:
+                lines.append(f"... {len(points) - HOVER_DEFINITIONS} more binding(s)")
+            target = points[0].stmt.expr if len(points) == 1 and points[0].stmt is not None else ident
+        else:
+            span = node.getCstPointer()
+            lines.append(f"{node.__class__.__name__} ({span.name})")
+            target = node
+        t = self._type_of(target)
+        if t is not None:
+            lines.append(f"type: {t}")
+        return "\n".join(lines)
+
@@ -0,0 +1,455 @@
+from __future__ import annotations
+from typing import List, Optional, Tuple
+
+from antlr4.error.ErrorListener import ErrorListener
+
+from WarpedTokenStream import WarpedTokenStream
+from ast_to_bdg import build_bdg, clear_bdg
+from ast_types import Block, Program, Stmt
+from cst_to_ast import build_statements
+from fast_lexer import make_lexer
+from grammar.MainLexer import MainLexer
+from ide_index import IdeIndex, ast_children
+from source_map import SourceMap
+from source_span import SourceSpan
+from src_to_cst import _eof_at, _split_statements, build_statement_cst
+
+# ============================================================
+# 增量重解析（lang_server 用）
+#
+# 文档按顶层语句切成 chunk：上一个顶层 ; 之后到自己的 ; 为止（前面的
+# 空白 / 注释归它）；最后一个 chunk 是最后一个 ; 之后的剩余部分（可能为空，
+# 也可能是没写 ; 的最后一条语句）。切分与恢复模式相同
+# （src_to_cst._split_statements：未闭合的 ( / [ 遇到 ; 视为结束）。
+#
+# 编辑 [a, b) 只重新 lex / parse 覆盖 a 和 b-1 的那几个 chunk：
+#   - chunk 从顶层 ; 之后开始：lexer 没有 mode，; 是单字符 token，
+#     WarpedTokenStream 遇到 ; 时关掉没闭合的 ( / [（与 _split_statements
+#     同一规则），所以模式栈此时一定是 [BLOCK]、前一个 token 不是 )：
+#     单独 lex 这一段和整篇 lex 得到的 token 相同，结果与编辑历史无关
+#   - 新的一段仍须以顶层 ; 结尾（到文件末尾的除外）；删掉了 ;、打开了
+#     字符串或括号时向后并入 1, 2, 4 ... 个 chunk 再试
+#   - 其余 chunk 的 AST 原样复用，SourceSpan 在需要整棵 AST 时（program()）
+#     按 chunk 的新起点整体平移，不重建
+# chunk 分页存放（每页记字符数和换行数），按偏移 / 行号定位一个 chunk
+# 是 O(页数 + 页大小)，编辑时不用平移后面所有 chunk 的位置。
+#
+# 没有语法错误时 program() 的语句与 build_ast(build_cst(全文)) 相同；
+# 出错的顶层语句不进 AST（同恢复模式），错误见 diagnostics()。
+# build_bdg / IdeIndex 是全程序的，只在查询时重建（index()）。
+# ============================================================
+
+PAGE_SIZE = 256
+
+# (字符偏移, 行号, 列号)，行号 1 起、列号 0 起
+Position = Tuple[int, int, int]
+
+START: Position = (0, 1, 0)
+
+
+class Chunk:
+    __slots__ = ("text", "newlines", "stmt", "spans", "errors", "base")
+
+    def __init__(self, text: str, stmt: Optional[Stmt], spans: List[SourceSpan],
+                 errors: List[Tuple[int, int, str]], base: Position):
+        self.text = text
+        self.newlines = text.count("\n")
+        self.stmt = stmt        # 语法错误、只有空白 / 注释时为 None
+        self.spans = spans      # stmt 子树里的 SourceSpan（去重）
+        self.errors = errors    # [(chunk 内偏移, 长度, 消息)]
+        self.base = base        # spans 当前对应的 chunk 起点
+
+
+class _Page:
+    __slots__ = ("chunks", "chars", "newlines")
+
+    def __init__(self, chunks: List[Chunk]):
+        self.chunks = chunks
+        self.update()
+
+    def update(self):
+        self.chars = sum(len(c.text) for c in self.chunks)
+        self.newlines = sum(c.newlines for c in self.chunks)
+
+
+def _paginate(chunks: List[Chunk]) -> List[_Page]:
+    """每页 PAGE_SIZE 到 2 * PAGE_SIZE 个 chunk"""
+    k = max(1, len(chunks) // PAGE_SIZE)
+    size = max(1, -(-len(chunks) // k))
+    return [_Page(chunks[i:i + size]) for i in range(0, len(chunks), size)] or [_Page([])]
+
+
+def _advance(pos: Position, text: str, newlines: int) -> Position:
+    off, line, col = pos
+    if newlines:
+        return off + len(text), line + newlines, len(text) - text.rfind("\n") - 1
+    return off + len(text), line, col + len(text)
+
+
+def _shift(spans: List[SourceSpan], old: Position, new: Position):
+    """chunk 起点从 old 移到 new：偏移、行号整体平移，和起点同一行的列号也平移"""
+    d_off, d_line, d_col = new[0] - old[0], new[1] - old[1], new[2] - old[2]
+    if not (d_off or d_line or d_col):
+        return
+    line0 = old[1]
+    for s in spans:
+        s.start += d_off
+        s.end += d_off
+        if s.line is not None:
+            if s.line == line0:
+                s.column += d_col
+            s.line += d_line
+        if s.end_line is not None:
+            if s.end_line == line0:
+                s.end_column += d_col
+            s.end_line += d_line
+
+
+def _spans_of(stmt: Stmt) -> List[SourceSpan]:
+    seen = {}
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        span = node.getCstPointer()
+        if span is not None:
+            seen[id(span)] = span
+        stack.extend(ast_children(node))
+    return list(seen.values())
+
+
+def _token_message(tok) -> str:
+    name = MainLexer.symbolicNames[tok.type] if tok.type >= 0 else "EOF"
+    return f"Syntax Error: Unexpect {name} token `{tok.text}`"
+
+
+class _LexErrors(ErrorListener):
+    def __init__(self, errors: list):
+        self.errors = errors
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.errors.append((line, column, f"Lexer Error: {msg}"))
+
+
+class Document:
+    def __init__(self, text: str = "", file_id: int = 0, lexer: str = "antlr", parser: str = "rd"):
+        self.file_id = file_id
+        self.lexer = lexer
+        self.parser = parser
+        self.version = 0
+        self.length = len(text)
+        # 最近一次 edit：重新解析的 chunk 数 / 产出的 chunk 数 / 重新 lex 的字符数
+        self.last_edit: Optional[dict] = None
+        self.pages = _paginate(self._parse_region(text, START, True))
+        self._invalidate()
+
+    def _invalidate(self):
+        self._text: Optional[str] = None
+        self._source_map: Optional[SourceMap] = None
+        self._program: Optional[Program] = None
+        self._index: Optional[IdeIndex] = None
+
+    # ---------------- 解析一段 ----------------
+
+    def _parse_region(self, text: str, base: Position, at_eof: bool) -> Optional[List[Chunk]]:
+        """
+        text 从 base 开始（紧跟在顶层 ; 之后或文件开头）；不到文件末尾时
+        必须以顶层 ; 结尾，否则返回 None
+        """
+        lexer = make_lexer(text, self.lexer)
+        lexer.removeErrorListeners()
+        lex_errors = []
+        lexer.addErrorListener(_LexErrors(lex_errors))
+        stream = WarpedTokenStream(lexer)
+        stream.fill()
+        tokens = stream.tokens[:-1]
+        n = len(tokens)
+        ranges = _split_statements(tokens, 0, n)
+        if not at_eof and not (
+            ranges and ranges[-1][1] == n - 1
+            and tokens[-1].type == MainLexer.SEMICOLON and tokens[-1].stop + 1 == len(text)
+        ):
+            return None
+
+        # (text 起, text 止, 语句 token, 其后的 ;)
+        pieces = []
+        pos = 0
+        for s, e in ranges:
+            if e < n:
+                end = tokens[e].stop + 1
+                pieces.append((pos, end, tokens[s:e], tokens[e]))
+                pos = end
+            else:
+                pieces.append((pos, len(text), tokens[s:e], None))
+                pos = len(text)
+        if at_eof and (not pieces or pieces[-1][3] is not None):
+            pieces.append((pos, len(text), [], None))
+
+        region_map = SourceMap(text)
+        parsed = []
+        for lo, hi, toks, semi in pieces:
+            errors = []
+            stmt = None
+            if toks:
+                eof = _eof_at(semi) if semi is not None else stream.tokens[-1]
+                cst, bad = build_statement_cst(toks, eof, self.parser)
+                if cst is None:
+                    if bad is eof and semi is not None:
+                        bad = semi
+                    errors.append((bad.start - lo, len(bad.text or ""), _token_message(bad)))
+                else:
+                    # build_ast 对个别能解析的写法会断言失败；整篇编译时直接报错退出，
+                    # 这里只让这一条语句带上错误
+                    try:
+                        stmt = build_statements([cst], text, self.file_id, region_map)[0]
+                    except (AssertionError, ValueError, NotImplementedError) as e:
+                        detail = f": {e}" if str(e) else ""
+                        errors.append((toks[0].start - lo, len(toks[0].text or ""),
+                                       f"AST Error: {type(e).__name__}{detail}"))
+            elif semi is not None:
+                errors.append((semi.start - lo, 1, _token_message(semi)))
+            parsed.append((lo, hi, stmt, errors))
+
+        for line, column, msg in lex_errors:
+            off = region_map.offset(line, column)
+            for lo, hi, _, errors in parsed:
+                if off < hi or hi == len(text):
+                    errors.append((off - lo, 1, msg))
+                    break
+
+        chunks = []
+        pos = base
+        for lo, hi, stmt, errors in parsed:
+            piece = text[lo:hi]
+            spans = _spans_of(stmt) if stmt is not None else []
+            # build_statements 的 span 相对于 text 的开头
+            _shift(spans, START, base)
+            chunk = Chunk(piece, stmt, spans, errors, pos)
+            chunks.append(chunk)
+            pos = _advance(pos, piece, chunk.newlines)
+        return chunks
+
+    # ---------------- 定位 ----------------
+
+    def _column_before(self, pi: int, ci: int) -> int:
+        """(pi, ci) 这个 chunk 起点的列号：向前找到最近的换行"""
+        col = 0
+        while True:
+            ci -= 1
+            if ci < 0:
+                pi -= 1
+                if pi < 0:
+                    return col
+                ci = len(self.pages[pi].chunks) - 1
+                if ci < 0:
+                    continue
+            text = self.pages[pi].chunks[ci].text
+            nl = text.rfind("\n")
+            if nl >= 0:
+                return col + len(text) - nl - 1
+            col += len(text)
+
+    def _locate(self, offset: int) -> Tuple[int, int, Position]:
+        """包含 offset 的 chunk：(页号, 页内下标, chunk 起点)；offset 在末尾时是最后一个 chunk"""
+        off, line = 0, 1
+        last = len(self.pages) - 1
+        for pi, page in enumerate(self.pages):
+            if offset < off + page.chars or pi == last:
+                break
+            off += page.chars
+            line += page.newlines
+        chunks = page.chunks
+        for ci, c in enumerate(chunks):
+            if offset < off + len(c.text) or ci == len(chunks) - 1:
+                break
+            off += len(c.text)
+            line += c.newlines
+        return pi, ci, (off, line, self._column_before(pi, ci))
+
+    def offset(self, line: int, column: int) -> int:
+        """行号 1 起、列号 0 起（按字符）-> 偏移，同 SourceMap.offset"""
+        if line < 1:
+            return 0
+        need = line - 1
+        off = 0
+        if need:
+            for page in self.pages:
+                if page.newlines >= need:
+                    break
+                need -= page.newlines
+                off += page.chars
+            else:
+                return self.length
+            for c in page.chunks:
+                if c.newlines >= need:
+                    break
+                need -= c.newlines
+                off += len(c.text)
+            i = -1
+            for _ in range(need):
+                i = c.text.find("\n", i + 1)
+            off += i + 1
+        return min(off + column, self.length)
+
+    def line_text(self, line: int) -> str:
+        """第 line 行（1 起）的文本，不含换行；只拼接这一行所在的 chunk"""
+        start, end = self.offset(line, 0), self.offset(line + 1, 0)
+        if start >= end:
+            return ""
+        pi, ci, (base, _, _) = self._locate(start)
+        parts = []
+        off = base
+        for c in self._chunks_from(pi, ci):
+            parts.append(c.text)
+            off += len(c.text)
+            if off >= end:
+                break
+        text = "".join(parts)[start - base:end - base]
+        return text[:-1] if text.endswith("\n") else text
+
+    def _chunks_from(self, pi: int, ci: int):
+        for page in self.pages[pi:]:
+            yield from page.chunks[ci:]
+            ci = 0
+
+    # ---------------- 编辑 ----------------
+
+    def edit(self, start: int, end: int, text: str):
+        """把 [start, end) 替换成 text（偏移按字符）"""
+        if not 0 <= start <= end <= self.length:
+            raise ValueError(f"edit range [{start}, {end}) outside document of length {self.length}")
+        pi, ci, base = self._locate(start)
+        total = sum(len(p.chunks) for p in self.pages[pi:]) - ci
+        chunks = self._chunks_from(pi, ci)
+        taken = []
+        region_end = base[0]
+        last = max(start, end - 1)
+        while not taken or region_end <= last:
+            c = next(chunks, None)
+            if c is None:
+                break
+            taken.append(c)
+            region_end += len(c.text)
+
+        grow = 1
+        while True:
+            at_eof = len(taken) == total
+            old = "".join(c.text for c in taken)
+            new = old[:start - base[0]] + text + old[end - base[0]:]
+            parsed = self._parse_region(new, base, at_eof)
+            if parsed is not None:
+                break
+            for _ in range(grow):
+                c = next(chunks, None)
+                if c is None:
+                    break
+                taken.append(c)
+            grow *= 2
+
+        self._splice(pi, ci, len(taken), parsed)
+        self.length += len(text) - (end - start)
+        self.version += 1
+        self.last_edit = {"reparsed": len(taken), "chunks": len(parsed), "chars": len(new)}
+        self._invalidate()
+
+    def edit_range(self, start_line: int, start_column: int, end_line: int, end_column: int, text: str):
+        self.edit(self.offset(start_line, start_column), self.offset(end_line, end_column), text)
+
+    def _splice(self, pi: int, ci: int, count: int, chunks: List[Chunk]):
+        pages = self.pages
+        p = pi
+        lo = ci
+        while count:
+            page = pages[p]
+            take = min(count, len(page.chunks) - lo)
+            del page.chunks[lo:lo + take]
+            count -= take
+            p += 1
+            lo = 0
+        pages[pi].chunks[ci:ci] = chunks
+        hi = max(p, pi + 1)
+        pages[pi:hi] = _paginate([c for page in pages[pi:hi] for c in page.chunks])
+
+    # ---------------- 整篇 ----------------
+
+    def chunks(self):
+        for page in self.pages:
+            yield from page.chunks
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(c.text for c in self.chunks())
+        return self._text
+
+    @property
+    def source_map(self) -> SourceMap:
+        if self._source_map is None:
+            self._source_map = SourceMap(self.text)
+        return self._source_map
+
+    def program(self) -> Program:
+        """整棵 AST；复用的语句在这里把 span 平移到当前位置"""
+        if self._program is not None:
+            return self._program
+        stmts = []
+        last = None
+        pos = START
+        tail = self.pages[-1].chunks[-1]
+        for c in self.chunks():
+            nxt = _advance(pos, c.text, c.newlines)
+            if c.stmt is not None:
+                if c.base != pos:
+                    _shift(c.spans, c.base, pos)
+                    c.base = pos
+                stmts.append(c.stmt)
+                # block 的最后一个 token：语句后的 ;（除最后一个 chunk 外都以它结尾），
+                # 或没写 ; 的最后一条语句本身
+                if c is not tail:
+                    last = (nxt[0], nxt[1], nxt[2] - 1)
+                else:
+                    span = c.stmt.getCstPointer()
+                    last = (span.end, span.end_line, span.end_column)
+            pos = nxt
+
+        block = Block(stmts)
+        for stmt in stmts:
+            stmt.setParent(block)
+        if stmts:
+            head = stmts[0].getCstPointer()
+            start, line, column = head.start, head.line, head.column
+            end, end_line, end_column = last
+        else:
+            start, line, column, end, end_line, end_column = 0, None, None, 0, None, None
+        block.setCstPointer(SourceSpan(self.file_id, start, max(start, end), line, column,
+                                       end_line, end_column, "rule", "block"))
+        program = Program(block)
+        block.setParent(program)
+        program.setCstPointer(SourceSpan(self.file_id, start, self.length, line, column,
+                                         end_line, end_column, "rule", "program"))
+        self._program = program
+        return program
+
+    def index(self) -> IdeIndex:
+        """当前版本的 IdeIndex；build_bdg 在整棵 AST 上重跑"""
+        if self._index is None:
+            program = self.program()
+            clear_bdg(program)
+            program, _, point_index, bindphi_index = build_bdg(program)
+            self._index = IdeIndex(program, point_index, bindphi_index, self.source_map, self.file_id)
+        return self._index
+
+    def diagnostics(self) -> List[dict]:
+        """[{line, column, length, message}]，按位置排序"""
+        out = []
+        pos = START
+        for c in self.chunks():
+            for rel, length, message in c.errors:
+                nl = c.text.count("\n", 0, rel)
+                if nl:
+                    line, column = pos[1] + nl, rel - c.text.rfind("\n", 0, rel) - 1
+                else:
+                    line, column = pos[1], pos[2] + rel
+                out.append({"line": line, "column": column, "length": length, "message": message})
+            pos = _advance(pos, c.text, c.newlines)
+        out.sort(key=lambda d: (d["line"], d["column"]))
+        return out
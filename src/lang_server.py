@@ -0,0 +1,305 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, Optional
+
+from fast_lexer import LEXERS
+from incremental import Document
+from source_span import SourceSpan
+from src_to_cst import PARSERS
+
+# ============================================================
+# 语言服务器：stdio 上的 LSP（JSON-RPC，Content-Length 分帧）
+#
+#   python lang_server.py [--lexer fast] [--parser antlr] [--log FILE]
+#
+# 每个打开的文件是一个 incremental.Document：didChange 的增量修改只重新
+# lex / parse 改到的顶层语句。definition / references / hover 用 ide_index，
+# 某个版本第一次查询时才在整棵 AST 上跑 build_bdg 建索引。
+#
+# 行号：LSP 0 起，Document / IdeIndex 1 起。Document / IdeIndex 的列按 Unicode
+# 字符算。initialize 时看客户端的 general.positionEncodings：列出了 "utf-32"
+# 就声明它，列直接就是字符下标；否则按 LSP 默认的 UTF-16，收到的位置先换成
+# 字符下标，发出的位置换回 UTF-16 code unit（只在这一行有 BMP 以外的字符时
+# 两者才不同）。
+#
+# 方法：initialize / initialized / shutdown / exit
+#       textDocument/didOpen / didChange / didClose（之后推送 publishDiagnostics）
+#       textDocument/definition / references / hover
+# ============================================================
+
+log = logging.getLogger(__name__)
+
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+def read_message(f) -> Optional[dict]:
+    """读一条消息；输入结束时返回 None"""
+    length = None
+    while True:
+        line = f.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    if length is None:
+        return None
+    return json.loads(f.read(length).decode("utf-8"))
+
+
+def utf16_to_chars(line: str, units: int) -> int:
+    """line 里前 units 个 UTF-16 code unit 对应的字符数"""
+    if line.isascii():
+        return units
+    chars = 0
+    for ch in line:
+        if units <= 0:
+            break
+        units -= 2 if ord(ch) > 0xFFFF else 1
+        chars += 1
+    # 行尾之后（LSP 允许）按一个字符一个 unit 算
+    return chars + max(0, units)
+
+
+def chars_to_utf16(line: str, chars: int) -> int:
+    """line 里前 chars 个字符占的 UTF-16 code unit 数"""
+    if line.isascii():
+        return chars
+    head = line[:chars]
+    return len(head) + sum(1 for ch in head if ord(ch) > 0xFFFF) + max(0, chars - len(line))
+
+
+def write_message(f, message: dict):
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    f.write(b"Content-Length: %d\r\n\r\n" % len(body))
+    f.write(body)
+    f.flush()
+
+
+class LanguageServer:
+    def __init__(self, out, lexer: str = "antlr", parser: str = "rd"):
+        self.out = out
+        self.lexer = lexer
+        self.parser = parser
+        self.documents: Dict[str, Document] = {}
+        self.running = True
+        self.shut_down = False
+        # initialize 协商：False 时与客户端之间的列是 UTF-16 code unit
+        self.utf32 = False
+
+    # ---------------- 分发 ----------------
+
+    def handle(self, message: dict):
+        method = message.get("method")
+        msg_id = message.get("id")
+        handler = _HANDLERS.get(method)
+        if handler is None:
+            # 未知的通知直接忽略（包括 $/ 开头的）
+            if msg_id is not None:
+                self.send({"jsonrpc": "2.0", "id": msg_id,
+                           "error": {"code": METHOD_NOT_FOUND, "message": f"method not found: {method}"}})
+            return
+        t0 = time.perf_counter()
+        try:
+            result = handler(self, message.get("params") or {})
+        except Exception as e:
+            log.exception("%s failed", method)
+            if msg_id is not None:
+                self.send({"jsonrpc": "2.0", "id": msg_id,
+                           "error": {"code": INTERNAL_ERROR, "message": str(e)}})
+            return
+        log.debug("%s %.2f ms", method, (time.perf_counter() - t0) * 1000)
+        if msg_id is not None:
+            self.send({"jsonrpc": "2.0", "id": msg_id, "result": result})
+
+    def send(self, message: dict):
+        write_message(self.out, message)
+
+    # ---------------- 生命周期 ----------------
+
+    def initialize(self, params: dict) -> dict:
+        general = (params.get("capabilities") or {}).get("general") or {}
+        self.utf32 = "utf-32" in (general.get("positionEncodings") or ())
+        return {
+            "capabilities": {
+                "positionEncoding": "utf-32" if self.utf32 else "utf-16",
+                # 2 = Incremental
+                "textDocumentSync": {"openClose": True, "change": 2},
+                "definitionProvider": True,
+                "referencesProvider": True,
+                "hoverProvider": True,
+            },
+            "serverInfo": {"name": "yafl-lang-server"},
+        }
+
+    def initialized(self, params: dict):
+        return None
+
+    def shutdown(self, params: dict):
+        self.shut_down = True
+        return None
+
+    def exit(self, params: dict):
+        self.running = False
+
+    # ---------------- 文档同步 ----------------
+
+    def did_open(self, params: dict):
+        item = params["textDocument"]
+        self.documents[item["uri"]] = Document(item["text"], lexer=self.lexer, parser=self.parser)
+        self.publish(item["uri"])
+
+    def did_change(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        doc = self.documents[uri]
+        for change in params["contentChanges"]:
+            r = change.get("range")
+            if r is None:
+                doc = self.documents[uri] = Document(change["text"], lexer=self.lexer, parser=self.parser)
+                continue
+            start_line, end_line = r["start"]["line"] + 1, r["end"]["line"] + 1
+            doc.edit_range(
+                start_line, self._to_chars(doc, start_line, r["start"]["character"]),
+                end_line, self._to_chars(doc, end_line, r["end"]["character"]),
+                change["text"],
+            )
+            log.debug("edit v%d %s", doc.version, doc.last_edit)
+        self.publish(uri)
+
+    def did_close(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        self.documents.pop(uri, None)
+        self.send({"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+                   "params": {"uri": uri, "diagnostics": []}})
+
+    # ---------------- 列的编码 ----------------
+
+    def _to_chars(self, doc: Document, line: int, column: int) -> int:
+        """客户端的列 -> 字符下标；line 1 起"""
+        if self.utf32:
+            return column
+        return utf16_to_chars(doc.line_text(line), column)
+
+    def _to_client(self, doc: Document, line: int, column: int) -> int:
+        """字符下标 -> 客户端的列；line 1 起"""
+        if self.utf32:
+            return column
+        return chars_to_utf16(doc.line_text(line), column)
+
+    def publish(self, uri: str):
+        doc = self.documents[uri]
+        diagnostics = []
+        for d in doc.diagnostics():
+            line = d["line"] - 1
+            start = self._to_client(doc, d["line"], d["column"])
+            end = self._to_client(doc, d["line"], d["column"] + max(1, d["length"]))
+            diagnostics.append({
+                "range": {
+                    "start": {"line": line, "character": start},
+                    "end": {"line": line, "character": end},
+                },
+                "severity": 1,
+                "source": "yafl",
+                "message": d["message"],
+            })
+        self.send({"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+                   "params": {"uri": uri, "diagnostics": diagnostics}})
+
+    # ---------------- 查询 ----------------
+
+    def _at(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        pos = params["position"]
+        doc = self.documents[uri]
+        line = pos["line"] + 1
+        return uri, doc, doc.index(), line, self._to_chars(doc, line, pos["character"])
+
+    def _location(self, uri: str, doc: Document, node) -> Optional[dict]:
+        span = node.getCstPointer() if node is not None else None
+        if not isinstance(span, SourceSpan) or span.file_id != doc.file_id:
+            return None
+        end_line, end_column = doc.source_map.position(span.end)
+        return {
+            "uri": uri,
+            "range": {
+                "start": {"line": span.line - 1, "character": self._to_client(doc, span.line, span.column)},
+                "end": {"line": end_line - 1, "character": self._to_client(doc, end_line, end_column)},
+            },
+        }
+
+    def definition(self, params: dict) -> list:
+        uri, doc, index, line, column = self._at(params)
+        out = []
+        for p in index.definitions(line, column):
+            loc = self._location(uri, doc, p.identifier)
+            if loc is not None:
+                out.append(loc)
+        return out
+
+    def references(self, params: dict) -> list:
+        uri, doc, index, line, column = self._at(params)
+        include = params.get("context", {}).get("includeDeclaration", False)
+        out = []
+        for node in index.references(line, column, include_definitions=include):
+            loc = self._location(uri, doc, node)
+            if loc is not None:
+                out.append(loc)
+        return out
+
+    def hover(self, params: dict) -> Optional[dict]:
+        _, _, index, line, column = self._at(params)
+        text = index.hover(line, column)
+        if text is None:
+            return None
+        return {"contents": {"kind": "plaintext", "value": text}}
+
+
+_HANDLERS = {
+    "initialize": LanguageServer.initialize,
+    "initialized": LanguageServer.initialized,
+    "shutdown": LanguageServer.shutdown,
+    "exit": LanguageServer.exit,
+    "textDocument/didOpen": LanguageServer.did_open,
+    "textDocument/didChange": LanguageServer.did_change,
+    "textDocument/didClose": LanguageServer.did_close,
+    "textDocument/definition": LanguageServer.definition,
+    "textDocument/references": LanguageServer.references,
+    "textDocument/hover": LanguageServer.hover,
+}
+
+
+def serve(inp, out, lexer: str = "antlr", parser: str = "rd") -> int:
+    server = LanguageServer(out, lexer, parser)
+    while server.running:
+        message = read_message(inp)
+        if message is None:
+            break
+        server.handle(message)
+    # LSP：先 shutdown 再 exit 时退出码为 0
+    return 0 if server.shut_down else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YAFL language server (LSP over stdio)")
+    parser.add_argument("--lexer", choices=sorted(LEXERS), default="antlr")
+    parser.add_argument("--parser", choices=PARSERS, default="rd")
+    parser.add_argument("--log", help="Write a debug log (per-request timings) to this file")
+    args = parser.parse_args()
+    if args.log:
+        logging.basicConfig(filename=args.log, level=logging.DEBUG,
+                            format="%(asctime)s %(levelname)s %(message)s")
+    else:
+        # stdout 是协议通道，其余输出只能去 stderr
+        logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+    sys.exit(serve(sys.stdin.buffer, sys.stdout.buffer, args.lexer, args.parser))
+
+
+if __name__ == "__main__":
+    main()
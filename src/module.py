@@ -0,0 +1,262 @@
+from __future__ import annotations
+import os
+from typing import Dict, List, Optional
+
+from ast_types import Call, Identifier, ImportIdentifier, Program, AstList
+from source_span import SourceSpan
+from src_to_cst import build_cst
+from cst_to_ast import build_ast
+from ast_to_bdg import build_bdg
+from bdg_to_vg import build_value_graph
+
+# ============================================================
+# 模块 —— use!(name) 与缓存的接口文件
+#
+# 顶层语句 use!(geo); 引入 geo.yafl 的全部顶层绑定。被引入的模块单独编译，
+# 导出（根 block 的 point）连同 value 摘要和推导出的类型写进接口文件
+# <cache-dir>/geo.yi（JSON）：
+#
+#   version / module / source / source_hash
+#   deps            —— 依赖模块名 -> 编译时看到的 interface_hash
+#   exports         —— [{name, value, type, ctype, cval, line, column, start, end}]
+#   interface_hash  —— exports 去掉位置后的 sha256
+#
+# 依赖方只读接口文件，不再解析被引入的源码。接口可以复用的条件：
+#   源码 hash 没变，且每个依赖当前的 interface_hash 与记录的相同
+# 所以只改了实现、导出类型没变的模块，不会引起依赖方重编。
+#
+# 导出的名字在依赖方里是 depth -1 的 'import' point（和 builtin 同层），
+# 对应的 value 没有 in_edge，类型推导直接用接口里的类型。
+#
+# pipeline 每次都要调 split_imports，所以 json / hashlib / 类型推导
+# 只在真的加载模块时才 import。
+# ============================================================
+
+MODULE_SUFFIX = ".yafl"
+INTERFACE_SUFFIX = ".yi"
+INTERFACE_VERSION = 1
+DEFAULT_CACHE_DIR = ".yafl-cache"
+
+USE = "use!"
+
+
+class ModuleError(Exception):
+    pass
+
+
+# ============================================================
+# use! 语句
+# ============================================================
+
+def _use_target(expr) -> Optional[str]:
+    if not (isinstance(expr, Call) and isinstance(expr.fn, Identifier) and expr.fn.name == USE):
+        return None
+    arg = expr.arg
+    # use!(geo) / use!(geo,)
+    if isinstance(arg, AstList) and len(arg.items) == 1 and arg.items[0].key is None:
+        arg = arg.items[0].value
+    if isinstance(arg, Identifier):
+        return arg.name
+    return None
+
+
+def split_imports(ast: Program) -> List[str]:
+    """取出顶层的 use!(name) 语句（从 AST 里删掉），返回模块名，按出现顺序去重"""
+    names: List[str] = []
+    kept = []
+    for stmt in ast.block.stmts:
+        name = _use_target(stmt.expr) if stmt.target is None else None
+        if name is None:
+            kept.append(stmt)
+        elif name not in names:
+            names.append(name)
+    ast.block.stmts = kept
+    return names
+
+
+def _sha256(data: str) -> str:
+    import hashlib
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def interface_hash(exports: List[dict]) -> str:
+    # 位置不算接口：只挪了行号不该让依赖方重编
+    import json
+    shape = [
+        {k: e.get(k) for k in ("name", "value", "type", "ctype", "cval")}
+        for e in exports
+    ]
+    return _sha256(json.dumps(shape, sort_keys=True, separators=(",", ":")))
+
+
+# ============================================================
+# 导出
+# ============================================================
+
+def collect_exports(block_index, graph, inference) -> List[dict]:
+    by_ast = {}
+    for v in graph.values:
+        by_ast.setdefault(id(v.ast), v)
+
+    t = inference.table
+    exports = []
+    for pt in block_index[0].points:
+        if pt.type != 'point':
+            continue
+        value = by_ast.get(id(pt.stmt.expr))
+        tid, ctype, cval = inference.info(value) if value is not None else (0, None, None)
+        if cval is Ellipsis or not isinstance(cval, (int, str, bool, type(None))):
+            cval = None
+        span = pt.identifier.getCstPointer()
+        exports.append({
+            "name": pt.name,
+            "value": (value.in_edge.kind if value.in_edge else value.kind) if value else None,
+            "type": t.encode(tid),
+            "ctype": None if ctype is None else t.encode(ctype),
+            "cval": cval,
+            "line": span["line"] if span else None,
+            "column": span["column"] if span else None,
+            "start": getattr(span, "start", None),
+            "end": getattr(span, "end", None),
+        })
+    return exports
+
+
+# ============================================================
+# 加载 / 编译
+# ============================================================
+
+class ModuleLoader:
+    def __init__(self, search_path: List[str], cache_dir: Optional[str] = None):
+        self.search_path = [p or "." for p in search_path]
+        self.cache_dir = cache_dir
+        # 模块名 -> 接口
+        self.modules: Dict[str, dict] = {}
+        self.file_ids: Dict[str, int] = {}
+        self.compiled: List[str] = []
+        self.reused: List[str] = []
+        self._loading: List[str] = []
+
+    def locate(self, name: str) -> str:
+        rel = name.replace(".", os.sep) + MODULE_SUFFIX
+        for d in self.search_path:
+            path = os.path.join(d, rel)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        raise ModuleError(f"module '{name}' not found (searched {', '.join(self.search_path)})")
+
+    def interface_path(self, name: str, source: str) -> str:
+        cache_dir = self.cache_dir or os.path.join(os.path.dirname(source), DEFAULT_CACHE_DIR)
+        return os.path.join(cache_dir, name + INTERFACE_SUFFIX)
+
+    def file_id(self, name: str) -> int:
+        # 0 留给主文件
+        return self.file_ids.setdefault(name, len(self.file_ids) + 1)
+
+    # ---------------- 接口 ----------------
+
+    def load(self, name: str) -> dict:
+        iface = self.modules.get(name)
+        if iface is not None:
+            return iface
+        if name in self._loading:
+            cycle = " -> ".join(self._loading[self._loading.index(name):] + [name])
+            raise ModuleError(f"import cycle: {cycle}")
+
+        self._loading.append(name)
+        try:
+            source = self.locate(name)
+            with open(source, "r", encoding="utf-8") as f:
+                src = f.read()
+            path = self.interface_path(name, source)
+            cached = self._read_interface(path)
+            if cached is not None and self._fresh(cached, _sha256(src)):
+                iface = cached
+                self.reused.append(name)
+            else:
+                iface = self.compile(name, source, src)
+                self._write_interface(path, iface)
+                self.compiled.append(name)
+        finally:
+            self._loading.pop()
+
+        self.modules[name] = iface
+        return iface
+
+    def _fresh(self, iface: dict, source_hash: str) -> bool:
+        if iface.get("version") != INTERFACE_VERSION or iface.get("source_hash") != source_hash:
+            return False
+        return all(
+            self.load(dep)["interface_hash"] == h
+            for dep, h in iface.get("deps", {}).items()
+        )
+
+    @staticmethod
+    def _read_interface(path: str) -> Optional[dict]:
+        import json
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_interface(path: str, iface: dict):
+        import json
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(iface, f, indent=1)
+            f.write("\n")
+        os.replace(tmp, path)
+
+    def imports_for(self, names: List[str]) -> List[ImportIdentifier]:
+        idents = []
+        for name in names:
+            iface = self.load(name)
+            fid = self.file_id(name)
+            for e in iface["exports"]:
+                ident = ImportIdentifier(e["name"], name, e)
+                start = e.get("start") or 0
+                ident.setCstPointer(SourceSpan(
+                    fid, start, e.get("end") or start,
+                    e.get("line"), e.get("column"), e.get("line"), e.get("column"),
+                    "token", "ID_IDENTIFIER", e["name"],
+                ))
+                idents.append(ident)
+        return idents
+
+    # ---------------- 编译一个模块 ----------------
+
+    def compile(self, name: str, source: str, src: str) -> dict:
+        try:
+            cst = build_cst(src)
+        except Exception as e:
+            raise ModuleError(f"module '{name}' ({source}) failed to parse: {e}") from e
+        ast = build_ast(cst, source=src, file_id=self.file_id(name))
+        del cst
+
+        uses = split_imports(ast)
+        imports = self.imports_for(uses)
+        bdg, block_index, point_index, bindphi_index = build_bdg(ast, imports=imports)
+        graph = build_value_graph(bdg, block_index, point_index, bindphi_index)
+        from type_infer import infer_types
+        from overload import OverloadIndex
+        inference = infer_types(graph, resolver=OverloadIndex())
+
+        exports = collect_exports(block_index, graph, inference)
+        return {
+            "version": INTERFACE_VERSION,
+            "module": name,
+            "source": source,
+            "source_hash": _sha256(src),
+            "deps": {dep: self.modules[dep]["interface_hash"] for dep in uses},
+            "exports": exports,
+            "interface_hash": interface_hash(exports),
+        }
+
+    def __str__(self):
+        return (
+            f"{len(self.modules)} module(s): "
+            f"compiled [{', '.join(self.compiled)}], reused [{', '.join(self.reused)}]"
+        )
@@ -0,0 +1,358 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple
+
+from ast_types import Block, Identifier
+from vg_types import ValueGraph, ValueNode, PhiNode, Edge
+from type_table import TypeTable, UNKNOWN
+from type_infer import TypeInference, Bindings
+
+# ============================================================
+# 单态化（monomorphization）
+#
+# 参数里带类型变量（(v: T)）或不定长度（arr!(i32, ...)）的函数是泛型的。
+# 按设计文档，泛型按“宏”处理：每个调用点用实参把形参类型实例化，
+# 然后得到一份专用的函数体。
+#
+# 实例化的 key 是规范化的 (callee, 类型实参, 常量实参)：
+#   类型实参 —— 类型变量名 -> tid（TypeTable 已 hash-cons，tid 即规范形式）
+#   常量实参 —— 形参里每个 `...` 长度按出现顺序对应的实际长度
+# key 相同的调用点共享同一份克隆出来的 ValueGraph 片段，
+# 因此克隆的总量只和不同实例的个数成正比，与调用点个数无关。
+#
+# 克隆片段的 fndef 输出、形参类型、返回类型在 TypeInference 里记为
+# 实例化后的类型（assume）。克隆复用原片段的 AST，所以每个实例还带一份
+# Bindings（Identifier -> 克隆 phi、ast -> 克隆 value、类型实参、形参类型），
+# 推导克隆节点时查它，函数体按实例的类型实参推导，而不是落回泛型片段。
+# 全部调用点改完后重新推导一遍，调用点的结果和依赖它们的 value
+# 都按实例的签名得出。
+# ============================================================
+
+InstanceKey = Tuple[int, Tuple[Tuple[str, int], ...], Tuple[int, ...]]
+
+
+class Instance:
+    """一个泛型函数的一份实例"""
+    def __init__(self, key: InstanceKey, generic: ValueNode, value: ValueNode,
+                 params: int, ret: int):
+        self.key = key
+        self.generic = generic      # 原 fndef 输出
+        self.value = value          # 克隆出来的 fndef 输出
+        self.params = params        # 实例化后的形参类型
+        self.ret = ret              # 实例化后的返回类型
+        self.uses = 0
+
+
+class MonoStats:
+    def __init__(self):
+        self.calls = 0              # 看到的调用点
+        self.generic_calls = 0      # callee 是泛型函数的调用点
+        self.unresolved = 0         # 实参类型推不出 / 仍是泛型，无法实例化
+        self.instantiations = 0     # cache miss：新建实例
+        self.cache_hits = 0
+        self.values_cloned = 0
+        self.phis_cloned = 0
+        self.edges_cloned = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.instantiations + self.cache_hits
+        return self.cache_hits / total if total else 0.0
+
+    def __str__(self):
+        return (
+            f"monomorphized calls {self.generic_calls}/{self.calls} generic, "
+            f"instances {self.instantiations} (cache hit {self.hit_rate:.1%}), "
+            f"unresolved {self.unresolved}, "
+            f"cloned values {self.values_cloned}, phis {self.phis_cloned}, "
+            f"edges {self.edges_cloned}"
+        )
+
+
+class Monomorphizer:
+    def __init__(self, graph: ValueGraph, inference: TypeInference):
+        self.graph = graph
+        self.inference = inference
+        self.table: TypeTable = inference.table
+
+        self.instances: Dict[InstanceKey, Instance] = {}
+        self.stats = MonoStats()
+
+        # 与 value_of_expr 一致：ast -> 第一个以它为 ast 的 value
+        self._value_by_ast: Dict[object, ValueNode] = {}
+        for v in graph.values:
+            if v.ast is not None:
+                self._value_by_ast.setdefault(v.ast, v)
+        self._ident_phis = graph.ident_phis()
+
+    # ---------------- entry ----------------
+
+    def run(self) -> MonoStats:
+        t = self.table
+        # 只处理原图里的调用点；克隆出来的片段不再继续展开
+        for e in list(self.graph.edges):
+            if e.kind != "call":
+                continue
+            self.stats.calls += 1
+
+            callee = self.inference.callee.get(e.output.id)
+            if callee is None or callee.in_edge is None or callee.in_edge.kind != "fndef":
+                continue
+            sig = t.unfn(self.inference.type_of(callee))
+            if sig is None or not t.is_generic(sig[0]):
+                continue
+            self.stats.generic_calls += 1
+
+            arg = self.inference.phi_info(e.inputs[0])[0]
+            inst = self.instantiate(callee, sig, arg)
+            if inst is None:
+                self.stats.unresolved += 1
+                continue
+            inst.uses += 1
+            self._retarget(e, callee, inst)
+
+        if self.instances:
+            self.inference.rerun()
+        return self.stats
+
+    # ---------------- instantiate ----------------
+
+    def instantiate(
+        self,
+        fn: ValueNode,
+        sig: Tuple[int, int, Tuple[str, ...]],
+        arg: int,
+    ) -> Optional[Instance]:
+        t = self.table
+        params, ret, anno = sig
+
+        types: Dict[str, int] = {}
+        consts: List[int] = []
+        if not self._bind(params, arg, types, consts):
+            return None
+        if any(tid == UNKNOWN or t.is_generic(tid) for tid in types.values()):
+            return None
+
+        key: InstanceKey = (fn.id, tuple(sorted(types.items())), tuple(consts))
+        inst = self.instances.get(key)
+        if inst is not None:
+            self.stats.cache_hits += 1
+            return inst
+
+        self.stats.instantiations += 1
+        it = iter(consts)
+        spec_params = self._subst(params, types, it)
+        spec_ret = self._subst(ret, types, iter(()))
+        names = {k: ft for k, ft in t.args(spec_params) if k is not None} \
+            if t.kind(spec_params) == "tuple" else {}
+        clone, cloned = self._clone_fragment(fn, Bindings(types, names))
+        self._specialize(clone, cloned, spec_params, spec_ret, anno)
+        inst = Instance(key, fn, clone, spec_params, spec_ret)
+        self.instances[key] = inst
+        return inst
+
+    def _specialize(self, clone: ValueNode, cloned: Set[int], params: int, ret: int, anno):
+        """
+        克隆的 fndef 输出取实例化后的签名；形参 / 返回类型子树的根
+        （片段内克隆出来的那个 value）取实例化后的类型
+        """
+        inf = self.inference
+        t = self.table
+        inf.assume(clone, (t.fn(params, ret, anno), None, None))
+        e = clone.in_edge
+        slots = [(e.inputs[0], params)]
+        if e.ast.ret is not None:
+            slots.append((e.inputs[1], ret))
+        for phi, tid in slots:
+            values = inf.phi_values(phi)
+            if len(values) == 1 and values[0].id in cloned:
+                inf.assume(values[0], (t.atom('typ'), tid, None))
+
+    def _bind(self, param: int, arg: int, types: Dict[str, int], consts: List[int]) -> bool:
+        """
+        按结构把形参类型和实参类型对齐，收集类型变量与 `...` 长度。
+        同一个类型变量绑到两个不同类型时失败。
+        """
+        t = self.table
+        pk, pa = t.kind(param), t.args(param)
+        ak, aa = t.kind(arg), t.args(arg)
+
+        if pk == "var":
+            bound = types.get(pa[0])
+            if bound is None:
+                types[pa[0]] = arg
+                return True
+            return bound == arg
+
+        if pk == "tuple":
+            if ak != "tuple" or len(pa) != len(aa):
+                return False
+            return all(
+                self._bind(pt, at, types, consts)
+                for (_, pt), (_, at) in zip(pa, aa)
+            )
+
+        if pk == "arr":
+            elem, length = pa
+            if ak == "arr":
+                arg_elem, arg_len = aa
+                if not self._bind(elem, arg_elem, types, consts):
+                    return False
+            elif ak == "tuple":
+                arg_len = len(aa)
+                for _, at in aa:
+                    if not self._bind(elem, at, types, consts):
+                        return False
+            else:
+                return False
+            if length is None:
+                if arg_len is None:
+                    return False
+                consts.append(arg_len)
+            return True
+
+        return True
+
+    def _subst(self, tid: int, types: Dict[str, int], consts) -> int:
+        t = self.table
+        kind, args = t.kind(tid), t.args(tid)
+        if kind == "var":
+            return types.get(args[0], tid)
+        if kind == "tuple":
+            return t.tuple_of([(k, self._subst(f, types, consts)) for k, f in args])
+        if kind == "arr":
+            elem = self._subst(args[0], types, consts)
+            length = args[1] if args[1] is not None else next(consts, None)
+            return t.arr(elem, length)
+        if kind == "union":
+            return t.union([self._subst(m, types, consts) for m in args])
+        if kind == "fn":
+            return t.fn(self._subst(args[0], types, consts), self._subst(args[1], types, consts), args[2])
+        return tid
+
+    # ---------------- clone ----------------
+
+    def _fragment(self, fn: ValueNode) -> Tuple[List[ValueNode], List[PhiNode], List[Edge]]:
+        """
+        函数在图里“拥有”的部分：fndef 边、它的形参 / 返回类型 / 标注子树，
+        以及函数体（含嵌套 block）里每条语句的子树。
+        标识符 phi 本身属于片段，但它指向的定义只有在片段内时才被克隆。
+        """
+        values: List[ValueNode] = []
+        phis: List[PhiNode] = []
+        edges: List[Edge] = []
+        seen: Set[int] = set()
+
+        work: List[object] = [fn]
+        while work:
+            item = work.pop()
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+
+            if isinstance(item, ValueNode):
+                values.append(item)
+                if item.in_edge is not None:
+                    work.append(item.in_edge)
+                if item.kind == "block" and isinstance(item.ast, Block):
+                    for stmt in item.ast.stmts:
+                        v = self._value_by_ast.get(stmt.expr)
+                        if v is not None:
+                            work.append(v)
+                if item.placeholder and isinstance(item.ast, Identifier):
+                    p = self._ident_phis.get(item.ast)
+                    if p is not None:
+                        work.append(p)
+
+            elif isinstance(item, PhiNode):
+                phis.append(item)
+                if item.bindphi is None:
+                    for vs in item.candidates.values():
+                        work.extend(vs)
+
+            else:
+                edges.append(item)
+                if item.transform is not None:
+                    work.append(item.transform)
+                work.extend(item.inputs)
+
+        # 保持原图中的相对顺序，克隆后的 dump 更好读
+        values.sort(key=lambda v: v.id)
+        phis.sort(key=lambda p: p.id)
+        edges.sort(key=lambda e: e.id)
+        return values, phis, edges
+
+    def _clone_fragment(self, fn: ValueNode, b: Bindings) -> Tuple[ValueNode, Set[int]]:
+        """返回 (克隆的 fndef 输出, 克隆出来的 value 的 id)；克隆节点登记到 b"""
+        g = self.graph
+        values, phis, edges = self._fragment(fn)
+
+        vmap: Dict[ValueNode, ValueNode] = {}
+        for v in values:
+            vmap[v] = g.new_value(kind=v.kind, ast=v.ast, cst=v.cst, placeholder=v.placeholder)
+            if v.ast is not None:
+                b.values.setdefault(v.ast, vmap[v])
+
+        pmap: Dict[PhiNode, PhiNode] = {}
+        for p in phis:
+            np = g.new_phi(identifier=p.identifier, bindphi=p.bindphi, placeholder=p.placeholder)
+            for level, vs in p.candidates.items():
+                for v in vs:
+                    np.add(level, vmap.get(v, v))
+            pmap[p] = np
+            if p.bindphi is not None and p.identifier is not None:
+                b.phis[p.identifier] = np
+
+        for e in edges:
+            ne = g.new_edge(
+                kind=e.kind,
+                output=vmap[e.output],
+                transform=pmap[e.transform] if e.transform is not None else None,
+                inputs=[pmap[p] for p in e.inputs],
+                ast=e.ast,
+            )
+            if e.kind == "fndef":
+                g.type_values.append([ne, *ne.inputs])
+
+        self.stats.values_cloned += len(values)
+        self.stats.phis_cloned += len(phis)
+        self.stats.edges_cloned += len(edges)
+        self.inference.bind_instance(b, list(vmap.values()), list(pmap.values()))
+        return vmap[fn], {v.id for v in vmap.values()}
+
+    def _retarget(self, e: Edge, generic: ValueNode, inst: Instance):
+        """
+        调用点的 callee phi 改成只指向实例。
+        直接复用原 phi：它只被这一个调用点引用，换成新 phi 会在图里留下没人用的旧 phi；
+        Identifier 仍指向它，调用点上的标识符也随之推导成实例的类型。
+        只剩一个候选，不会再交给重载分派，不影响按 (name, scope) 缓存的重载集合。
+        """
+        p = e.transform
+        level = next(
+            (lvl for lvl, vs in p.candidates.items() if generic in vs),
+            0,
+        )
+        p.candidates = {level: {inst.value}}
+        self.inference.callee[e.output.id] = inst.value
+
+    # ---------------- debug ----------------
+
+    def dump(self):
+        t = self.table
+        print("\n[Instances]")
+        for inst in self.instances.values():
+            _, types, consts = inst.key
+            targs = ", ".join(f"{name}={t.render(tid)}" for name, tid in types)
+            cargs = ", ".join(str(c) for c in consts)
+            print(
+                f"  v{inst.generic.id:<3} -> v{inst.value.id:<3} "
+                f"<{targs}>[{cargs}] "
+                f"fn!({t.render(inst.params)}, {t.render(inst.ret)}) "
+                f"uses={inst.uses}"
+            )
+        print(f"  {self.stats}")
+
+
+def monomorphize(graph: ValueGraph, inference: TypeInference) -> Monomorphizer:
+    mono = Monomorphizer(graph, inference)
+    mono.run()
+    return mono
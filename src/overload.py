@@ -0,0 +1,214 @@
+from __future__ import annotations
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from vg_types import ValueNode, PhiNode, Edge
+from type_table import TypeTable
+
+# ============================================================
+# 基于类型的重载分派
+#
+# 同名的多个定义最终都落在一个 BindPhi / PhiNode 的候选里。
+# 这里把一个候选集合整理成 OverloadSet：
+#   level -> { 位置签名 tid -> [(params tid, fndef value)] }
+# 精确匹配只需一次 dict 查找；位置签名会丢掉字段名，所以命中的候选还要
+# 用 assignable 核对 key（(a: i32) 与 (b: i32) 位置签名相同）。
+# 核对后一个都不剩时才按转换代价逐个比较。
+# (候选集合, 实参类型) -> 选中的重载 的结果再做一层缓存，
+# 同一个重载集合被反复调用时，代价与集合大小无关。
+# ============================================================
+
+# 转换代价：越小越优先
+COST_EXACT = 0
+COST_RESHAPE = 1   # tuple -> arr!、进入 union!、带 key 的 tuple 按位置匹配
+COST_GENERIC = 2   # 绑定到类型变量 / 未推出的类型
+
+SetKey = Union[Tuple[str, int], FrozenSet[Tuple[int, int]]]
+
+
+class OverloadSet:
+    def __init__(self, key: SetKey):
+        self.key = key
+        # 从内到外的 level
+        self.levels: List[int] = []
+        # level -> 位置签名 -> [(params tid, 候选)]
+        self.exact: Dict[int, Dict[int, List[Tuple[int, ValueNode]]]] = {}
+        # level -> [(params tid, 候选)]，用于按代价匹配
+        self.all: Dict[int, List[Tuple[int, ValueNode]]] = {}
+
+
+class OverloadIndex:
+    def __init__(self):
+        self._phi_keys: Dict[int, SetKey] = {}
+        self._sets: Dict[SetKey, OverloadSet] = {}
+        self._cache: Dict[Tuple[SetKey, int], Tuple[Optional[ValueNode], Optional[str]]] = {}
+        self._cost: Dict[Tuple[int, int], Optional[int]] = {}
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.exact_matches = 0
+        self.converted_matches = 0
+        self.failures = 0
+
+    # ---------------- resolver 接口（见 TypeInference） ----------------
+
+    def select(
+        self,
+        inference,
+        edge: Edge,
+        phi: PhiNode,
+        arg_tid: int,
+    ) -> Optional[ValueNode]:
+        key = self.set_key(phi)
+
+        cache_key = (key, arg_tid)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            ovs = self._sets.get(key)
+            if ovs is None:
+                ovs = self._build_set(inference, key, phi)
+                self._sets[key] = ovs
+            cached = self._resolve(inference.table, ovs, arg_tid)
+            self._cache[cache_key] = cached
+
+        chosen, message = cached
+        if message is not None:
+            name = phi.identifier.name if phi.identifier is not None else "<expr>"
+            inference.errors.append((edge.output, f"{message} for `{name}`"))
+        return chosen
+
+    def set_key(self, phi: PhiNode) -> SetKey:
+        """
+        候选集合的 key。
+        标识符的候选只由 (name, resolve 所在 block) 决定，直接用它做 key，
+        不必每个调用点都去哈希整个候选集合；其余情况退回到候选本身。
+        """
+        bp = phi.bindphi
+        if bp is not None and bp.scope is not None:
+            return (bp.name, bp.scope.id)
+        key = self._phi_keys.get(phi.id)
+        if key is None:
+            key = frozenset(
+                (level, v.id)
+                for level, values in phi.candidates.items()
+                for v in values
+            )
+            self._phi_keys[phi.id] = key
+        return key
+
+    # ---------------- 建索引 ----------------
+
+    def _build_set(self, inference, key: SetKey, phi: PhiNode) -> OverloadSet:
+        t = inference.table
+        ovs = OverloadSet(key)
+        for level in sorted(phi.candidates, reverse=True):
+            exact: Dict[int, List[Tuple[int, ValueNode]]] = {}
+            entries: List[Tuple[int, ValueNode]] = []
+            for v in sorted(phi.candidates[level], key=lambda v: v.id):
+                sig = t.unfn(inference.type_of(v))
+                if sig is None:
+                    continue
+                params = sig[0]
+                exact.setdefault(t.positional(params), []).append((params, v))
+                entries.append((params, v))
+            if entries:
+                ovs.levels.append(level)
+                ovs.exact[level] = exact
+                ovs.all[level] = entries
+        return ovs
+
+    # ---------------- 匹配 ----------------
+
+    def _resolve(
+        self,
+        t: TypeTable,
+        ovs: OverloadSet,
+        arg_tid: int,
+    ) -> Tuple[Optional[ValueNode], Optional[str]]:
+        arg_sig = t.positional(arg_tid)
+
+        # 内层 level 遮蔽外层：在第一个有可行候选的 level 停下
+        for level in ovs.levels:
+            # 位置签名相同只说明各字段类型相同；字段名不一致的候选不算精确命中
+            hits = [
+                v for params, v in ovs.exact[level].get(arg_sig, ())
+                if t.assignable(arg_tid, params)
+            ]
+            if hits:
+                if len(hits) > 1:
+                    self.failures += 1
+                    return None, f"ambiguous call: {len(hits)} overloads with parameters {t.render(arg_sig)}"
+                self.exact_matches += 1
+                return hits[0], None
+
+            best: List[ValueNode] = []
+            best_cost = None
+            for params, v in ovs.all[level]:
+                cost = self.conversion_cost(t, arg_tid, params)
+                if cost is None:
+                    continue
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = [v], cost
+                elif cost == best_cost:
+                    best.append(v)
+
+            if len(best) == 1:
+                self.converted_matches += 1
+                return best[0], None
+            if len(best) > 1:
+                self.failures += 1
+                return None, f"ambiguous call: {len(best)} overloads match {t.render(arg_tid)}"
+
+        self.failures += 1
+        return None, f"no overload matches {t.render(arg_tid)}"
+
+    def conversion_cost(self, t: TypeTable, src: int, dst: int) -> Optional[int]:
+        """src 传给 dst 的代价，None 表示不可转换"""
+        if src == dst:
+            return COST_EXACT
+        key = (src, dst)
+        if key in self._cost:
+            return self._cost[key]
+
+        sk, dk = t.kind(src), t.kind(dst)
+        sa, da = t.args(src), t.args(dst)
+        cost: Optional[int] = None
+
+        if sk == "unknown" or dk in ("unknown", "var"):
+            cost = COST_GENERIC
+        elif dk == "union":
+            costs = [self.conversion_cost(t, src, m) for m in da]
+            costs = [c for c in costs if c is not None]
+            cost = min(costs) + COST_RESHAPE if costs else None
+        elif sk == "tuple" and dk == "tuple":
+            if len(sa) == len(da):
+                cost = COST_EXACT
+                for (skey, st), (dkey, dt) in zip(sa, da):
+                    if skey is not None and dkey is not None and skey != dkey:
+                        cost = None
+                        break
+                    c = self.conversion_cost(t, st, dt)
+                    if c is None:
+                        cost = None
+                        break
+                    cost = max(cost, c)
+        elif dk == "arr" and sk in ("arr", "tuple"):
+            if t.assignable(src, dst):
+                cost = COST_GENERIC if da[1] is None else COST_RESHAPE
+
+        self._cost[key] = cost
+        return cost
+
+    # ---------------- debug ----------------
+
+    def __str__(self):
+        total = self.cache_hits + self.cache_misses
+        rate = self.cache_hits / total if total else 0.0
+        return (
+            f"overload sets {len(self._sets)}, "
+            f"lookups {total} (cache hit {rate:.1%}), "
+            f"exact {self.exact_matches}, converted {self.converted_matches}, "
+            f"failed {self.failures}"
+        )
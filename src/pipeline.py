@@ -1,13 +1,21 @@
-import logging
+import os
 import sys
-from src_to_cst import build_cst, cst_dict_to_xml, parse_cst_to_dict
-from cst_to_ast import build_ast, dump_ast
+from contextlib import redirect_stdout
+from typing import Optional
+from src_to_cst import build_cst, cst_dict_to_bin, parse_tree, source_map_for, PARSERS
+from fast_lexer import LEXERS
+from source_text import MMAP_MODES, MMAP_THRESHOLD, open_source
+from profiler import PhaseProfiler, cst_sizes, ast_size
+from cst_to_ast import build_ast
 from ast_to_bdg import build_bdg
 from bdg_to_vg import build_value_graph, dump_value_graph
+from vg_prune import prune_value_graph
+from module import split_imports
 
-import xml.etree.ElementTree as ET
 import argparse
-import json
+
+# 只有部分选项用到的子系统（CST 流式输出、模块加载、类型推导、单态化、
+# vg-bin 序列化）在对应分支里才 import，短文件的启动时间见 bench_startup.py
 
 
 def run():
@@ -21,20 +29,161 @@ def run():
         help="Output file path (default: stdout)",
         default=None
     )
+    parser.add_argument(
+        "--emit",
+        choices=["text", "vg-jsonl", "vg-dot", "vg-bin", "cst-bin", "cst-xml", "cst-json"],
+        default="text",
+        help="Output kind: text dump (default), value graph as JSON Lines / Graphviz DOT / binary, "
+             "or the CST as binary / streamed XML / streamed JSON"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        default=None,
+        help="Report per-phase wall/CPU time, traced memory, object counts and sizes on stderr"
+    )
+    parser.add_argument(
+        "--lexer",
+        choices=sorted(LEXERS),
+        default="antlr",
+        help="Tokenizer: the generated ANTLR MainLexer or the regex-based FastLexer"
+    )
+    parser.add_argument(
+        "--parser",
+        choices=PARSERS,
+        default="antlr",
+        help="Parser: the generated ANTLR MainParser or the hand-written recursive-descent one"
+    )
+    parser.add_argument(
+        "--mmap",
+        choices=MMAP_MODES,
+        default="auto",
+        help=f"Map the source file instead of reading it into memory "
+             f"(auto: files of {MMAP_THRESHOLD >> 20} MiB or more)"
+    )
+    parser.add_argument(
+        "--dfa-cache",
+        default=None,
+        metavar="PATH",
+        help="Load warmed ANTLR DFA states from PATH (default: grammar/MainDFA.cache, see dfa_cache.py)"
+    )
+    parser.add_argument(
+        "--no-dfa-cache",
+        action="store_true",
+        help="Start the ANTLR lexer/parser with empty DFAs"
+    )
+    parser.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="Recover from syntax errors, report all of them and compile the remaining statements"
+    )
+    parser.add_argument(
+        "-I", "--module-path",
+        action="append",
+        default=[],
+        help="Extra directory to search for use!(name) modules (repeatable)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Where module interface files are cached (default: .yafl-cache next to each module)"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Resolve identifiers with a pool of N processes (large programs only)"
+    )
+    parser.add_argument(
+        "--no-prune",
+        action="store_true",
+        help="Keep unreachable values/phis/edges in the value graph"
+    )
+    parser.add_argument(
+        "--prune-stats",
+        action="store_true",
+        help="Report nodes and memory reclaimed by pruning on stderr"
+    )
+    parser.add_argument(
+        "--dump-types",
+        action="store_true",
+        help="Run type inference and dump the inferred types"
+    )
+    parser.add_argument(
+        "--monomorphize",
+        action="store_true",
+        help="Instantiate generic functions per call site and dump the instances"
+    )
 
     args = parser.parse_args()
 
+    if args.dfa_cache or args.no_dfa_cache:
+        import dfa_cache
+        dfa_cache.cache_path = None if args.no_dfa_cache else args.dfa_cache
+
     if args.source == "-":
         src = sys.stdin.read()
     else:
-        with open(args.source, "r", encoding="utf-8") as f:
-            src = f.read()
+        src = open_source(args.source, args.mmap)
+
+    if args.emit in ("cst-xml", "cst-json"):
+        # 直接遍历 ANTLR tree 流式写出，不建 dict / ElementTree
+        from cst_stream import write_cst
+        if args.parser == "antlr":
+            tree, cst_parser = parse_tree(src, args.lexer)
+        else:
+            tree, cst_parser = build_cst(src, lexer=args.lexer, parser=args.parser), None
+        fmt = args.emit[len("cst-"):]
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                write_cst(tree, f, fmt, parser=cst_parser)
+        else:
+            write_cst(tree, sys.stdout, fmt, parser=cst_parser)
+        return
+
+    prof = PhaseProfiler(enabled=args.profile is not None)
+    syntax_errors = [] if args.keep_going else None
+    try:
+        compile_source(args, src, prof, syntax_errors)
+    finally:
+        prof.stop()
+        prof.report(args.profile, sys.stderr, args.source)
+    # 退出码在输出全部写完之后统一决定：cst-bin / vg-bin 在中途就 return 了
+    if syntax_errors:
+        sys.exit(1)
+
+
+def compile_source(args, src, prof: PhaseProfiler, syntax_errors: Optional[list] = None):
+    """syntax_errors 为 list 时是 --keep-going：语法错误收集在里面，照常输出"""
+    # 解析报错、AST 的 span 和 --dump-types 共用同一个 SourceMap
+    source_map = source_map_for(src, args.source)
+    with prof.phase("cst"):
+        cst = build_cst(src, errors=syntax_errors, lexer=args.lexer, parser=args.parser)
+    if prof.enabled:
+        prof.sizes(**cst_sizes(cst))
+    if syntax_errors:
+        for err in syntax_errors:
+            print(err["message"] + ",\n" + err["snippet"], file=sys.stderr)
+        print(f"{len(syntax_errors)} syntax error(s)", file=sys.stderr)
 
-    cst = build_cst(src)
+    if args.emit == "cst-bin":
+        if args.output:
+            with open(args.output, "wb") as f:
+                cst_dict_to_bin(cst, f)
+        else:
+            cst_dict_to_bin(cst, sys.stdout.buffer)
+        return
 
     # print(cst)
 
-    ast = build_ast(cst)
+    # AST 只保留 SourceSpan，CST dict 到这里就可以释放了
+    with prof.phase("ast"):
+        ast = build_ast(cst, source=src, source_map=source_map)
+        del cst
+    if prof.enabled:
+        prof.sizes(ast_nodes=ast_size(ast))
 
     # if args.output:
     #     import sys
@@ -45,7 +194,26 @@ def run():
     # else:
     #     dump_ast(ast)
 
-    bdg, block_index, point_index, bindphi_index = build_bdg(ast)
+    # use!(name)：被引入的模块只读缓存的接口，过期才重编
+    imports = None
+    uses = split_imports(ast)
+    if uses:
+        from module import ModuleLoader, ModuleError
+        base = os.path.dirname(args.source) if args.source != "-" else "."
+        loader = ModuleLoader([base] + args.module_path, args.cache_dir)
+        with prof.phase("imports"):
+            try:
+                imports = loader.imports_for(uses)
+            except ModuleError as e:
+                print(f"error: {e}", file=sys.stderr)
+                sys.exit(1)
+        prof.sizes(
+            modules=len(loader.modules), compiled=len(loader.compiled), exports=len(imports),
+        )
+
+    with prof.phase("bdg"):
+        bdg, block_index, point_index, bindphi_index = build_bdg(ast, jobs=args.jobs, imports=imports)
+    prof.sizes(blocks=len(block_index), points=len(point_index), bindphis=len(bindphi_index))
 
     # for item in bindphi_index:
     #     print(item.entry.name, end=' ')
@@ -59,9 +227,60 @@ def run():
     #         print('; ', end='')
     #     print('')
 
-    vg = build_value_graph(bdg, block_index, point_index, bindphi_index)
+    with prof.phase("vg"):
+        vg = build_value_graph(bdg, block_index, point_index, bindphi_index)
+    prof.sizes(values=len(vg.values), phis=len(vg.phis), edges=len(vg.edges))
+
+    if not args.no_prune:
+        with prof.phase("prune"):
+            stats = prune_value_graph(vg, block_index)
+        prof.sizes(values=len(vg.values), phis=len(vg.phis), edges=len(vg.edges))
+        if args.prune_stats:
+            print(stats, file=sys.stderr)
+
+    inference = None
+    mono = None
+    if args.dump_types or args.monomorphize:
+        from type_infer import infer_types
+        from overload import OverloadIndex
+        with prof.phase("types"):
+            inference = infer_types(vg, resolver=OverloadIndex())
+        prof.sizes(types=len(inference.table), type_errors=len(inference.errors))
+    if args.monomorphize:
+        from monomorph import monomorphize
+        with prof.phase("mono"):
+            mono = monomorphize(vg, inference)
+        prof.sizes(instances=mono.stats.instantiations)
+
+    if args.emit == "vg-bin":
+        import vg_serial
+        with prof.phase("emit"):
+            data = vg_serial.dumps(vg)
+            if args.output:
+                with open(args.output, "wb") as f:
+                    f.write(data)
+            else:
+                sys.stdout.buffer.write(data)
+        prof.sizes(bytes=len(data))
+        return
+
+    fmt = "text" if args.emit == "text" else args.emit[len("vg-"):]
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with prof.phase("dump"):
+            written = dump_value_graph(vg, out, fmt)
+        prof.sizes(chars=written)
 
-    dump_value_graph(vg)
+        # 类型 / 实例报告是文本：text 时接在图后面写进同一个输出，其他格式写到 stderr
+        with redirect_stdout(out if fmt == "text" else sys.stderr):
+            if args.dump_types:
+                from type_infer import dump_types
+                dump_types(inference, source_map)
+            if mono is not None:
+                mono.dump()
+    finally:
+        if out is not sys.stdout:
+            out.close()
     
 
 if __name__ == "__main__":
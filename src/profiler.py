@@ -0,0 +1,170 @@
+from __future__ import annotations
+import gc
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, TextIO
+
+from ast_types import AstNode
+
+# ============================================================
+# 按阶段的耗时 / 内存统计（pipeline --profile）
+#
+# 每个阶段记录：
+#   wall / cpu       —— perf_counter / process_time
+#   peak             —— 阶段内 tracemalloc 峰值（相对阶段开始时的已分配量）
+#   alloc            —— 阶段结束时净增的已分配量
+#   objects          —— gc 跟踪的对象数的净增量
+#   sizes            —— 阶段产物的规模（tokens / CST 节点 / values ...）
+# 关闭时 phase() 什么都不做，pipeline 不必分两套写法。
+# ============================================================
+
+
+class PhaseRecord:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+        self.alloc = 0
+        self.objects = 0
+        self.sizes: Dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_s": self.wall,
+            "cpu_s": self.cpu,
+            "peak_bytes": self.peak,
+            "alloc_bytes": self.alloc,
+            "objects": self.objects,
+            "sizes": dict(self.sizes),
+        }
+
+
+class PhaseProfiler:
+    def __init__(self, enabled: bool = True, memory: bool = True):
+        self.enabled = enabled
+        # memory=False 时只计时：tracemalloc 会让前端慢好几倍，benchmark 里不开
+        self.memory = enabled and memory
+        self.phases: List[PhaseRecord] = []
+        # tracemalloc 会连带 import pickle 等，关闭时不加载（pipeline 的启动时间）
+        self._tracemalloc = None
+        if self.memory:
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield None
+            return
+
+        rec = PhaseRecord(name)
+        self.phases.append(rec)
+
+        if self.memory:
+            objects_before = len(gc.get_objects())
+            mem_before, _ = self._tracemalloc.get_traced_memory()
+            self._tracemalloc.reset_peak()
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield rec
+        finally:
+            rec.wall = time.perf_counter() - wall0
+            rec.cpu = time.process_time() - cpu0
+            if self.memory:
+                mem_after, peak = self._tracemalloc.get_traced_memory()
+                rec.peak = max(0, peak - mem_before)
+                rec.alloc = mem_after - mem_before
+                rec.objects = len(gc.get_objects()) - objects_before
+
+    def sizes(self, **sizes: int):
+        """给最近一个阶段补上产物规模"""
+        if self.enabled and self.phases:
+            self.phases[-1].sizes.update(sizes)
+
+    def stop(self):
+        if self.memory and self._tracemalloc.is_tracing():
+            self._tracemalloc.stop()
+
+    # ---------------- report ----------------
+
+    def to_dict(self, source: Optional[str] = None) -> dict:
+        return {
+            "source": source,
+            "phases": [p.to_dict() for p in self.phases],
+            "total": {
+                "wall_s": sum(p.wall for p in self.phases),
+                "cpu_s": sum(p.cpu for p in self.phases),
+                "peak_bytes": max((p.peak for p in self.phases), default=0),
+            },
+        }
+
+    def report(self, fmt: str, out: TextIO, source: Optional[str] = None):
+        if not self.enabled:
+            return
+        if fmt == "json":
+            import json
+            json.dump(self.to_dict(source), out, indent=2)
+            out.write("\n")
+            return
+
+        out.write(
+            f"{'phase':<12} {'wall':>10} {'cpu':>10} {'peak':>11} "
+            f"{'alloc':>11} {'objects':>9}  sizes\n"
+        )
+        for p in self.phases:
+            sizes = ", ".join(f"{k}={v}" for k, v in p.sizes.items())
+            out.write(
+                f"{p.name:<12} {p.wall * 1e3:>8.2f}ms {p.cpu * 1e3:>8.2f}ms "
+                f"{p.peak / 1024:>8.0f}KiB {p.alloc / 1024:>8.0f}KiB "
+                f"{p.objects:>9}  {sizes}\n"
+            )
+        total = self.to_dict(source)["total"]
+        out.write(
+            f"{'total':<12} {total['wall_s'] * 1e3:>8.2f}ms {total['cpu_s'] * 1e3:>8.2f}ms "
+            f"{total['peak_bytes'] / 1024:>8.0f}KiB\n"
+        )
+
+
+# ============================================================
+# 产物规模
+# ============================================================
+
+def cst_sizes(cst: dict) -> Dict[str, int]:
+    nodes = 0
+    tokens = 0
+    stack = [cst]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if node["node-type"] == "token":
+            tokens += 1
+        else:
+            stack.extend(node["children"])
+    return {"cst_nodes": nodes, "tokens": tokens}
+
+
+# 指回上层的字段；BlockInfo / Point 等非 AstNode 的字段本来就不会被计入
+_AST_SKIP = {"parent", "cstPointer"}
+
+
+def ast_size(root: AstNode) -> int:
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        for name, value in vars(node).items():
+            if name in _AST_SKIP:
+                continue
+            if isinstance(value, AstNode):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, AstNode))
+    return len(seen)
@@ -0,0 +1,363 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from antlr4 import Token
+
+from grammar.MainLexer import MainLexer
+
+# ============================================================
+# 手写递归下降 parser —— MainParser.g4 的预测式实现
+#
+# 输入是 WarpedTokenStream 填满后的 token 列表（已去掉 hidden，末尾是 EOF），
+# 输出与 parse_cst_to_dict(MainParser().program()) 完全相同的 CST dict
+# （rule 名、start / end、token 字段、EOF 的 token-type 都一致），
+# 后面的 build_ast 等阶段不需要知道是谁解析的。
+#
+# ANTLR 在有歧义的决策点取"能把整篇解析完的最小编号分支"。这里按分支编号
+# 依次尝试，只跳过一定会失败的分支：
+#   - 只有 function 分支需要回溯：ID / ( ... ) 后面是 : 或 => 时先按 function
+#     解析，解析完再看下一个 token 是否在当前位置的 follow 集里
+#       表达式里   ; } EOF ) , ] (
+#       返回类型   =>                 (a: i32): i32 => { ... } 的 i32 不是函数)
+#       annotation atom 的开头或 {
+#     不在就退回，按 ID / list / (expr) 解析
+#   - ( ... ) 的 list 与 (expr) 共享第一个元素的解析，看它后面是 ) 还是 ,
+#   - function_body 和括号组按位置记忆化，回溯不会重复解析同一段
+# 解析失败抛 ParseFailure：可能是真正的语法错误，也可能是需要整篇上下文
+# 才能消歧的输入。调用方（src_to_cst）此时改用 ANTLR 在同一个 token 流上
+# 重新解析，错误信息与原来一致。
+# ============================================================
+
+L = MainLexer
+
+# 与 MainParser.symbolicNames 相同（tokenVocab = MainLexer），不必为它加载 parser 模块
+_SYMBOLIC = MainLexer.symbolicNames
+
+LITERALS = frozenset({
+    L.INTEGER_CONSTANT, L.FLOAT_CONSTANT, L.FLOAT_NAN, L.FLOAT_INF,
+    L.STRING_CONSTANT, L.BOOLEAN_CONSTANT, L.NULL_CONSTANT,
+})
+ATOM_FIRST = LITERALS | {L.ID_IDENTIFIER, L.LPAREN}
+# statement / expression / list_element 的首 token
+EXPR_FIRST = ATOM_FIRST | {L.LBRACK}
+
+EXPR_FOLLOW = frozenset({
+    L.SEMICOLON, L.RBRACE, Token.EOF, L.RPAREN, L.COMMA, L.RBRACK, L.LPAREN,
+})
+RETURN_FOLLOW = frozenset({L.OP_ARROW})
+ANNOTATION_FOLLOW = ATOM_FIRST | {L.LBRACE}
+
+_OPEN = {L.LPAREN: L.RPAREN, L.LBRACK: L.RBRACK, L.LBRACE: L.RBRACE}
+_CLOSE = frozenset(_OPEN.values())
+
+_FAILED = object()
+
+
+class ParseFailure(Exception):
+    def __init__(self, token):
+        super().__init__(f"unexpected token `{token.text}` at line {token.line}:{token.column}")
+        self.token = token
+
+
+def match_brackets(types: List[int]) -> Dict[int, int]:
+    """开括号下标 -> 对应闭括号下标；不配对的括号不记录"""
+    match = {}
+    stack = []
+    for i, t in enumerate(types):
+        if t in _OPEN:
+            stack.append(i)
+        elif t in _CLOSE:
+            if stack and _OPEN[types[stack[-1]]] == t:
+                match[stack.pop()] = i
+            else:
+                stack.clear()
+    return match
+
+
+class RDParser:
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.types = [t.type for t in tokens]
+        self.eof = len(tokens) - 1
+        self.pos = 0
+        self.brackets = match_brackets(self.types)
+        # (规则, 位置) -> (结果, 结束位置) / _FAILED
+        self._memo: Dict[Tuple[str, int], object] = {}
+
+    # ---------------- token ----------------
+
+    def _la(self, k: int = 0) -> int:
+        i = self.pos + k
+        return self.types[i if i < self.eof else self.eof]
+
+    def _fail(self):
+        raise ParseFailure(self.tokens[min(self.pos, self.eof)])
+
+    def _consume(self) -> dict:
+        t = self.tokens[self.pos]
+        self.pos += 1
+        return {
+            "node-type": "token",
+            "text": t.text,
+            "token-type": _SYMBOLIC[t.type],
+            "token-type-id": t.type,
+            "channel": t.channel,
+            "line": t.line,
+            "column": t.column,
+        }
+
+    def _expect(self, ttype: int) -> dict:
+        if self.types[self.pos] != ttype:
+            self._fail()
+        return self._consume()
+
+    def _node(self, rule: str, start: int, children: list) -> dict:
+        # 与 ANTLR 相同：start = 进入规则时的 LT(1)，stop = 退出时的 LT(-1)
+        s = self.tokens[start]
+        e = self.tokens[self.pos - 1] if self.pos > 0 else None
+        return {
+            "node-type": "rule",
+            "rule": rule,
+            "start": {"line": s.line, "column": s.column},
+            "end": {
+                "line": e.line if e else None,
+                "column": e.column if e else None,
+            },
+            "children": children,
+        }
+
+    def _memoized(self, name: str, parse):
+        key = (name, self.pos)
+        hit = self._memo.get(key)
+        if hit is _FAILED:
+            self._fail()
+        if hit is not None:
+            result, self.pos = hit
+            return result
+        start = self.pos
+        try:
+            result = parse()
+        except ParseFailure:
+            self._memo[key] = _FAILED
+            self.pos = start
+            raise
+        self._memo[key] = (result, self.pos)
+        return result
+
+    # ---------------- program / block / statement ----------------
+
+    def program(self) -> dict:
+        block = self.block()
+        if self.types[self.pos] != Token.EOF:
+            self._fail()
+        # ANTLR 匹配 EOF 时不前进，program 的 stop 是 EOF 前一个 token
+        eof = self._consume()
+        self.pos -= 1
+        return self._node("program", 0, [block, eof])
+
+    def block(self) -> dict:
+        start = self.pos
+        children = []
+        if self.types[self.pos] in EXPR_FIRST:
+            children.append(self.statement())
+            while self.types[self.pos] == L.SEMICOLON:
+                children.append(self._consume())
+                if self.types[self.pos] not in EXPR_FIRST:
+                    break
+                children.append(self.statement())
+        return self._node("block", start, children)
+
+    def statement(self) -> dict:
+        start = self.pos
+        if self.types[self.pos] == L.ID_IDENTIFIER and self._la(1) == L.OP_BIND:
+            children = [self._consume(), self._consume(), self.expression()]
+        else:
+            children = [self.expression()]
+        return self._node("statement", start, children)
+
+    # ---------------- expression / call ----------------
+
+    def expression(self) -> dict:
+        start = self.pos
+        if self.types[self.pos] == L.LBRACK:
+            call = self.common_call()
+        else:
+            atom = self.atom_expression(EXPR_FOLLOW)
+            if self.types[self.pos] != L.LPAREN:
+                return self._node("expression", start, [atom])
+            args = self.function_arg_list()
+            call = self._node("function_call", start, [atom, args])
+        # curry_call：左递归展开成循环，内层 function_call 作为第一个子节点
+        while self.types[self.pos] == L.LPAREN:
+            args = self.function_arg_list()
+            call = self._node("function_call", start, [call, args])
+        return self._node("expression", start, [call])
+
+    def common_call(self) -> dict:
+        start = self.pos
+        children = [self._expect(L.LBRACK), self.expression(), self._expect(L.COMMA)]
+        children.append(self.expression())
+        children.append(self._expect(L.RBRACK))
+        return self._node("function_call", start, children)
+
+    def function_arg_list(self) -> dict:
+        start = self.pos
+        return self._node("function_arg_list", start, self._paren_children())
+
+    # ---------------- atom ----------------
+
+    def atom_expression(self, follow: frozenset) -> dict:
+        start = self.pos
+        t = self.types[start]
+        if t == L.ID_IDENTIFIER:
+            if self._la(1) in (L.COLON, L.OP_ARROW):
+                fn = self._try_function(follow)
+                if fn is not None:
+                    return self._node("atom_expression", start, [fn])
+            return self._node("atom_expression", start, [self._consume()])
+        if t in LITERALS:
+            lit = self._node_token("literface")
+            return self._node("atom_expression", start, [lit])
+        if t == L.LPAREN:
+            close = self.brackets.get(start)
+            if close is None:
+                self._fail()
+            if self.types[close + 1] in (L.COLON, L.OP_ARROW):
+                fn = self._try_function(follow)
+                if fn is not None:
+                    return self._node("atom_expression", start, [fn])
+            return self._node("atom_expression", start, self._paren_children())
+        self._fail()
+
+    def _node_token(self, rule: str) -> dict:
+        start = self.pos
+        tok = self._consume()
+        return self._node(rule, start, [tok])
+
+    def _try_function(self, follow: frozenset) -> Optional[dict]:
+        start = self.pos
+        try:
+            fn = self.function()
+        except ParseFailure:
+            self.pos = start
+            return None
+        if self.types[self.pos] in follow:
+            return fn
+        self.pos = start
+        return None
+
+    # ---------------- function ----------------
+
+    def function(self) -> dict:
+        start = self.pos
+        children = [self.function_params()]
+        if self.types[self.pos] == L.COLON:
+            rt = self.pos
+            colon = self._consume()
+            children.append(self._node(
+                "function_return_type", rt, [colon, self.atom_expression(RETURN_FOLLOW)]
+            ))
+        children.append(self._expect(L.OP_ARROW))
+        while self.types[self.pos] in ATOM_FIRST:
+            an = self.pos
+            children.append(self._node(
+                "function_annotations", an, [self.atom_expression(ANNOTATION_FOLLOW)]
+            ))
+        children.append(self._memoized("function_body", self._function_body))
+        return self._node("function", start, children)
+
+    def function_params(self) -> dict:
+        start = self.pos
+        t = self.types[start]
+        if t == L.ID_IDENTIFIER:
+            return self._node("function_params", start, [self._consume()])
+        if t != L.LPAREN:
+            self._fail()
+        return self._node("function_params", start, self._paren_children())
+
+    def _function_body(self) -> dict:
+        start = self.pos
+        lbrace = self._expect(L.LBRACE)
+        block = self.block()
+        rbrace = self._expect(L.RBRACE)
+        return self._node("function_body", start, [lbrace, block, rbrace])
+
+    # ---------------- list / (expr) ----------------
+
+    def _paren_children(self) -> list:
+        """
+        atom_expression / function_params / function_arg_list 里的 list | ( expression )
+        list 作为一个子节点；( expression ) 是三个子节点直接挂在父规则下
+        """
+        kind, value = self._memoized("paren", self._paren_group)
+        return [value] if kind == "list" else value
+
+    def _paren_group(self):
+        start = self.pos
+        lparen = self._expect(L.LPAREN)
+        if self.types[self.pos] == L.RPAREN:
+            return "list", self._node("list", start, [lparen, self._consume()])
+
+        first = self.pos
+        if self.types[first] == L.ID_IDENTIFIER and self._la(1) == L.COLON:
+            try:
+                indexed = self.list_indexed_element()
+            except ParseFailure:
+                indexed = None
+            if indexed is not None:
+                t = self.types[self.pos]
+                if t == L.RPAREN:
+                    return "list", self._node("list", start, [lparen, indexed, self._consume()])
+                if t == L.COMMA:
+                    element = self._node("list_element", first, [indexed])
+                    return "list", self._list_rest(start, lparen, element)
+            self.pos = first
+
+        expr = self.expression()
+        t = self.types[self.pos]
+        if t == L.RPAREN:
+            return "paren", [lparen, expr, self._consume()]
+        if t != L.COMMA:
+            self._fail()
+        element = self._node("list_element", first, [
+            self._node("list_non_indexed_element", first, [expr])
+        ])
+        return "list", self._list_rest(start, lparen, element)
+
+    def _list_rest(self, start: int, lparen: dict, first: dict) -> dict:
+        """list 第三个分支：第一个元素之后的 , (元素 (, 元素)*)? ,? )"""
+        children = [lparen, first, self._expect(L.COMMA)]
+        if self.types[self.pos] in EXPR_FIRST:
+            children.append(self.list_element())
+            while self.types[self.pos] == L.COMMA and self._la(1) in EXPR_FIRST:
+                children.append(self._consume())
+                children.append(self.list_element())
+        if self.types[self.pos] == L.COMMA:
+            children.append(self._consume())
+        children.append(self._expect(L.RPAREN))
+        return self._node("list", start, children)
+
+    def list_element(self) -> dict:
+        start = self.pos
+        if self.types[start] == L.ID_IDENTIFIER and self._la(1) == L.COLON:
+            try:
+                indexed = self.list_indexed_element()
+            except ParseFailure:
+                indexed = None
+            if indexed is not None and self.types[self.pos] in (L.COMMA, L.RPAREN):
+                return self._node("list_element", start, [indexed])
+            self.pos = start
+        expr = self.expression()
+        return self._node("list_element", start, [
+            self._node("list_non_indexed_element", start, [expr])
+        ])
+
+    def list_indexed_element(self) -> dict:
+        start = self.pos
+        children = [self._consume(), self._expect(L.COLON), self.expression()]
+        return self._node("list_indexed_element", start, children)
+
+
+def parse_tokens(tokens: List[Token]) -> dict:
+    """WarpedTokenStream.tokens（已 fill）-> program 的 CST dict；失败抛 ParseFailure"""
+    return RDParser(tokens).program()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ============================================================
+# SourceMap —— 诊断渲染用的源码索引
+#
+# - 行首偏移表只建一次，取第 n 行是 O(1) 切片
+# - 每行的显示宽度前缀和按需计算并缓存：
+#     width_prefix(line)[col] = 该行前 col 个字符的显示宽度
+#   caret 的位置 / 长度都是前缀和的差
+# - render_many 按行号排序后一次性渲染一批诊断，同一行只算一次
+#
+# 行号 1 起、列号 0 起（按字符），与 ANTLR token 一致。
+# ============================================================
+
+# (line, column, 字符数)
+Caret = Tuple[int, int, int]
+
+
+class SourceMap:
+    def __init__(self, text: str, name: Optional[str] = None):
+        # text 也可以是 source_text.MappedSource（同样的 len / 切片 / find）
+        self.text = text
+        self.name = name
+        if hasattr(text, "line_starts"):
+            starts = text.line_starts()
+        else:
+            starts = [0]
+            i = text.find("\n")
+            while i != -1:
+                starts.append(i + 1)
+                i = text.find("\n", i + 1)
+        self.line_starts: List[int] = starts
+        self._widths: Dict[int, List[int]] = {}
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    # ---------------- 位置换算 ----------------
+
+    def offset(self, line: Optional[int], column: Optional[int]) -> int:
+        if line is None or column is None or line < 1:
+            return 0
+        if line > len(self.line_starts):
+            return len(self.text)
+        return min(self.line_starts[line - 1] + column, len(self.text))
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.line_starts, offset)
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        line = self.line_of(offset)
+        return line, offset - self.line_starts[line - 1]
+
+    def line_text(self, line: int) -> str:
+        """第 line 行，不含换行符"""
+        if line < 1 or line > len(self.line_starts):
+            return ""
+        start = self.line_starts[line - 1]
+        if line < len(self.line_starts):
+            end = self.line_starts[line] - 1
+        else:
+            end = len(self.text)
+        if end > start and self.text[end - 1] == "\r":
+            end -= 1
+        return self.text[start:end]
+
+    # ---------------- 显示宽度 ----------------
+
+    def width_prefix(self, line: int) -> List[int]:
+        prefix = self._widths.get(line)
+        if prefix is None:
+            # 只有渲染诊断时才用到
+            from wcwidth import wcwidth
+            prefix = [0]
+            w = 0
+            for ch in self.line_text(line):
+                cw = wcwidth(ch)
+                if cw > 0:
+                    w += cw
+                prefix.append(w)
+            self._widths[line] = prefix
+        return prefix
+
+    def visual_column(self, line: int, column: int) -> int:
+        prefix = self.width_prefix(line)
+        return prefix[min(max(column, 0), len(prefix) - 1)]
+
+    def visual_width(self, line: int, column: int, length: int) -> int:
+        """line 行从 column 开始 length 个字符的显示宽度（超出行尾的部分不计）"""
+        prefix = self.width_prefix(line)
+        last = len(prefix) - 1
+        a = min(max(column, 0), last)
+        b = min(max(column + length, 0), last)
+        return prefix[b] - prefix[a]
+
+    # ---------------- 渲染 ----------------
+
+    def render(self, line: int, column: int, length: int = 1) -> str:
+        """
+        12 | foo := bar baz;
+                        ^^^
+        """
+        lineno = f"{line} | "
+        caret_offset = self.visual_column(line, column)
+        caret_width = max(1, self.visual_width(line, column, length))
+        return (
+            lineno + self.line_text(line) + "\n"
+            + " " * len(lineno)
+            + " " * caret_offset
+            + "^" * caret_width
+        )
+
+    def render_many(self, carets: Iterable[Caret]) -> List[str]:
+        """
+        批量渲染，结果与输入顺序一致。
+        按行号排序后处理，同一行上的多条诊断共享一次宽度前缀计算。
+        """
+        carets = list(carets)
+        out: List[str] = [""] * len(carets)
+        for i in sorted(range(len(carets)), key=lambda i: carets[i][0]):
+            out[i] = self.render(*carets[i])
+        return out
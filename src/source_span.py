@@ -0,0 +1,173 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+
+from source_map import SourceMap
+
+# ============================================================
+# SourceSpan —— AST 节点的源码位置
+#
+# 以前 AST 的 cstPointer 直接指向 CST dict（连带整棵 children），
+# 只为了诊断时能读到行列号，整棵 dict CST 要活到编译结束。
+# SourceSpan 只记位置：
+#   file_id, [start, end) 字符偏移, 起始 line / column,
+#   以及 CST 里 rule 的 end（最后一个 token 的起始 line / column）
+# build_ast(cst, source=...) 之后 CST 就可以释放。
+#
+# 为了不改动现有调用方，SourceSpan 支持和原 CST dict 相同的只读下标访问：
+#   token: ['text'] ['line'] ['column'] ['token-type'] ['token-type-id']
+#   rule : ['rule'] ['start']['line'] ['end']['column'] ...
+# 唯独没有 'children'。
+# ============================================================
+
+
+class SourceSpan:
+    __slots__ = (
+        "file_id", "start", "end",
+        "line", "column", "end_line", "end_column",
+        "kind", "name", "text", "type_id",
+    )
+
+    def __init__(
+        self,
+        file_id: int,
+        start: int,
+        end: int,
+        line: Optional[int],
+        column: Optional[int],
+        end_line: Optional[int],
+        end_column: Optional[int],
+        kind: str,
+        name: str,
+        text: Optional[str] = None,
+        type_id: Optional[int] = None,
+    ):
+        self.file_id = file_id
+        self.start = start
+        self.end = end
+        self.line = line
+        self.column = column
+        self.end_line = end_line
+        self.end_column = end_column
+        self.kind = kind            # "rule" | "token"
+        self.name = name            # rule 名 / token 类型名
+        self.text = text            # 只有 token 有
+        self.type_id = type_id      # 只有 token 有
+
+    # ---------------- dict 兼容 ----------------
+
+    def __getitem__(self, key: str):
+        if key == "node-type":
+            return self.kind
+        if self.kind == "token":
+            if key == "text":
+                return self.text
+            if key == "line":
+                return self.line
+            if key == "column":
+                return self.column
+            if key == "token-type":
+                return self.name
+            if key == "token-type-id":
+                return self.type_id
+        else:
+            if key == "rule":
+                return self.name
+            if key == "start":
+                return {"line": self.line, "column": self.column}
+            if key == "end":
+                return {"line": self.end_line, "column": self.end_column}
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"<{self.kind} {self.name} {self.line}:{self.column} [{self.start}, {self.end})>"
+
+
+# ============================================================
+# 从 CST dict 计算 span
+# ============================================================
+
+class SpanTable:
+    """
+    一个源文件的 SourceMap + CST dict -> SourceSpan 的缓存。
+    同一个 CST 节点（如 Identifier 共享的 token dict）只生成一个 span。
+    只在 build_ast 期间存活。
+    """
+    def __init__(self, source: str, file_id: int = 0, source_map: SourceMap = None):
+        self.source = source
+        self.file_id = file_id
+        self.source_map = source_map or SourceMap(source)
+        # id(cst) -> (cst, span)；同时持有 cst 本身，否则 build_ast 里临时拼出的
+        # dict 被回收后 id 会被复用，命中别人的 span
+        self._cache: Dict[int, Tuple[dict, SourceSpan]] = {}
+
+    def offset(self, line: Optional[int], column: Optional[int]) -> int:
+        return self.source_map.offset(line, column)
+
+    def span(self, cst: Optional[dict]) -> Optional[SourceSpan]:
+        if cst is None:
+            return None
+        if isinstance(cst, SourceSpan):
+            return cst
+        key = id(cst)
+        hit = self._cache.get(key)
+        if hit is not None:
+            return hit[1]
+
+        if cst["node-type"] == "token":
+            start = self.offset(cst["line"], cst["column"])
+            text = cst.get("text")
+            end = min(start + len(text or ""), len(self.source))
+            span = SourceSpan(
+                self.file_id, start, end,
+                cst["line"], cst["column"], cst["line"], cst["column"],
+                "token", cst.get("token-type"), text, cst.get("token-type-id"),
+            )
+        else:
+            first = _edge_token(cst, 0)
+            last = _edge_token(cst, -1)
+            start_pos = cst.get("start") or {}
+            end_pos = cst.get("end") or {}
+            line = start_pos.get("line", first["line"] if first else None)
+            column = start_pos.get("column", first["column"] if first else None)
+            start = self.offset(line, column)
+            if last is not None:
+                end = min(
+                    self.offset(last["line"], last["column"]) + len(last.get("text") or ""),
+                    len(self.source),
+                )
+            else:
+                end = start
+            span = SourceSpan(
+                self.file_id, start, max(start, end),
+                line, column,
+                end_pos.get("line", last["line"] if last else None),
+                end_pos.get("column", last["column"] if last else None),
+                "rule", cst.get("rule"),
+            )
+
+        self._cache[key] = (cst, span)
+        return span
+
+
+def _edge_token(cst: dict, side: int) -> Optional[dict]:
+    """最左（side=0）/ 最右（side=-1）的 token"""
+    node = cst
+    while node["node-type"] == "rule":
+        children = node.get("children")
+        if not children:
+            return None
+        node = children[side]
+    return node
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import mmap
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Union
+
+from antlr4 import InputStream, Token
+
+# ============================================================
+# MappedSource —— 只读 mmap 的 UTF-8 源文件，按字符下标访问
+#
+# 读成 str 再交给 antlr4.InputStream 时，源码在内存里至少有两份：
+# str 本身和 InputStream.data（每个字符一个 int 的 list，非 ASCII 字符
+# 还各是一个 int 对象）。这里文件只映射不复制：
+#
+#   ASCII 文件   字符下标 == 字节下标，LA 直接取 mm[i]，切片 decode("ascii")
+#   其他 UTF-8   按 CHUNK_BYTES 分块（边界不落在多字节字符中间），
+#                建一张 "块 -> 起始字符下标" 的表；需要时解码单个块，
+#                只缓存最近用到的几块。lexer 顺序读，几乎总命中当前块
+#
+# MappedSource 实现了 SourceMap / SpanTable / print_error 用到的那部分 str
+# 接口（len、下标、切片、find），诊断直接共享同一个对象，不再重读文件。
+# token 的 text 由 CommonToken 在取用时从 MappedInputStream.getText 切出。
+#
+# FastLexer 的 regex 只能跑在 str 上，用它时会整体解码一次（仍省掉
+# InputStream.data 那一份）。
+#
+#   open_source(path, mode)   mode: "auto"（>= MMAP_THRESHOLD 才 mmap）/
+#                             "always" / "never"；返回 str 或 MappedSource
+#   char_stream(source)       给 lexer 的 InputStream
+# ============================================================
+
+CHUNK_BYTES = 1 << 16
+
+# 已解码块的缓存个数
+CACHED_CHUNKS = 4
+
+MMAP_THRESHOLD = 1 << 20
+
+MMAP_MODES = ["auto", "always", "never"]
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+_NEWLINE = re.compile(rb"\n")
+
+
+class MappedSource:
+    def __init__(self, path: str, name: Optional[str] = None):
+        self.path = path
+        self.name = name or path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # 空文件不能 mmap；bytes 的下标 / 切片 / find 行为相同
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.ascii = _NON_ASCII.search(self._mm) is None
+        self._chunks: Dict[int, str] = {}
+        # 当前块：[_lo, _hi) 字符区间和解码后的文本
+        self._lo = self._hi = 0
+        self._cur = ""
+        if self.ascii:
+            self._length = len(self._mm)
+            self.byte_starts = self.char_starts = [0]
+        else:
+            self._index_chunks()
+
+    def _index_chunks(self):
+        """一遍扫描建块表；顺带校验 UTF-8（解码失败抛 UnicodeDecodeError）"""
+        mm = self._mm
+        n = len(mm)
+        byte_starts, char_starts = [], []
+        pos = chars = 0
+        while pos < n:
+            end = min(pos + CHUNK_BYTES, n)
+            while end < n and mm[end] & 0xC0 == 0x80:
+                end -= 1
+            byte_starts.append(pos)
+            char_starts.append(chars)
+            chars += len(str(mm[pos:end], "utf-8"))
+            pos = end
+        self.byte_starts = byte_starts
+        self.char_starts = char_starts
+        self._length = chars
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- 分块 ----------------
+
+    def _chunk(self, k: int) -> str:
+        text = self._chunks.get(k)
+        if text is None:
+            if len(self._chunks) >= CACHED_CHUNKS:
+                self._chunks.pop(next(iter(self._chunks)))
+            start = self.byte_starts[k]
+            end = self.byte_starts[k + 1] if k + 1 < len(self.byte_starts) else len(self._mm)
+            text = self._chunks[k] = str(self._mm[start:end], "utf-8")
+        return text
+
+    def _enter(self, i: int):
+        """把包含字符 i 的块设为当前块"""
+        k = bisect_right(self.char_starts, i) - 1
+        self._cur = self._chunk(k)
+        self._lo = self.char_starts[k]
+        self._hi = self._lo + len(self._cur)
+
+    # ---------------- str 接口 ----------------
+
+    def __len__(self) -> int:
+        return self._length
+
+    def code_point(self, i: int) -> int:
+        if self.ascii:
+            return self._mm[i]
+        if not self._lo <= i < self._hi:
+            self._enter(i)
+        return ord(self._cur[i - self._lo])
+
+    def __getitem__(self, key: Union[int, slice]) -> str:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                return self[start:stop][::step]
+            return self._slice(start, stop)
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("source index out of range")
+        return chr(self.code_point(key))
+
+    def _slice(self, start: int, stop: int) -> str:
+        if start >= stop:
+            return ""
+        if self.ascii:
+            return self._mm[start:stop].decode("ascii")
+        if self._lo <= start and stop <= self._hi:
+            return self._cur[start - self._lo:stop - self._lo]
+        parts = []
+        k = bisect_right(self.char_starts, start) - 1
+        while start < stop:
+            text = self._chunk(k)
+            lo = self.char_starts[k]
+            parts.append(text[start - lo:stop - lo])
+            start = lo + len(text)
+            k += 1
+        return "".join(parts)
+
+    def find(self, sub: str, start: int = 0, end: Optional[int] = None) -> int:
+        # 与 str.find 一样按切片规则处理负数和越界
+        start, end, _ = slice(start, end).indices(self._length)
+        if self.ascii:
+            if not sub.isascii():
+                return -1
+            return self._mm.find(sub.encode("ascii"), start, end)
+        # 逐块查找；前一块末尾的 len(sub) - 1 个字符接到下一块前面，跨块的匹配也能找到
+        k = bisect_right(self.char_starts, start) - 1
+        carry = ""
+        while 0 <= k < len(self.char_starts) and self.char_starts[k] < end:
+            lo = self.char_starts[k]
+            text = self._chunk(k)
+            window = carry + text[max(start - lo, 0):max(end - lo, 0)]
+            base = max(start, lo) - len(carry)
+            i = window.find(sub)
+            if i != -1:
+                return base + i
+            carry = window[len(window) - len(sub) + 1:] if len(sub) > 1 else ""
+            k += 1
+        return -1
+
+    def line_starts(self) -> List[int]:
+        """每行第一个字符的下标（SourceMap 用）"""
+        if self.ascii:
+            return [0] + [m.end() for m in _NEWLINE.finditer(self._mm)]
+        starts = [0]
+        for k, lo in enumerate(self.char_starts):
+            text = self._chunk(k)
+            i = text.find("\n")
+            while i != -1:
+                starts.append(lo + i + 1)
+                i = text.find("\n", i + 1)
+        return starts
+
+    def __str__(self) -> str:
+        return str(self._mm, "utf-8") if self._length else ""
+
+
+class MappedInputStream(InputStream):
+    """antlr4.InputStream 的接口，字符从 MappedSource 取，不建 data 列表"""
+
+    def __init__(self, source: MappedSource):
+        self.name = source.name
+        self.source = source
+        self._index = 0
+        self._size = len(source)
+
+    @property
+    def strdata(self) -> str:
+        return str(self.source)
+
+    def LA(self, offset: int):
+        if offset == 0:
+            return 0
+        if offset < 0:
+            offset += 1
+        pos = self._index + offset - 1
+        if pos < 0 or pos >= self._size:
+            return Token.EOF
+        return self.source.code_point(pos)
+
+    def getText(self, start: int, stop: int):
+        if start >= self._size:
+            return ""
+        return self.source[start:min(stop, self._size - 1) + 1]
+
+    def __str__(self):
+        return str(self.source)
+
+
+Source = Union[str, MappedSource]
+
+
+def open_source(path: str, mode: str = "auto") -> Source:
+    if mode not in MMAP_MODES:
+        raise ValueError(f"unknown mmap mode: {mode}")
+    if mode == "always" or (mode == "auto" and os.path.getsize(path) >= MMAP_THRESHOLD):
+        return MappedSource(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def char_stream(source: Source) -> InputStream:
+    if isinstance(source, MappedSource):
+        return MappedInputStream(source)
+    return InputStream(source)
@@ -1,15 +1,31 @@
 from WarpedTokenStream import WarpedTokenStream
 from grammar.MainLexer import MainLexer
-from grammar.MainParser import MainParser
 
-from antlr4 import InputStream, ParserRuleContext, TerminalNode
+from antlr4 import ParserRuleContext, TerminalNode
 from antlr4.error.Errors import CancellationException
-import xml.etree.ElementTree as ET
-import json
-import logging
-from wcwidth import wcwidth
+from antlr4.error.ErrorListener import ErrorListener
+from fast_lexer import make_lexer
+from rd_parser import ParseFailure, RDParser, parse_tokens
+from source_map import SourceMap
+from source_text import Source
+
+# ============================================================
+# 启动时间：只在用到时才 import 的模块
+#   grammar.MainParser       —— ANTLR parser（--parser rd 且没有回退时不需要）
+#   xml.etree / json         —— CST 的 XML / JSON 读写
+#   cst_bin                  —— CST 二进制读写
+#   wcwidth / logging        —— 渲染 / 记录错误
+# bench_startup.py --check 检查 import pipeline 之后它们都还没有加载。
+# ============================================================
+
+def _main_parser():
+    from grammar.MainParser import MainParser
+    import dfa_cache
+    dfa_cache.ensure_loaded("parser")
+    return MainParser
 
 def visual_width(s: str) -> int:
+    from wcwidth import wcwidth
     w = 0
     for ch in s:
         cw = wcwidth(ch)
@@ -18,24 +34,22 @@ def visual_width(s: str) -> int:
     return w
 
 
-def print_error(input_text: str, token):
-    lines = input_text.splitlines()
-    line_text = lines[token.line - 1]
+_last_source_map = None
 
-    lineno = f"{token.line} | "
+def source_map_for(input_text: Source, name: str = None) -> SourceMap:
+    """
+    同一份源码连续报多条错时复用同一个 SourceMap；
+    pipeline 在解析前取一次，解析报错和 AST 用的是同一个
+    """
+    global _last_source_map
+    if _last_source_map is None or _last_source_map.text is not input_text:
+        _last_source_map = SourceMap(input_text, name)
+    return _last_source_map
 
-    # token.column 是字符索引
-    prefix = line_text[:token.column]
 
-    caret_offset = visual_width(prefix)
-    caret_width = max(1, visual_width(token.text))
-
-    return (
-        lineno + line_text + '\n'
-        + " " * len(lineno)
-        + " " * caret_offset
-        + "^" * caret_width
-    )
+def print_error(input_text: Source, token, source_map: SourceMap = None):
+    sm = source_map or source_map_for(input_text)
+    return sm.render(token.line, token.column, len(token.text or ""))
 
 
 
@@ -79,6 +93,7 @@ def parse_cst_to_dict(node, parser):
         raise TypeError(f"Unknown node type: {type(node)}")
 
 def cst_dict_to_xml(node):
+    import xml.etree.ElementTree as ET
     if node["node-type"] == "rule":
         elem = ET.Element("node", {
             "name": node["rule"],
@@ -118,14 +133,50 @@ def indent_xml(elem, indent=2, level=0):
     if level and (not elem.tail or not elem.tail.strip()):
         elem.tail = i
 
-def build_cst(input_text: str):
-    logger = logging.getLogger(__name__)
+# antlr：生成的 MainParser；rd：rd_parser 的手写递归下降（解析失败时退回 ANTLR）
+PARSERS = ["antlr", "rd"]
+
+def build_cst(input_text: Source, errors: list = None, lexer: str = "antlr", parser: str = "antlr"):
+    """
+    errors 为 None：遇到第一个语法错误就抛出（原行为）
+    errors 为 list：恢复模式，见 build_cst_recovering
+    lexer：fast_lexer.LEXERS 里的名字（"antlr" / "fast"）
+    parser：PARSERS 里的名字
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"unknown parser: {parser}")
+    if errors is not None:
+        return build_cst_recovering(input_text, errors, lexer, parser)
+    if parser == "rd":
+        return build_cst_rd(input_text, lexer)
+    tree, cst_parser = parse_tree(input_text, lexer)
+    cst_dict = parse_cst_to_dict(tree, cst_parser)
+    return cst_dict
 
-    input_stream = InputStream(input_text)
-    lexer = MainLexer(input_stream)
+def build_cst_rd(input_text: str, lexer_kind: str = "antlr"):
+    """
+    递归下降直接产出 CST dict。它解析不了的输入（语法错误，或要整篇上下文才能
+    消歧的写法）在同一个 token 流上交给 ANTLR，结果和报错都与 parse_tree 相同。
+    """
+    tokens = WarpedTokenStream(make_lexer(input_text, lexer_kind))
+    tokens.fill()
+    try:
+        return parse_tokens(tokens.tokens)
+    except ParseFailure:
+        pass
+    tokens.seek(0)
+    tree, parser = _parse_program(input_text, tokens)
+    return parse_cst_to_dict(tree, parser)
+
+def parse_tree(input_text: str, lexer_kind: str = "antlr"):
+    """只跑 ANTLR，返回 (parse tree, parser)；流式输出可以直接遍历它，不必先转 dict"""
+    lexer = make_lexer(input_text, lexer_kind)
     # tokens = CommonTokenStream(lexer)
     tokens = WarpedTokenStream(lexer)
-    parser = MainParser(tokens)
+    return _parse_program(input_text, tokens)
+
+def _parse_program(input_text: str, tokens):
+    parser = _main_parser()(tokens)
     from antlr4.error.ErrorStrategy import BailErrorStrategy
     parser._errHandler = BailErrorStrategy()
 
@@ -134,12 +185,288 @@ def build_cst(input_text: str):
     except CancellationException as e:
         earg = e.args[0]
         token = earg.offendingToken
-        logger.error(
+        import logging
+        logging.getLogger(__name__).error(
             f"Syntax Error: Unexpect {parser.symbolicNames[token.type]} token `{token.text}` at line {token.line}:{token.column},\n"
             + print_error(input_text, token))
         raise
-    cst_dict = parse_cst_to_dict(tree, parser)
-    return cst_dict
+    return tree, parser
+
+# ============================================================
+# 恢复模式：一次报出所有语法错误
+#
+# 先按整篇解析，没有错误时与 build_cst 完全相同。
+# 出错时改为逐条语句解析：
+#   - 顶层按 SEMICOLON 切分语句（按括号深度，未闭合的 ( / [ 遇到 ; 时视为已结束，
+#     与 WarpedTokenStream 的模式栈同理）
+#   - 每条语句单独用 statement 规则 + Bail 解析；末尾的 EOF 放在这条语句的 ;
+#     上（_eof_at），在语句末尾出的错报在它自己的 ; 上，而不是文件末尾
+#   - 出错时找到包住出错 token 的最内层 { }，删掉其中出错的那条语句
+#     （边界是该层的 SEMICOLON / RBRACE）再重试；不在任何 { } 内就丢掉整条顶层语句
+# 每删一次记录一个错误；同一条被删语句里的后续错误不再报告。
+# 返回的 CST 只含解析成功的语句，后续阶段照常运行。
+# ============================================================
+
+class _CollectingListener(ErrorListener):
+    def __init__(self, input_text: str, errors: list):
+        self.input_text = input_text
+        self.errors = errors
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        # 只有 lexer 会走到这里（parser 用 Bail，错误由 build_cst_recovering 处理）
+        self.errors.append(_syntax_error(self.input_text, line, column, 1, f"Lexer Error: {msg}"))
+
+
+def _syntax_error(input_text: str, line: int, column: int, length: int, message: str) -> dict:
+    return {
+        "line": line,
+        "column": column,
+        "length": length,
+        "message": message,
+        "snippet": source_map_for(input_text).render(line, column, length),
+    }
+
+
+def _token_error(input_text: str, parser, token) -> dict:
+    name = parser.symbolicNames[token.type] if token.type >= 0 else "EOF"
+    return _syntax_error(
+        input_text, token.line, token.column, len(token.text or ""),
+        f"Syntax Error: Unexpect {name} token `{token.text}` at line {token.line}:{token.column}",
+    )
+
+
+def _split_statements(tokens, start: int, end: int):
+    """
+    tokens[start:end] 中属于同一层 block 的语句边界，返回 [(s, e)]，
+    e 指向该语句后的 SEMICOLON（没有则为语句末尾之后）。
+    """
+    L = MainLexer
+    ranges = []
+    stack = []
+    s = start
+    for i in range(start, end):
+        t = tokens[i].type
+        if t in (L.LPAREN, L.LBRACK, L.LBRACE):
+            stack.append(t)
+        elif t in (L.RPAREN, L.RBRACK):
+            if stack and stack[-1] != L.LBRACE:
+                stack.pop()
+        elif t == L.RBRACE:
+            while stack and stack[-1] != L.LBRACE:
+                stack.pop()
+            if stack:
+                stack.pop()
+        elif t == L.SEMICOLON:
+            # 未闭合的 ( / [ 不可能跨过 ;
+            while stack and stack[-1] != L.LBRACE:
+                stack.pop()
+            if not stack:
+                ranges.append((s, i))
+                s = i + 1
+    if s < end:
+        ranges.append((s, end))
+    return ranges
+
+
+def _enclosing_block(tokens, k: int):
+    """包住 tokens[k] 的最内层 { 的下标与对应 } 的下标（没有闭合时为 len）"""
+    L = MainLexer
+    stack = []
+    for i in range(min(k, len(tokens))):
+        t = tokens[i].type
+        if t in (L.LPAREN, L.LBRACK, L.LBRACE):
+            stack.append((t, i))
+        elif t in (L.RPAREN, L.RBRACK):
+            if stack and stack[-1][0] != L.LBRACE:
+                stack.pop()
+        elif t == L.RBRACE:
+            while stack and stack[-1][0] != L.LBRACE:
+                stack.pop()
+            if stack:
+                stack.pop()
+        elif t == L.SEMICOLON:
+            while stack and stack[-1][0] != L.LBRACE:
+                stack.pop()
+    braces = [i for t, i in stack if t == L.LBRACE]
+    if not braces:
+        return None
+    open_at = braces[-1]
+    depth = 0
+    for i in range(open_at, len(tokens)):
+        t = tokens[i].type
+        if t == L.LBRACE:
+            depth += 1
+        elif t == L.RBRACE:
+            depth -= 1
+            if depth == 0:
+                return open_at, i
+    return open_at, len(tokens)
+
+
+def _eof_at(tok):
+    """放在语句末尾的 EOF，位置同 tok（语句后的 ;）"""
+    from antlr4 import Token
+    from antlr4.Token import CommonToken
+
+    eof = CommonToken(source=tok.source, type=Token.EOF, channel=Token.DEFAULT_CHANNEL,
+                      start=tok.start, stop=tok.start - 1)
+    eof.text = "<EOF>"
+    eof.line = tok.line
+    eof.column = tok.column
+    return eof
+
+
+def _parse_statement(parser, tokens, eof):
+    """单独解析一条语句；成功返回 (tree, None)，失败返回 (None, 出错 token)"""
+    from antlr4 import CommonTokenStream, Token
+    from antlr4.ListTokenSource import ListTokenSource
+
+    stream = CommonTokenStream(ListTokenSource(list(tokens) + [eof]))
+    parser.setTokenStream(stream)
+    try:
+        tree = parser.statement()
+    except CancellationException as e:
+        earg = e.args[0]
+        token = getattr(earg, "offendingToken", None) or stream.LT(1)
+        return None, token
+    if stream.LA(1) != Token.EOF:
+        return None, stream.LT(1)
+    return tree, None
+
+
+def build_cst_recovering(input_text: str, errors: list, lexer_kind: str = "antlr", parser_kind: str = "antlr"):
+    from antlr4.error.ErrorStrategy import BailErrorStrategy
+    from antlr4 import Token
+
+    lexer = make_lexer(input_text, lexer_kind)
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(_CollectingListener(input_text, errors))
+    stream = WarpedTokenStream(lexer)
+    parser = _main_parser()(stream)
+    parser.removeErrorListeners()
+    parser._errHandler = BailErrorStrategy()
+
+    # 快路径：整篇没有错误
+    if parser_kind == "rd":
+        stream.fill()
+        try:
+            return parse_tokens(stream.tokens)
+        except ParseFailure:
+            stream.seek(0)
+    try:
+        tree = parser.program()
+        return parse_cst_to_dict(tree, parser)
+    except CancellationException:
+        pass
+
+    stream.fill()
+    all_tokens = [t for t in stream.tokens if t.type != Token.EOF]
+    eof = stream.tokens[-1]
+
+    stmt_dicts = []
+    for s, e in _split_statements(all_tokens, 0, len(all_tokens)):
+        toks = all_tokens[s:e]
+        if not toks:
+            continue
+        semi = all_tokens[e] if e < len(all_tokens) else None
+        stmt_eof = _eof_at(semi) if semi is not None else eof
+        while toks:
+            tree, bad = _parse_statement(parser, toks, stmt_eof)
+            if tree is not None:
+                stmt_dicts.append(parse_cst_to_dict(tree, parser))
+                break
+            if bad is stmt_eof and semi is not None:
+                bad = semi
+            errors.append(_token_error(input_text, parser, bad))
+
+            k = next((i for i, t in enumerate(toks) if t is bad), len(toks))
+            block = _enclosing_block(toks, k)
+            if block is None:
+                break
+            open_at, close_at = block
+            # 在这一层 block 里找到出错的语句并删掉（连同其后的 ;）
+            for rs, re_ in _split_statements(toks, open_at + 1, close_at):
+                if rs <= k <= re_:
+                    drop_end = re_ + 1 if re_ < close_at and toks[re_].type == MainLexer.SEMICOLON else re_
+                    toks = toks[:rs] + toks[drop_end:]
+                    break
+            else:
+                break
+
+    # 拼回 program / block 的 dict 形状
+    children = []
+    for i, d in enumerate(stmt_dicts):
+        if i:
+            children.append({
+                "node-type": "token",
+                "text": ";",
+                "token-type": "SEMICOLON",
+                "token-type-id": MainLexer.SEMICOLON,
+                "channel": 0,
+                "line": d["start"]["line"],
+                "column": d["start"]["column"],
+            })
+        children.append(d)
+    first = stmt_dicts[0]["start"] if stmt_dicts else {"line": None, "column": None}
+    last = stmt_dicts[-1]["end"] if stmt_dicts else {"line": None, "column": None}
+    block = {
+        "node-type": "rule",
+        "rule": "block",
+        "start": dict(first),
+        "end": dict(last),
+        "children": children,
+    }
+    return {
+        "node-type": "rule",
+        "rule": "program",
+        "start": dict(first),
+        "end": {"line": eof.line, "column": eof.column},
+        "children": [block, {
+            "node-type": "token",
+            "text": eof.text,
+            # 与 parse_cst_to_dict 一致（EOF 的 type 是 -1）
+            "token-type": parser.symbolicNames[eof.type],
+            "token-type-id": eof.type,
+            "channel": eof.channel,
+            "line": eof.line,
+            "column": eof.column,
+        }],
+    }
+
+
+# ============================================================
+# 单条顶层语句（incremental 只重新解析改动过的语句）
+#
+# 与恢复模式一样按 statement 规则单独解析；token 来自同一个 WarpedTokenStream
+# 切出的片段，eof 是调用方放在末尾的 EOF token。
+# ============================================================
+
+_stmt_parser = None
+
+def build_statement_cst(tokens: list, eof, parser: str = "antlr"):
+    """
+    tokens：一条语句的 token（不含其后的 ; 和 EOF）
+    返回 (statement 的 CST dict, None)；语法错误时返回 (None, 出错 token)
+    """
+    global _stmt_parser
+    if parser == "rd":
+        rd = RDParser(list(tokens) + [eof])
+        try:
+            cst = rd.statement()
+            if rd.pos == rd.eof:
+                return cst, None
+        except ParseFailure:
+            pass
+    if _stmt_parser is None:
+        from antlr4.error.ErrorStrategy import BailErrorStrategy
+        _stmt_parser = _main_parser()(None)
+        _stmt_parser.removeErrorListeners()
+        _stmt_parser._errHandler = BailErrorStrategy()
+    tree, bad = _parse_statement(_stmt_parser, tokens, eof)
+    if tree is None:
+        return None, bad
+    return parse_cst_to_dict(tree, _stmt_parser), None
+
 
 def cst_xml_to_dict(elem):
     tag = elem.tag
@@ -176,14 +503,27 @@ def cst_xml_to_dict(elem):
     else:
         raise ValueError(f"Unknown CST XML tag: {tag}")
 
+def cst_dict_to_bin(node, f):
+    """二进制 CST，词表取自当前 grammar"""
+    from cst_bin import write_cst_bin
+    MainParser = _main_parser()
+    write_cst_bin(node, f, MainParser.ruleNames, MainParser.symbolicNames)
+
 def load_cst(path: str, input_format="xml"):
+    if input_format == "bin":
+        from cst_bin import read_cst_bin
+        with open(path, "rb") as f:
+            return read_cst_bin(f)
+
     with open(path, "r", encoding="utf-8") as f:
         content = f.read()
 
     if input_format == "json":
+        import json
         return json.loads(content)
 
     elif input_format == "xml":
+        import xml.etree.ElementTree as ET
         root = ET.fromstring(content)
         return cst_xml_to_dict(root)
 
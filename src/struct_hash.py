@@ -0,0 +1,294 @@
+from __future__ import annotations
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from ast_types import AstNode, BlockInfo, Point, BindPhi, Program
+from vg_types import ValueGraph
+
+# ============================================================
+# 结构哈希 —— 与对象 id / 创建顺序无关的 AST / BDG / ValueGraph 规范形式
+#
+# 优化后的前端（索引化作用域、ANTLR 直接建 AST、紧凑图存储 ...）必须与
+# 现有实现产出完全相同的 BindPhi.candidates 和 ValueGraph。这里把三种产物
+# 各自转成一组"记录"（只含字符串 / 整数 / 元组），再取 sha256：
+#
+#   AST   —— 节点按前序编号 a0, a1, ...（字段按名字排序遍历），
+#            记录类名、标量字段、源码位置、子节点编号
+#   BDG   —— block / point / bindphi 都用它们挂的 AST 节点命名，
+#            候选集合按标签排序；index 里的顺序不参与比较
+#   VG    —— value / phi / edge 同样用 (kind, AST 节点) 命名，
+#            同名时按 id 顺序追加 #k
+#
+# 不在树里的 Identifier（builtin）用 builtin:<name> 命名。
+# ============================================================
+
+Record = Tuple
+
+# 指向上层 / 指向 BDG 产物的字段，不算 AST 结构
+_AST_SKIP = {"parent", "cstPointer", "point", "bindphi"}
+
+
+def _pos(ptr) -> Optional[Tuple]:
+    if ptr is None:
+        return None
+    if ptr["node-type"] == "token":
+        return (ptr["line"], ptr["column"])
+    start = ptr.get("start")
+    if start is not None:
+        return (start.get("line"), start.get("column"))
+    # build_ast 里临时拼出来的 rule dict 没有 start，和 SpanTable 一样取最左 token
+    node = ptr
+    while node["node-type"] == "rule":
+        if not node.get("children"):
+            return None
+        node = node["children"][0]
+    return (node["line"], node["column"])
+
+
+class AstCanon:
+    """AST 节点 -> 前序编号"""
+    def __init__(self, root: AstNode, positions: bool = True):
+        self.positions = positions
+        self.order: Dict[int, int] = {}
+        self.records: List[Record] = []
+        self._walk(root)
+
+    def _walk(self, root: AstNode):
+        nodes: List[AstNode] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) in self.order:
+                continue
+            self.order[id(node)] = len(nodes)
+            nodes.append(node)
+            children = []
+            for name in sorted(vars(node)):
+                if name in _AST_SKIP:
+                    continue
+                value = getattr(node, name)
+                if isinstance(value, AstNode):
+                    children.append(value)
+                elif isinstance(value, list):
+                    children.extend(v for v in value if isinstance(v, AstNode))
+            stack.extend(reversed(children))
+
+        for node in nodes:
+            scalars = []
+            links = []
+            for name in sorted(vars(node)):
+                if name in _AST_SKIP:
+                    continue
+                value = getattr(node, name)
+                if isinstance(value, AstNode):
+                    links.append((name, self.key(value)))
+                elif isinstance(value, list):
+                    if value and not isinstance(value[0], AstNode):
+                        continue
+                    links.append((name, tuple(self.key(v) for v in value)))
+                elif value is None or isinstance(value, (str, int, float, bool)):
+                    scalars.append((name, value))
+            pos = _pos(node.getCstPointer()) if self.positions else None
+            self.records.append(
+                (self.key(node), type(node).__name__, tuple(scalars), pos, tuple(links))
+            )
+
+    def key(self, node: Optional[AstNode]) -> str:
+        if node is None:
+            return "-"
+        n = self.order.get(id(node))
+        if n is not None:
+            return f"a{n}"
+        name = getattr(node, "name", None)
+        return f"builtin:{name}" if name is not None else f"detached:{type(node).__name__}"
+
+
+def _digest(records: List[Record]) -> str:
+    h = hashlib.sha256()
+    for r in records:
+        h.update(repr(r).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+# ============================================================
+# AST
+# ============================================================
+
+def ast_records(ast: Program, positions: bool = True) -> List[Record]:
+    return AstCanon(ast, positions).records
+
+
+# ============================================================
+# BDG
+# ============================================================
+
+def _block_label(canon: AstCanon, bi: Optional[BlockInfo]) -> str:
+    return "-" if bi is None else "b:" + canon.key(bi.ast_block)
+
+
+def _point_label(canon: AstCanon, p: Point) -> str:
+    return f"pt:{p.type}:{canon.key(p.identifier)}"
+
+
+def bdg_records(
+    canon: AstCanon,
+    block_index: List[BlockInfo],
+    point_index: List[Point],
+    bindphi_index: List[BindPhi],
+) -> List[Record]:
+    out: List[Record] = []
+    for bi in block_index:
+        out.append((
+            _block_label(canon, bi),
+            _block_label(canon, bi.parent),
+            bi.depth,
+            tuple(_block_label(canon, c) for c in bi.children),
+            tuple(_point_label(canon, p) for p in bi.points),
+        ))
+    for p in point_index:
+        out.append((
+            _point_label(canon, p),
+            p.name,
+            _block_label(canon, p.block),
+            canon.key(p.stmt),
+            p.define_depth,
+        ))
+    for bp in bindphi_index:
+        candidates = tuple(
+            (depth, tuple(sorted(_point_label(canon, p) for p in points)))
+            for depth, points in sorted(bp.candidates.items())
+        )
+        out.append((
+            "bp:" + canon.key(bp.entry),
+            bp.name,
+            _block_label(canon, bp.scope),
+            candidates,
+        ))
+    out.sort()
+    return out
+
+
+# ============================================================
+# ValueGraph
+# ============================================================
+
+class _Labels:
+    def __init__(self):
+        self.labels: Dict[int, str] = {}
+        self._seen: Dict[str, int] = {}
+
+    def assign(self, obj, base: str):
+        k = self._seen.get(base, 0)
+        self._seen[base] = k + 1
+        self.labels[id(obj)] = base if k == 0 else f"{base}#{k}"
+
+    def __getitem__(self, obj) -> str:
+        if obj is None:
+            return "-"
+        return self.labels.get(id(obj), "?")
+
+
+def vg_records(canon: AstCanon, graph: ValueGraph) -> List[Record]:
+    labels = _Labels()
+    for v in sorted(graph.values, key=lambda v: v.id):
+        labels.assign(v, f"v:{v.kind}:{canon.key(v.ast)}")
+    for p in sorted(graph.phis, key=lambda p: p.id):
+        labels.assign(p, f"p:{canon.key(p.identifier)}")
+    for e in sorted(graph.edges, key=lambda e: e.id):
+        labels.assign(e, f"e:{e.kind}:{canon.key(e.ast)}")
+
+    out: List[Record] = []
+    for v in graph.values:
+        out.append((
+            labels[v], v.kind, v.placeholder, labels[v.in_edge],
+            tuple(sorted(labels[e] for e in v.out_edges)),
+        ))
+    for p in graph.phis:
+        candidates = tuple(
+            (level, tuple(sorted(labels[v] for v in values)))
+            for level, values in sorted(p.candidates.items())
+        )
+        bindphi = "-" if p.bindphi is None else "bp:" + canon.key(p.bindphi.entry)
+        out.append((labels[p], bindphi, p.placeholder, candidates))
+    for e in graph.edges:
+        out.append((
+            labels[e], e.kind, labels[e.output], labels[e.transform],
+            tuple(labels[p] for p in e.inputs),
+        ))
+    out.sort()
+    # type_values 的顺序是类型推导的遍历顺序，按标签排序后比较
+    type_values = sorted(tuple(labels[x] for x in tv) for tv in graph.type_values)
+    out.append(("type_values", tuple(type_values)))
+    return out
+
+
+# ============================================================
+# 汇总
+# ============================================================
+
+class StructHash:
+    """一次编译的三段摘要；records 留着用于定位第一处差异"""
+    def __init__(
+        self,
+        ast: Program,
+        bdg: Optional[Tuple] = None,
+        vg: Optional[ValueGraph] = None,
+        positions: bool = True,
+    ):
+        self.canon = AstCanon(ast, positions)
+        self.records: Dict[str, List[Record]] = {"ast": self.canon.records}
+        if bdg is not None:
+            _, block_index, point_index, bindphi_index = bdg
+            self.records["bdg"] = bdg_records(self.canon, block_index, point_index, bindphi_index)
+        if vg is not None:
+            self.add_graph("vg", vg)
+
+    def add_graph(self, stage: str, vg: ValueGraph):
+        self.records[stage] = vg_records(self.canon, vg)
+
+    @property
+    def digests(self) -> Dict[str, str]:
+        return {stage: _digest(records) for stage, records in self.records.items()}
+
+
+def hash_ast(ast: Program, positions: bool = True) -> str:
+    return _digest(ast_records(ast, positions))
+
+
+def hash_bdg(ast: Program, block_index, point_index, bindphi_index) -> str:
+    return _digest(bdg_records(AstCanon(ast), block_index, point_index, bindphi_index))
+
+
+def hash_value_graph(ast: Program, graph: ValueGraph) -> str:
+    return _digest(vg_records(AstCanon(ast), graph))
+
+
+def first_difference(a: List[Record], b: List[Record]) -> Optional[Tuple[int, Optional[Record], Optional[Record]]]:
+    for i in range(max(len(a), len(b))):
+        ra = a[i] if i < len(a) else None
+        rb = b[i] if i < len(b) else None
+        if ra != rb:
+            return i, ra, rb
+    return None
+
+
+if __name__ == "__main__":
+    import sys
+    from src_to_cst import build_cst
+    from cst_to_ast import build_ast
+    from ast_to_bdg import build_bdg
+    from bdg_to_vg import build_value_graph
+    from vg_prune import prune_value_graph
+
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            src = f.read()
+        ast = build_ast(build_cst(src), source=src)
+        bdg = build_bdg(ast)
+        vg = build_value_graph(*bdg)
+        h = StructHash(ast, bdg, vg)
+        prune_value_graph(vg, bdg[1])
+        h.add_graph("pruned", vg)
+        for stage, digest in h.digests.items():
+            print(f"{path}\t{stage}\t{digest}")
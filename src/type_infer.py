@@ -0,0 +1,491 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from ast_types import Identifier, ImportIdentifier, Literal as AstLiteral
+from vg_types import ValueGraph, ValueNode, PhiNode, Edge
+from type_table import TypeTable, UNKNOWN
+
+# ============================================================
+# 类型推导
+#
+# 对每个 ValueNode 求一个 Info：
+#   tid   —— 这个值的类型
+#   ctype —— 如果这个值本身是一个类型（编译期 typ 值），它表示的类型
+#   cval  —— 编译期常量（整数 / bool / symbol 名 / Ellipsis）
+#
+# 类型构造（arr! / join! / union! / fn! / opaque!）的求值结果都 intern 到
+# TypeTable，相同的构造得到相同的 tid。
+# ============================================================
+
+Info = Tuple[int, Optional[int], object]
+
+NO_INFO: Info = (UNKNOWN, None, None)
+
+class Bindings:
+    """
+    单态化的一份实例在推导时的视图。克隆片段复用原片段的 AST，
+    按 AST 查到的 phi / value 都属于原片段，克隆出来的节点改查这里：
+      phis   —— Identifier -> 片段内克隆出来的标识符 phi
+      values —— ast -> 第一个以它为 ast 的克隆 value（与 value_of_expr 一致）
+      types  —— 类型变量名 -> 实例化的 tid
+      params —— 形参名 -> 实例化后的形参类型
+    """
+    def __init__(self, types: Dict[str, int], params: Dict[str, int]):
+        self.phis: Dict[Identifier, PhiNode] = {}
+        self.values: Dict[object, ValueNode] = {}
+        self.types = types
+        self.params = params
+
+
+_TODO = 0
+_BUSY = 1
+_DONE = 2
+
+ARITHMETIC = {'+', '-', '*', '/', '%', '&', '|', '^', '<<', '>>'}
+PREDICATES = {'==', '!=', '<', '<=', '>', '>=', '!', '&&', '||'}
+
+
+class TypeInference:
+    def __init__(
+        self,
+        graph: ValueGraph,
+        table: Optional[TypeTable] = None,
+        resolver=None,
+    ):
+        self.graph = graph
+        self.table = table or TypeTable()
+        # resolver.select(inference, edge, callee_phi, arg_tid) -> Optional[ValueNode]
+        # 为 None 时只接受单候选的 callee
+        self.resolver = resolver
+
+        n = len(graph.values)
+        self._info: List[Info] = [NO_INFO] * n
+        self._state: List[int] = [_TODO] * n
+        # kvdef 输出 value -> key 名
+        self._field_key: Dict[int, str] = {}
+        # call 输出 value -> 选中的 callee value
+        self.callee: Dict[int, ValueNode] = {}
+
+        self._ident_phis = graph.ident_phis()
+        self.errors: List[Tuple[ValueNode, str]] = []
+        # value.id -> 外部给定的结果（单态化实例的 fndef / 形参 / 返回类型），
+        # 推导到这个 value 时直接采用；rerun 之后仍然有效
+        self.assumed: Dict[int, Info] = {}
+        # 单态化实例：克隆出来的 value.id / phi.id -> 所属实例的 Bindings
+        self._value_bindings: Dict[int, Bindings] = {}
+        self._phi_bindings: Dict[int, Bindings] = {}
+
+    # ---------------- public ----------------
+
+    def run(self) -> TypeInference:
+        for v in self.graph.values:
+            self.info(v)
+        return self
+
+    def assume(self, v: ValueNode, info: Info):
+        self.assumed[v.id] = info
+
+    def bind_instance(self, b: Bindings, values: List[ValueNode], phis: List[PhiNode]):
+        """克隆片段里的节点按 b 推导：函数体在类型实参下重新推导，而不是落回原片段"""
+        for v in values:
+            self._value_bindings[v.id] = b
+        for p in phis:
+            self._phi_bindings[p.id] = b
+
+    def rerun(self) -> TypeInference:
+        """图被改过（单态化把调用点指向实例）之后从头重新推导"""
+        n = len(self.graph.values)
+        self._info = [NO_INFO] * n
+        self._state = [_TODO] * n
+        self._field_key.clear()
+        self.callee.clear()
+        self.errors.clear()
+        self._ident_phis = self.graph.ident_phis()
+        return self.run()
+
+    def type_of(self, v: ValueNode) -> int:
+        return self.info(v)[0]
+
+    def const_type(self, v: ValueNode) -> Optional[int]:
+        return self.info(v)[1]
+
+    def const_value(self, v: ValueNode):
+        return self.info(v)[2]
+
+    def info(self, v: ValueNode) -> Info:
+        if v.id >= len(self._state):
+            # 推导开始之后新建的 value（如单态化克隆）
+            grow = v.id + 1 - len(self._state)
+            self._info.extend([NO_INFO] * grow)
+            self._state.extend([_TODO] * grow)
+        state = self._state[v.id]
+        if state == _DONE:
+            return self._info[v.id]
+        if state == _BUSY:
+            # 绑定之间的环（a := b; b := a;）
+            return NO_INFO
+        self._state[v.id] = _BUSY
+        res = self._infer_value(v)
+        self._info[v.id] = res
+        self._state[v.id] = _DONE
+        return res
+
+    def phi_values(self, phi: PhiNode) -> List[ValueNode]:
+        """最内层（depth 最大）的候选，即遮蔽之后仍可见的定义"""
+        if not phi.candidates:
+            return []
+        level = max(phi.candidates)
+        return sorted(phi.candidates[level], key=lambda v: v.id)
+
+    def phi_info(self, phi: PhiNode) -> Info:
+        values = self.phi_values(phi)
+        b = self._phi_bindings.get(phi.id)
+        if not values:
+            # 未定义的标识符出现在类型位置，视为类型变量（如 (v: T) 里的 T）；
+            # 实例里换成绑定的类型
+            if phi.identifier is not None:
+                name = phi.identifier.name
+                if b is not None and name in b.types:
+                    return (self.table.atom('typ'), b.types[name], None)
+                return (self.table.atom('typ'), self.table.var(name), None)
+            return NO_INFO
+        if b is not None and phi.bindphi is not None and phi.identifier.name in b.params \
+                and all(v.kind == "symbol" for v in values):
+            # 实例函数体里对形参的引用（没有被局部绑定遮蔽）：取实例化后的形参类型
+            return (b.params[phi.identifier.name], None, None)
+        if len(values) == 1:
+            return self.info(values[0])
+        # 多个同层候选：重载集合，类型一致时仍然可以给出
+        infos = [self.info(v) for v in values]
+        if all(i == infos[0] for i in infos):
+            return infos[0]
+        return NO_INFO
+
+    # ---------------- values ----------------
+
+    def _infer_value(self, v: ValueNode) -> Info:
+        t = self.table
+
+        assumed = self.assumed.get(v.id)
+        if assumed is not None:
+            return assumed
+
+        if v.kind == "literal":
+            return self._literal(v.ast)
+
+        if v.kind == "symbol":
+            name = v.ast.name
+            if v.ast.getCstPointer() is None:
+                # builtin
+                if name in t.atoms:
+                    return (t.atom('typ'), t.atom(name), None)
+                if name == '...':
+                    return (t.atom('typ'), t.var('...'), Ellipsis)
+                return NO_INFO
+            return (t.atom('sym'), None, name)
+
+        if v.kind == "block":
+            # 泛型函数体只是模板，不推导；实例的函数体取最后一条语句的值
+            b = self._value_bindings.get(v.id)
+            if b is None or not v.ast.stmts:
+                return NO_INFO
+            last = b.values.get(v.ast.stmts[-1].expr)
+            return self.info(last) if last is not None else NO_INFO
+
+        if isinstance(v.ast, ImportIdentifier):
+            return self._imported(v.ast)
+
+        if v.in_edge is not None:
+            return self._infer_edge(v.in_edge)
+
+        if isinstance(v.ast, Identifier):
+            b = self._value_bindings.get(v.id)
+            phi = b.phis.get(v.ast) if b is not None else None
+            if phi is None:
+                phi = self._ident_phis.get(v.ast)
+            if phi is not None:
+                return self.phi_info(phi)
+
+        return NO_INFO
+
+    def _imported(self, ident: ImportIdentifier) -> Info:
+        """其他模块的导出：类型来自接口文件"""
+        t = self.table
+        summary = ident.summary
+        tid = t.decode(summary["type"], ident.module)
+        ctype = summary.get("ctype")
+        return (tid, None if ctype is None else t.decode(ctype, ident.module), summary.get("cval"))
+
+    def _literal(self, lit) -> Info:
+        t = self.table
+        if not isinstance(lit, AstLiteral):
+            return NO_INFO
+        raw = lit.raw
+        if lit.type == "integer":
+            suffix = raw.lower()[len(raw.lower().rstrip('ul')):]
+            if 'u' in suffix:
+                tid = t.atom('u64') if 'l' in suffix else t.atom('u32')
+            else:
+                tid = t.atom('i64') if 'l' in suffix else t.atom('i32')
+            return (tid, None, parse_int(raw))
+        if lit.type == "float":
+            if raw[-1:] in ('f', 'F') and not raw.lower().startswith(('0x', '-0x', '+0x')):
+                return (t.atom('f32'), None, None)
+            return (t.atom('f64'), None, None)
+        if lit.type == "boolean":
+            return (t.atom('bool'), None, raw == 'true')
+        if lit.type == "null":
+            return (t.atom('nul'), None, None)
+        return NO_INFO
+
+    # ---------------- edges ----------------
+
+    def _infer_edge(self, e: Edge) -> Info:
+        if e.kind == "kvdef":
+            key_vals = self.phi_values(e.inputs[0])
+            if key_vals:
+                self._field_key[e.output.id] = key_vals[0].ast.name
+            return self.phi_info(e.inputs[1])
+
+        if e.kind == "listdef":
+            return self._listdef(e)
+
+        if e.kind == "fndef":
+            return self._fndef(e)
+
+        if e.kind == "call":
+            return self._call(e)
+
+        return NO_INFO
+
+    def _items(self, e: Edge) -> List[Tuple[Optional[str], Info]]:
+        items = []
+        for phi in e.inputs:
+            info = self.phi_info(phi)
+            values = self.phi_values(phi)
+            key = self._field_key.get(values[0].id) if len(values) == 1 else None
+            items.append((key, info))
+        return items
+
+    def _listdef(self, e: Edge) -> Info:
+        t = self.table
+        items = self._items(e)
+        if not items:
+            unit = t.tuple_of([])
+            return (unit, unit, None)
+        # 所有元素都是类型 -> 整个 list 是一个 tuple 类型
+        if all(info[1] is not None for _, info in items):
+            ctype = t.tuple_of([(k, info[1]) for k, info in items])
+            return (t.atom('typ'), ctype, None)
+        return (t.tuple_of([(k, info[0]) for k, info in items]), None, None)
+
+    def _fndef(self, e: Edge) -> Info:
+        t = self.table
+        fn_ast = e.ast
+        idx = 0
+
+        params = self.phi_info(e.inputs[idx])
+        idx += 1
+        params_t = params[1] if params[1] is not None else UNKNOWN
+
+        ret_t = UNKNOWN
+        if fn_ast.ret is not None:
+            ret = self.phi_info(e.inputs[idx])
+            idx += 1
+            if ret[1] is not None:
+                ret_t = ret[1]
+
+        anno = []
+        for phi in e.inputs[idx:idx + len(fn_ast.ann)]:
+            name = self._phi_name(phi)
+            if name is not None:
+                anno.append(name)
+
+        return (t.fn(params_t, ret_t, tuple(anno)), None, None)
+
+    def _phi_name(self, phi: PhiNode) -> Optional[str]:
+        if phi.identifier is not None:
+            return phi.identifier.name
+        values = self.phi_values(phi)
+        if len(values) == 1 and isinstance(values[0].ast, Identifier):
+            return values[0].ast.name
+        return None
+
+    def _call(self, e: Edge) -> Info:
+        t = self.table
+        arg_phi = e.inputs[0]
+        arg = self.phi_info(arg_phi)
+
+        candidates = self.phi_values(e.transform)
+
+        # builtin intrinsic
+        if len(candidates) == 1 and candidates[0].kind == "symbol" \
+                and candidates[0].ast.getCstPointer() is None:
+            return self._intrinsic(e, candidates[0].ast.name, arg_phi, arg)
+
+        if len(candidates) == 1:
+            callee = candidates[0]
+        elif self.resolver is not None and candidates:
+            callee = self.resolver.select(self, e, e.transform, arg[0])
+        else:
+            callee = None
+
+        if callee is None:
+            return NO_INFO
+        self.callee[e.output.id] = callee
+
+        callee_info = self.info(callee)
+        # 用类型“调用”：构造该类型的值
+        if callee_info[1] is not None:
+            return (callee_info[1], None, None)
+
+        sig = t.unfn(callee_info[0])
+        if sig is None:
+            return NO_INFO
+        params, ret, _ = sig
+        if not t.assignable(arg[0], params):
+            self.errors.append((
+                e.output,
+                f"argument of type {t.render(arg[0])} "
+                f"does not match parameters {t.render(params)}",
+            ))
+        return (ret, None, None)
+
+    def _intrinsic(self, e: Edge, name: str, arg_phi: PhiNode, arg: Info) -> Info:
+        t = self.table
+        args = self._arg_items(arg_phi)
+        ctypes = [info[1] for _, info in args]
+        typ = t.atom('typ')
+
+        def ct(i: int) -> int:
+            if i < len(ctypes) and ctypes[i] is not None:
+                return ctypes[i]
+            return UNKNOWN
+
+        if name == 'arr!':
+            length = args[1][1][2] if len(args) > 1 else Ellipsis
+            return (typ, t.arr(ct(0), None if length is Ellipsis else length), None)
+        if name == 'join!':
+            res = ct(0)
+            for i in range(1, len(args)):
+                res = t.join(res, ct(i))
+            return (typ, res, None)
+        if name == 'union!':
+            return (typ, t.union([ct(i) for i in range(len(args))]), None)
+        if name == 'fn!':
+            return (typ, t.fn(ct(0), ct(1)), None)
+        if name == 'opaque!':
+            return (typ, t.opaque(ct(0)), None)
+
+        if name == '~arr!':
+            unarr = t.unarr(ct(0))
+            if unarr is None:
+                return NO_INFO
+            return (t.tuple_of([(None, typ), (None, t.atom('ptr'))]), None, None)
+        if name == '~opaque!':
+            under = t.unopaque(ct(0))
+            return (typ, under, None) if under is not None else NO_INFO
+        if name in ('strip!', 'default!'):
+            return (typ, ct(0), None)
+        if name == 'typeof!':
+            return (typ, args[0][1][0] if args else UNKNOWN, None)
+
+        if name == 'eq!':
+            return (t.atom('bool'), None, t.eq(ct(0), ct(1)))
+        if name == 'has!':
+            key = args[1][1][2] if len(args) > 1 else None
+            return (t.atom('bool'), None, t.has(ct(0), key))
+        if name == 'fn?':
+            return (t.atom('bool'), None, t.kind(ct(0)) == "fn")
+        if name == 'opaque?':
+            return (t.atom('bool'), None, t.kind(ct(0)) == "opaque")
+        if name in ('sizeof!', 'offsetof!'):
+            size = t.sizeof(ct(0)) if name == 'sizeof!' else None
+            return (t.atom('ptr'), None, size)
+
+        if name == 'as!':
+            return (ct(1), None, None)
+        if name in ARITHMETIC:
+            return (args[0][1][0] if args else UNKNOWN, None, None)
+        if name in PREDICATES:
+            return (t.atom('bool'), None, None)
+
+        return NO_INFO
+
+    def _arg_items(self, arg_phi: PhiNode) -> List[Tuple[Optional[str], Info]]:
+        values = self.phi_values(arg_phi)
+        if len(values) == 1 and values[0].in_edge is not None \
+                and values[0].in_edge.kind == "listdef":
+            return self._items(values[0].in_edge)
+        return [(None, self.phi_info(arg_phi))]
+
+
+# ============================================================
+# helpers
+# ============================================================
+
+def parse_int(raw: str) -> Optional[int]:
+    s = raw.replace('_', '').rstrip('uUlL')
+    sign = 1
+    if s[:1] in ('+', '-'):
+        sign = -1 if s[0] == '-' else 1
+        s = s[1:]
+    try:
+        if len(s) > 1 and s[0] == '0' and s[1].isdigit():
+            return sign * int(s, 8)
+        return sign * int(s, 0)
+    except ValueError:
+        return None
+
+
+def infer_types(
+    graph: ValueGraph,
+    table: Optional[TypeTable] = None,
+    resolver=None,
+) -> TypeInference:
+    return TypeInference(graph, table, resolver).run()
+
+
+def dump_types(inference: TypeInference, source_map=None):
+    t = inference.table
+    print("\n[Types]")
+    for v in inference.graph.values:
+        if v.placeholder:
+            continue
+        tid, ctype, cval = inference.info(v)
+        line = f"  v{v.id:<3} : {t.render(tid)}"
+        if ctype is not None:
+            line += f" = {t.render(ctype)}"
+        if cval is not None and cval is not Ellipsis:
+            line += f" ({cval!r})"
+        print(line)
+
+    if inference.resolver is not None:
+        print(f"\n[Overloads]\n  {inference.resolver}")
+
+    if inference.errors:
+        print("\n[TypeErrors]")
+        wheres = []
+        carets = []
+        for v, _ in inference.errors:
+            cst = v.ast.getCstPointer() if v.ast is not None else None
+            if cst and 'start' in cst:
+                line, column = cst['start']['line'], cst['start']['column']
+                wheres.append(f"line {line}")
+                # SourceSpan 带字符偏移，可以画出整段；否则只标起点
+                length = cst.end - cst.start if hasattr(cst, 'end') else 1
+                carets.append((line, column, length))
+            else:
+                wheres.append(f"v{v.id}")
+                carets.append(None)
+
+        snippets = [None] * len(carets)
+        if source_map is not None:
+            idx = [i for i, c in enumerate(carets) if c is not None]
+            for i, s in zip(idx, source_map.render_many(carets[i] for i in idx)):
+                snippets[i] = s
+
+        for (_, msg), where, snippet in zip(inference.errors, wheres, snippets):
+            print(f"  {where}: {msg}")
+            if snippet is not None:
+                print("    " + snippet.replace("\n", "\n    "))
@@ -0,0 +1,372 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================
+# TypeTable —— hash-consed 类型表
+#
+# 每个类型只对应一个 int id（tid），结构相同的构造只会 intern 一次，
+# 因此 eq! 就是 id 比较；has! / sizeof! 在 intern 时建表，查询 O(1)。
+# ============================================================
+
+TypeKind = str  # "unknown" | "atom" | "tuple" | "arr" | "union" | "fn" | "opaque" | "var"
+
+UNKNOWN = 0
+
+# atom -> 字节数（None 表示不占运行时空间 / 不可实例化）
+ATOM_SIZES: Dict[str, Optional[int]] = {
+    'typ': None,
+    'sym': None,
+    'ptr': 8,
+    'i8': 1, 'u8': 1,
+    'i16': 2, 'u16': 2,
+    'i32': 4, 'u32': 4,
+    'i64': 8, 'u64': 8,
+    'i128': 16, 'u128': 16,
+    'f32': 4, 'f64': 8,
+    'bool': 1,
+    'uint': 8,
+    'nul': 0,
+}
+
+# 一个字段：(key, tid)，key 为 None 表示无索引元素
+Field = Tuple[Optional[str], int]
+
+_MISS = object()
+
+
+class TypeTable:
+    def __init__(self):
+        self._kinds: List[TypeKind] = []
+        self._args: List[tuple] = []
+        self._intern: Dict[Tuple[TypeKind, tuple], int] = {}
+
+        # 派生表，和 tid 一一对应，intern 时填好
+        self._size: List[Optional[int]] = []
+        self._fields: List[Optional[Dict[object, int]]] = []
+
+        # 构造 / 谓词的求值缓存
+        self._memo: Dict[tuple, object] = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+        self._opaque_serial = 0
+
+        unk = self._make("unknown", ())
+        assert unk == UNKNOWN
+
+        self.atoms: Dict[str, int] = {}
+        for name in ATOM_SIZES:
+            self.atoms[name] = self._make("atom", (name,))
+
+    def __len__(self):
+        return len(self._kinds)
+
+    # ---------------- intern ----------------
+
+    def _make(self, kind: TypeKind, args: tuple) -> int:
+        key = (kind, args)
+        tid = self._intern.get(key)
+        if tid is not None:
+            return tid
+
+        tid = len(self._kinds)
+        self._kinds.append(kind)
+        self._args.append(args)
+        self._intern[key] = tid
+        self._size.append(self._compute_size(kind, args))
+        self._fields.append(self._compute_fields(kind, args))
+        return tid
+
+    def _compute_size(self, kind: TypeKind, args: tuple) -> Optional[int]:
+        if kind == "atom":
+            return ATOM_SIZES[args[0]]
+        if kind == "tuple":
+            total = 0
+            for _, tid in args:
+                s = self._size[tid]
+                if s is None:
+                    return None
+                total += s
+            return total
+        if kind == "arr":
+            elem, length = args
+            s = self._size[elem]
+            if s is None or length is None:
+                return None
+            return s * length
+        if kind == "union":
+            sizes = [self._size[t] for t in args]
+            if any(s is None for s in sizes):
+                return None
+            return max(sizes, default=0)
+        if kind == "fn":
+            return ATOM_SIZES['ptr']
+        if kind == "opaque":
+            return self._size[args[0]]
+        return None
+
+    def _compute_fields(self, kind: TypeKind, args: tuple) -> Optional[Dict[object, int]]:
+        if kind == "tuple":
+            fields: Dict[object, int] = {}
+            for i, (key, _) in enumerate(args):
+                fields[i] = i
+                if key is not None:
+                    fields.setdefault(key, i)
+            return fields
+        if kind == "union":
+            return {i: i for i in range(len(args))}
+        return None
+
+    # ---------------- constructors ----------------
+
+    def atom(self, name: str) -> int:
+        return self.atoms[name]
+
+    def var(self, name: str) -> int:
+        return self._make("var", (name,))
+
+    def tuple_of(self, fields: List[Field]) -> int:
+        return self._make("tuple", tuple(fields))
+
+    def arr(self, elem: int, length: Optional[int]) -> int:
+        return self._make("arr", (elem, length))
+
+    def union(self, members: List[int]) -> int:
+        flat = set()
+        for t in members:
+            if self._kinds[t] == "union":
+                flat.update(self._args[t])
+            else:
+                flat.add(t)
+        if len(flat) == 1:
+            return next(iter(flat))
+        return self._make("union", tuple(sorted(flat)))
+
+    def fn(self, params: int, ret: int, anno: Tuple[str, ...] = ()) -> int:
+        return self._make("fn", (params, ret, tuple(sorted(anno))))
+
+    def opaque(self, underlying: int) -> int:
+        # opaque! 总是产生新类型，serial 保证不会和已有的 intern 撞上
+        self._opaque_serial += 1
+        return self._make("opaque", (underlying, self._opaque_serial))
+
+    def join(self, a: int, b: int) -> int:
+        key = ("join!", a, b)
+        hit = self._memo.get(key, _MISS)
+        if hit is not _MISS:
+            self.memo_hits += 1
+            return hit
+        self.memo_misses += 1
+        if self._kinds[a] != "tuple" or self._kinds[b] != "tuple":
+            res = UNKNOWN
+        else:
+            res = self.tuple_of(list(self._args[a]) + list(self._args[b]))
+        self._memo[key] = res
+        return res
+
+    # ---------------- queries (O(1)) ----------------
+
+    def kind(self, tid: int) -> TypeKind:
+        return self._kinds[tid]
+
+    def args(self, tid: int) -> tuple:
+        return self._args[tid]
+
+    def eq(self, a: int, b: int) -> bool:
+        return a == b
+
+    def has(self, tid: int, key) -> bool:
+        fields = self._fields[tid]
+        return fields is not None and key in fields
+
+    def field_index(self, tid: int, key) -> Optional[int]:
+        fields = self._fields[tid]
+        if fields is None:
+            return None
+        return fields.get(key)
+
+    def sizeof(self, tid: int) -> Optional[int]:
+        return self._size[tid]
+
+    def is_generic(self, tid: int) -> bool:
+        key = ("generic?", tid)
+        hit = self._memo.get(key, _MISS)
+        if hit is not _MISS:
+            self.memo_hits += 1
+            return hit
+        self.memo_misses += 1
+        kind = self._kinds[tid]
+        args = self._args[tid]
+        if kind == "var":
+            res = True
+        elif kind == "tuple":
+            res = any(self.is_generic(t) for _, t in args)
+        elif kind == "arr":
+            res = args[1] is None or self.is_generic(args[0])
+        elif kind == "union":
+            res = any(self.is_generic(t) for t in args)
+        elif kind == "fn":
+            res = self.is_generic(args[0]) or self.is_generic(args[1])
+        else:
+            res = False
+        self._memo[key] = res
+        return res
+
+    def assignable(self, src: int, dst: int) -> bool:
+        """
+        src 类型的值能否直接传给 dst 类型的位置（不含用户定义的转换）
+        - var / unknown 两侧都放行，泛型实例化与未推出的类型不在这里报错
+        - tuple 按位置比较，两侧都有 key 时 key 也必须一致
+        - arr!(T, ...) 接收任意长度的 arr!(T, n)，以及元素都可赋给 T 的 tuple
+        """
+        if src == dst:
+            return True
+        key = ("assignable", src, dst)
+        hit = self._memo.get(key, _MISS)
+        if hit is not _MISS:
+            self.memo_hits += 1
+            return hit
+        self.memo_misses += 1
+
+        sk, dk = self._kinds[src], self._kinds[dst]
+        sa, da = self._args[src], self._args[dst]
+        if sk in ("unknown", "var") or dk in ("unknown", "var"):
+            res = True
+        elif dk == "union":
+            res = any(self.assignable(src, t) for t in da)
+        elif sk == "tuple" and dk == "tuple":
+            res = len(sa) == len(da) and all(
+                (sf[0] is None or df[0] is None or sf[0] == df[0])
+                and self.assignable(sf[1], df[1])
+                for sf, df in zip(sa, da)
+            )
+        elif dk == "arr" and sk == "arr":
+            res = (da[1] is None or da[1] == sa[1]) and self.assignable(sa[0], da[0])
+        elif dk == "arr" and sk == "tuple":
+            res = (da[1] is None or da[1] == len(sa)) and all(
+                self.assignable(t, da[0]) for _, t in sa
+            )
+        else:
+            res = False
+        self._memo[key] = res
+        return res
+
+    def positional(self, tid: int) -> int:
+        """去掉 tuple 的 key，只保留按位置的字段类型；重载签名用它做 key"""
+        if self._kinds[tid] != "tuple":
+            return tid
+        key = ("positional", tid)
+        hit = self._memo.get(key, _MISS)
+        if hit is not _MISS:
+            self.memo_hits += 1
+            return hit
+        self.memo_misses += 1
+        res = self.tuple_of([(None, t) for _, t in self._args[tid]])
+        self._memo[key] = res
+        return res
+
+    # ---------------- reflection ----------------
+
+    def split(self, tid: int) -> Tuple[Field, ...]:
+        if self._kinds[tid] == "tuple":
+            return self._args[tid]
+        if self._kinds[tid] == "union":
+            return tuple((None, t) for t in self._args[tid])
+        return ()
+
+    def unarr(self, tid: int) -> Optional[Tuple[int, Optional[int]]]:
+        if self._kinds[tid] != "arr":
+            return None
+        return self._args[tid]
+
+    def unfn(self, tid: int) -> Optional[Tuple[int, int, Tuple[str, ...]]]:
+        if self._kinds[tid] != "fn":
+            return None
+        return self._args[tid]
+
+    def unopaque(self, tid: int) -> Optional[int]:
+        if self._kinds[tid] != "opaque":
+            return None
+        return self._args[tid][0]
+
+    # ---------------- 跨编译单元 ----------------
+
+    def encode(self, tid: int):
+        """
+        与 tid 无关的结构化表示（只含 list / str / int / None），写进模块接口文件。
+        opaque 记成 ["opaque", underlying, serial]，decode 时同一个 serial 只新建一次。
+        """
+        kind = self._kinds[tid]
+        args = self._args[tid]
+        if kind == "unknown":
+            return ["unknown"]
+        if kind in ("atom", "var"):
+            return [kind, args[0]]
+        if kind == "tuple":
+            return ["tuple", [[k, self.encode(t)] for k, t in args]]
+        if kind == "arr":
+            return ["arr", self.encode(args[0]), args[1]]
+        if kind == "union":
+            return ["union", [self.encode(t) for t in args]]
+        if kind == "fn":
+            return ["fn", self.encode(args[0]), self.encode(args[1]), list(args[2])]
+        if kind == "opaque":
+            return ["opaque", self.encode(args[0]), args[1]]
+        return ["unknown"]
+
+    def decode(self, data, scope: str = "") -> int:
+        """encode 的逆；scope 区分不同来源（模块）的 opaque 序号"""
+        kind = data[0]
+        if kind == "unknown":
+            return UNKNOWN
+        if kind == "atom":
+            return self.atoms.get(data[1], UNKNOWN)
+        if kind == "var":
+            return self.var(data[1])
+        if kind == "tuple":
+            return self.tuple_of([(k, self.decode(t, scope)) for k, t in data[1]])
+        if kind == "arr":
+            return self.arr(self.decode(data[1], scope), data[2])
+        if kind == "union":
+            return self.union([self.decode(t, scope) for t in data[1]])
+        if kind == "fn":
+            return self.fn(self.decode(data[1], scope), self.decode(data[2], scope), tuple(data[3]))
+        if kind == "opaque":
+            key = ("decode-opaque", scope, data[2])
+            hit = self._memo.get(key, _MISS)
+            if hit is _MISS:
+                hit = self.opaque(self.decode(data[1], scope))
+                self._memo[key] = hit
+            return hit
+        return UNKNOWN
+
+    # ---------------- debug ----------------
+
+    def render(self, tid: int) -> str:
+        kind = self._kinds[tid]
+        args = self._args[tid]
+        if kind == "unknown":
+            return "?"
+        if kind in ("atom", "var"):
+            return args[0]
+        if kind == "tuple":
+            parts = [
+                f"{k}: {self.render(t)}" if k is not None else self.render(t)
+                for k, t in args
+            ]
+            if len(parts) == 1 and args[0][0] is None:
+                parts.append("")
+            return "(" + ", ".join(parts) + ")"
+        if kind == "arr":
+            length = "..." if args[1] is None else str(args[1])
+            return f"arr!({self.render(args[0])}, {length})"
+        if kind == "union":
+            return "union!(" + ", ".join(self.render(t) for t in args) + ")"
+        if kind == "fn":
+            s = f"fn!({self.render(args[0])}, {self.render(args[1])})"
+            if args[2]:
+                s += " " + " ".join(args[2])
+            return s
+        if kind == "opaque":
+            return f"opaque!#{args[1]}({self.render(args[0])})"
+        return f"<{kind}>"
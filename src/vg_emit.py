@@ -0,0 +1,262 @@
+from __future__ import annotations
+from typing import TextIO
+
+from vg_types import ValueGraph, ValueNode, PhiNode, Edge
+
+# ============================================================
+# Value graph 文本输出（text / JSON Lines / DOT）
+#
+# 每条记录格式化成一个字符串，攒到 buffer_size 再一次 f.write，
+# 百万级节点时比逐行 print 少几个数量级的 write 调用；整个输出
+# 不会先拼成一个大字符串，内存只和 buffer_size 有关。
+#
+#   text   —— dump_value_graph 的原有格式（逐字节一致）
+#   jsonl  —— 第一行 {"type": "graph", ...} 计数，之后每个 value / phi / edge 一行
+#   dot    —— digraph：value 是方框，phi 是菱形，edge 是椭圆；
+#             phi 候选 v -> p（标 depth），edge 输入 p -> e（transform 虚线），输出 e -> v
+#
+# 记录可以逐个送入（value / phi / edge），不必等整张图：jsonl / dot 的记录
+# 顺序无关；text 要求同一节（section）的记录连续。
+# 注意 build_value_graph 之后 connect_identifiers / prune 还会改写节点，
+# pipeline 在剪枝之后才输出。
+# ============================================================
+
+BUFFER_SIZE = 1 << 16
+
+EMIT_FORMATS = ["text", "jsonl", "dot"]
+
+
+class Emitter:
+    def __init__(self, f: TextIO, buffer_size: int = BUFFER_SIZE):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.written = 0
+        self._parts = []
+        self._size = 0
+
+    def write(self, s: str):
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self.f.write("".join(self._parts))
+            self.written += self._size
+            self._parts = []
+            self._size = 0
+
+    # ---------------- 子类实现 ----------------
+
+    def begin(self, graph: ValueGraph):
+        pass
+
+    def section(self, name: str):
+        """name: "values" / "phis" / "edges" """
+        pass
+
+    def value(self, v: ValueNode):
+        pass
+
+    def phi(self, p: PhiNode):
+        pass
+
+    def edge(self, e: Edge):
+        pass
+
+    def end(self):
+        pass
+
+    # ---------------- 整张图 ----------------
+
+    def emit(self, graph: ValueGraph) -> int:
+        """写出整张图并 flush，返回写出的字符数"""
+        self.begin(graph)
+        self.section("values")
+        for v in graph.values:
+            self.value(v)
+        self.section("phis")
+        for p in graph.phis:
+            self.phi(p)
+        self.section("edges")
+        for e in graph.edges:
+            self.edge(e)
+        self.end()
+        self.flush()
+        return self.written
+
+
+def _value_text(v: ValueNode) -> str:
+    cst = v.ast.getCstPointer()
+    return cst.get('text', '<rule>') if cst is not None else '<builtin>'
+
+
+def _phi_name(p: PhiNode) -> str:
+    return p.identifier.name if p.identifier is not None else '<not an identifier>'
+
+
+# ============================================================
+# text
+# ============================================================
+
+_RULE = "=" * 80
+
+_SECTIONS = {"values": "\n[ValueNodes]\n", "phis": "\n[PhiNodes]\n", "edges": "\n[Edges]\n"}
+
+
+class TextEmitter(Emitter):
+    def begin(self, graph: ValueGraph):
+        self.write(f"{_RULE}\nVALUE GRAPH\n{_RULE}\n")
+
+    def section(self, name: str):
+        self.write(_SECTIONS[name])
+
+    def value(self, v: ValueNode):
+        if v.placeholder:
+            return
+        ast = v.ast.__class__.__name__ if v.ast else None
+        in_edge = f"e{v.in_edge.id}" if v.in_edge else None
+        self.write(
+            f"  v{v.id:<3} "
+            f"kind={v.kind:<7} "
+            f"ast={ast:<12} "
+            f"in_edge={in_edge}"
+            f"  {_value_text(v)}\n"
+        )
+
+    def phi(self, p: PhiNode):
+        bind = f"BindPhi#{p.bindphi.id}" if p.bindphi else None
+        lines = [f"  p{p.id:<3} id={_phi_name(p)} bindphi={bind}\n"]
+        for level, values in sorted(p.candidates.items()):
+            vs = ", ".join(f"v{v.id}" for v in values)
+            lines.append(f"       depth {level}: {vs}\n")
+        self.write("".join(lines))
+
+    def edge(self, e: Edge):
+        lines = [f"  e{e.id:<3} kind={e.kind}\n", f"       out : v{e.output.id}\n"]
+        if e.transform:
+            lines.append(f"       fn  : p{e.transform.id}\n")
+        if e.inputs:
+            ins = ", ".join(f"p{p.id}" for p in e.inputs)
+            lines.append(f"       in  : {ins}\n")
+        lines.append(f"       ast : {e.ast.__class__.__name__}\n")
+        self.write("".join(lines))
+
+    def end(self):
+        self.write(_RULE + "\n")
+
+
+# ============================================================
+# JSON Lines
+# ============================================================
+
+def _ids(nodes) -> str:
+    return "[" + ",".join(str(n.id) for n in nodes) + "]"
+
+
+def _opt_id(node) -> str:
+    return "null" if node is None else str(node.id)
+
+
+class JsonlEmitter(Emitter):
+    def __init__(self, f: TextIO, buffer_size: int = BUFFER_SIZE):
+        super().__init__(f, buffer_size)
+        import json
+        self._str = json.JSONEncoder(ensure_ascii=False).encode
+
+    def begin(self, graph: ValueGraph):
+        self.write(
+            f'{{"type":"graph","values":{len(graph.values)},'
+            f'"phis":{len(graph.phis)},"edges":{len(graph.edges)}}}\n'
+        )
+
+    def value(self, v: ValueNode):
+        if v.placeholder:
+            return
+        ast = self._str(v.ast.__class__.__name__) if v.ast else "null"
+        self.write(
+            f'{{"type":"value","id":{v.id},"kind":"{v.kind}","ast":{ast},'
+            f'"in_edge":{_opt_id(v.in_edge)},"text":{self._str(_value_text(v))}}}\n'
+        )
+
+    def phi(self, p: PhiNode):
+        candidates = ",".join(
+            f"[{level},{_ids(sorted(values, key=lambda v: v.id))}]"
+            for level, values in sorted(p.candidates.items())
+        )
+        name = self._str(p.identifier.name) if p.identifier is not None else "null"
+        self.write(
+            f'{{"type":"phi","id":{p.id},"name":{name},"bindphi":{_opt_id(p.bindphi)},'
+            f'"candidates":[{candidates}]}}\n'
+        )
+
+    def edge(self, e: Edge):
+        self.write(
+            f'{{"type":"edge","id":{e.id},"kind":"{e.kind}","output":{e.output.id},'
+            f'"transform":{_opt_id(e.transform)},"inputs":{_ids(e.inputs)},'
+            f'"ast":{self._str(e.ast.__class__.__name__)}}}\n'
+        )
+
+
+# ============================================================
+# DOT
+# ============================================================
+
+def _dot_label(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class DotEmitter(Emitter):
+    def begin(self, graph: ValueGraph):
+        self.write(
+            "digraph value_graph {\n"
+            '  node [fontname="monospace", fontsize=10];\n'
+        )
+
+    def value(self, v: ValueNode):
+        if v.placeholder:
+            return
+        ast = v.ast.__class__.__name__ if v.ast else None
+        label = _dot_label(f"v{v.id} {v.kind} {ast}\n{_value_text(v)}")
+        self.write(f"  v{v.id} [shape=box, label={label}];\n")
+
+    def phi(self, p: PhiNode):
+        parts = [f"  p{p.id} [shape=diamond, label={_dot_label(f'p{p.id} {_phi_name(p)}')}];\n"]
+        for level, values in sorted(p.candidates.items()):
+            for v in sorted(values, key=lambda v: v.id):
+                parts.append(f'  v{v.id} -> p{p.id} [label="{level}"];\n')
+        self.write("".join(parts))
+
+    def edge(self, e: Edge):
+        parts = [f'  e{e.id} [shape=ellipse, label="e{e.id} {e.kind}"];\n']
+        if e.transform is not None:
+            parts.append(f"  p{e.transform.id} -> e{e.id} [style=dashed];\n")
+        for k, p in enumerate(e.inputs):
+            parts.append(f'  p{p.id} -> e{e.id} [label="{k}"];\n')
+        parts.append(f"  e{e.id} -> v{e.output.id} [style=bold];\n")
+        self.write("".join(parts))
+
+    def end(self):
+        self.write("}\n")
+
+
+_EMITTERS = {
+    "text": TextEmitter,
+    "jsonl": JsonlEmitter,
+    "dot": DotEmitter,
+}
+
+
+def make_emitter(f: TextIO, fmt: str = "text", buffer_size: int = BUFFER_SIZE) -> Emitter:
+    try:
+        cls = _EMITTERS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown value graph format: {fmt}") from None
+    return cls(f, buffer_size)
+
+
+def write_value_graph(graph: ValueGraph, f: TextIO, fmt: str = "text",
+                      buffer_size: int = BUFFER_SIZE) -> int:
+    """把整张图按 fmt 写入 f，返回写出的字符数"""
+    return make_emitter(f, fmt, buffer_size).emit(graph)
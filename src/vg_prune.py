@@ -0,0 +1,193 @@
+from __future__ import annotations
+import sys
+from typing import Dict, Iterable, List, Set
+
+from ast_types import Block, BlockInfo, Identifier
+from vg_types import ValueGraph, ValueNode, PhiNode, Edge
+
+
+# ============================================================
+# 统计信息
+# ============================================================
+
+class PruneStats:
+    """
+    一次 mark-and-sweep 的结果：
+    - *_before / *_after：节点数量
+    - bytes_reclaimed：被移除对象的估算内存（对象本体 + __dict__ + 容器）
+    """
+    def __init__(self):
+        self.values_before = 0
+        self.phis_before = 0
+        self.edges_before = 0
+        self.values_after = 0
+        self.phis_after = 0
+        self.edges_after = 0
+        self.bytes_reclaimed = 0
+
+    @property
+    def values_removed(self) -> int:
+        return self.values_before - self.values_after
+
+    @property
+    def phis_removed(self) -> int:
+        return self.phis_before - self.phis_after
+
+    @property
+    def edges_removed(self) -> int:
+        return self.edges_before - self.edges_after
+
+    def __str__(self):
+        return (
+            f"pruned values {self.values_before} -> {self.values_after}, "
+            f"phis {self.phis_before} -> {self.phis_after}, "
+            f"edges {self.edges_before} -> {self.edges_after}, "
+            f"~{self.bytes_reclaimed / 1024:.1f} KiB reclaimed"
+        )
+
+
+# ============================================================
+# Entry
+# ============================================================
+
+def prune_value_graph(
+    graph: ValueGraph,
+    block_index: List[BlockInfo],
+    keep: Iterable[str] = (),
+) -> PruneStats:
+    """
+    从程序根出发做可达性标记，删除不可达的 ValueNode / PhiNode / Edge，
+    并把三类 id 重新紧凑编号。
+
+    根：
+    - block_index[0] 中没有 target 的语句（程序的“输出”）
+    - block 的最后一条语句（block 的结果）
+    - keep 中列出的顶层绑定名
+
+    进入一个 block value 时，对其语句使用同样的规则；
+    被引用的绑定通过 PhiNode 的候选自然被标记。
+    """
+    assert len(block_index) > 0
+
+    stats = PruneStats()
+    stats.values_before = len(graph.values)
+    stats.phis_before = len(graph.phis)
+    stats.edges_before = len(graph.edges)
+
+    # ast expr -> 第一个以它为 ast 的 value（与 value_of_expr 语义一致）
+    value_by_ast: Dict[object, ValueNode] = {}
+    for v in graph.values:
+        if v.ast is not None:
+            value_by_ast.setdefault(v.ast, v)
+
+    phi_by_ident = graph.ident_phis()
+
+    live_values: Set[ValueNode] = set()
+    live_phis: Set[PhiNode] = set()
+    live_edges: Set[Edge] = set()
+
+    work: List[object] = []
+
+    def block_roots(block: Block, names: Set[str]):
+        stmts = block.stmts
+        for i, stmt in enumerate(stmts):
+            if (
+                stmt.target is None
+                or i == len(stmts) - 1
+                or stmt.target.name in names
+            ):
+                v = value_by_ast.get(stmt.expr)
+                if v is not None:
+                    work.append(v)
+
+    block_roots(block_index[0].ast_block, set(keep))
+
+    # ---------------- mark ----------------
+    while work:
+        item = work.pop()
+
+        if isinstance(item, ValueNode):
+            if item in live_values:
+                continue
+            live_values.add(item)
+            if item.in_edge is not None:
+                work.append(item.in_edge)
+            if item.kind == "block" and isinstance(item.ast, Block):
+                block_roots(item.ast, set())
+            if item.placeholder and isinstance(item.ast, Identifier):
+                p = phi_by_ident.get(item.ast)
+                if p is not None:
+                    work.append(p)
+
+        elif isinstance(item, PhiNode):
+            if item in live_phis:
+                continue
+            live_phis.add(item)
+            for values in item.candidates.values():
+                work.extend(values)
+
+        else:
+            if item in live_edges:
+                continue
+            live_edges.add(item)
+            if item.transform is not None:
+                work.append(item.transform)
+            work.extend(item.inputs)
+
+    # ---------------- sweep ----------------
+    for v in graph.values:
+        if v not in live_values:
+            stats.bytes_reclaimed += _sizeof_value(v)
+    for p in graph.phis:
+        if p not in live_phis:
+            stats.bytes_reclaimed += _sizeof_phi(p)
+    for e in graph.edges:
+        if e not in live_edges:
+            stats.bytes_reclaimed += _sizeof_edge(e)
+
+    graph.values = [v for v in graph.values if v in live_values]
+    graph.phis = [p for p in graph.phis if p in live_phis]
+    graph.edges = [e for e in graph.edges if e in live_edges]
+    graph.type_values = [tv for tv in graph.type_values if tv[0] in live_edges]
+
+    for v in graph.values:
+        v.out_edges = [e for e in v.out_edges if e in live_edges]
+
+    # ---------------- renumber ----------------
+    for i, v in enumerate(graph.values):
+        v.id = i
+    for i, p in enumerate(graph.phis):
+        p.id = i
+    for i, e in enumerate(graph.edges):
+        e.id = i
+    graph._vid = len(graph.values)
+    graph._pid = len(graph.phis)
+    graph._eid = len(graph.edges)
+
+    stats.values_after = len(graph.values)
+    stats.phis_after = len(graph.phis)
+    stats.edges_after = len(graph.edges)
+    return stats
+
+
+# ============================================================
+# 内存估算（只算图自身持有的部分，不含共享的 AST / CST）
+# ============================================================
+
+def _sizeof_obj(obj) -> int:
+    return sys.getsizeof(obj) + sys.getsizeof(obj.__dict__)
+
+
+def _sizeof_value(v: ValueNode) -> int:
+    return _sizeof_obj(v) + sys.getsizeof(v.out_edges)
+
+
+def _sizeof_phi(p: PhiNode) -> int:
+    size = _sizeof_obj(p) + sys.getsizeof(p.candidates)
+    for values in p.candidates.values():
+        size += sys.getsizeof(values)
+    return size
+
+
+def _sizeof_edge(e: Edge) -> int:
+    return _sizeof_obj(e) + sys.getsizeof(e.inputs)
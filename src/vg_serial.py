@@ -0,0 +1,454 @@
+from __future__ import annotations
+import mmap
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from vg_types import ValueGraph
+
+# ============================================================
+# ValueGraph 二进制格式（.vgb）
+#
+#   header   magic "YVG\0" | u16 version | u16 保留 | u32 * N_SECTIONS 各段偏移
+#   strings  varint n, { varint len, utf-8 }          名字 / 字面量原文 / rule 名
+#   pos      varint n, { tag, ... }                   CST 位置表（行 / 列存 +1，0 表示 None）
+#   ast      varint n, { class, text+1, ltype+1, pos+1 }
+#   bindphi  varint n, { varint id, name }
+#   values   varint n, { kind, flags, ast+1 }
+#   phis     varint n, { ident ast+1, bindphi+1, flags, nlevel, { zigzag level, n, vid... } }
+#   edges    varint n, { kind, out vid, transform pid+1, n, pid..., ast+1 }
+#   types    varint n, { edge id, n, pid... }         graph.type_values
+#
+# 除 header 外所有整数都是 LEB128 varint；id 都是数组下标（save 前已紧凑编号）。
+# AST 只保存图里用得到的部分（类名、名字 / 原文、位置），load 之后是只读的
+# 替身对象，足够 dump / 下游工具使用，但不能再跑 BDG。
+# 段偏移放在定长 header 里，mmap 之后可以直接跳到任意一段。
+# ============================================================
+
+MAGIC = b"YVG\0"
+VERSION = 2
+
+SECTIONS = ("strings", "pos", "ast", "bindphi", "values", "phis", "edges", "types")
+_HEADER = struct.Struct("<4sHH" + "I" * len(SECTIONS))
+
+VALUE_KINDS = ("literal", "symbol", "block", "expr")
+EDGE_KINDS = ("call", "listdef", "kvdef", "fndef")
+
+_POS_TOKEN = 0
+_POS_RULE = 1
+
+
+def _opt(x: Optional[int]) -> int:
+    return 0 if x is None else x + 1
+
+
+def _unopt(u: int) -> Optional[int]:
+    return None if u == 0 else u - 1
+
+
+class VgFormatError(Exception):
+    pass
+
+
+# ============================================================
+# varint
+# ============================================================
+
+def _put(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+class _Reader:
+    def __init__(self, buf, pos: int):
+        self.buf = buf
+        self.pos = pos
+
+    def u(self) -> int:
+        buf = self.buf
+        pos = self.pos
+        b = buf[pos]
+        pos += 1
+        if b < 0x80:
+            self.pos = pos
+            return b
+        n = b & 0x7F
+        shift = 7
+        while True:
+            b = buf[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return n
+
+    def raw(self, n: int) -> bytes:
+        data = bytes(self.buf[self.pos:self.pos + n])
+        self.pos += n
+        return data
+
+
+# ============================================================
+# save
+# ============================================================
+
+class _Writer:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.pos: List[tuple] = []
+        self._pos_ids: Dict[int, int] = {}
+        self.asts: List[tuple] = []
+        self._ast_ids: Dict[int, int] = {}
+        self.bindphis: List[Tuple[int, int]] = []
+        self._bindphi_ids: Dict[int, int] = {}
+        # 保证 id() 在写完之前不被复用
+        self._keep: List[object] = []
+
+    def string(self, s: str) -> int:
+        i = self._string_ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self._string_ids[s] = i
+        return i
+
+    def cst(self, cst: Optional[dict]) -> int:
+        """位置表下标 + 1，0 表示没有 CST"""
+        if cst is None:
+            return 0
+        i = self._pos_ids.get(id(cst))
+        if i is not None:
+            return i + 1
+        if cst.get("node-type") == "token":
+            entry = (
+                _POS_TOKEN,
+                self.string(cst.get("text") or ""),
+                self.string(cst.get("token-type") or ""),
+                cst.get("token-type-id", 0),
+                _opt(cst.get("line")),
+                _opt(cst.get("column")),
+            )
+        else:
+            start = cst.get("start") or {}
+            end = cst.get("end") or {}
+            entry = (
+                _POS_RULE,
+                self.string(cst.get("rule") or ""),
+                _opt(start.get("line")),
+                _opt(start.get("column")),
+                _opt(end.get("line")),
+                _opt(end.get("column")),
+            )
+        i = len(self.pos)
+        self.pos.append(entry)
+        self._pos_ids[id(cst)] = i
+        self._keep.append(cst)
+        return i + 1
+
+    def ast(self, node) -> int:
+        """AST 表下标 + 1，0 表示 None；同一个 AST 对象只写一次，load 后仍然共享"""
+        if node is None:
+            return 0
+        i = self._ast_ids.get(id(node))
+        if i is not None:
+            return i + 1
+        text = getattr(node, "name", None)
+        if text is None:
+            text = getattr(node, "raw", None)
+        ltype = getattr(node, "type", None) if hasattr(node, "raw") else None
+        entry = (
+            self.string(type(node).__name__),
+            self.string(text) + 1 if isinstance(text, str) else 0,
+            self.string(ltype) + 1 if isinstance(ltype, str) else 0,
+            self.cst(node.getCstPointer()),
+        )
+        i = len(self.asts)
+        self.asts.append(entry)
+        self._ast_ids[id(node)] = i
+        self._keep.append(node)
+        return i + 1
+
+    def bindphi(self, bp) -> int:
+        if bp is None:
+            return 0
+        i = self._bindphi_ids.get(id(bp))
+        if i is None:
+            i = len(self.bindphis)
+            self.bindphis.append((bp.id, self.string(bp.name)))
+            self._bindphi_ids[id(bp)] = i
+            self._keep.append(bp)
+        return i + 1
+
+
+def dumps(graph: ValueGraph) -> bytes:
+    _check_ids(graph)
+    w = _Writer()
+
+    # 先编码图本身，顺带把 string / pos / ast 表收集出来
+    values = bytearray()
+    _put(values, len(graph.values))
+    for v in graph.values:
+        _put(values, VALUE_KINDS.index(v.kind))
+        _put(values, 1 if v.placeholder else 0)
+        _put(values, w.ast(v.ast))
+
+    phis = bytearray()
+    _put(phis, len(graph.phis))
+    for p in graph.phis:
+        _put(phis, w.ast(p.identifier))
+        _put(phis, w.bindphi(p.bindphi))
+        _put(phis, 1 if p.placeholder else 0)
+        _put(phis, len(p.candidates))
+        for level in sorted(p.candidates):
+            vs = sorted(v.id for v in p.candidates[level])
+            _put(phis, _zigzag(level))
+            _put(phis, len(vs))
+            for vid in vs:
+                _put(phis, vid)
+
+    edges = bytearray()
+    _put(edges, len(graph.edges))
+    for e in graph.edges:
+        _put(edges, EDGE_KINDS.index(e.kind))
+        _put(edges, e.output.id)
+        _put(edges, e.transform.id + 1 if e.transform is not None else 0)
+        _put(edges, len(e.inputs))
+        for p in e.inputs:
+            _put(edges, p.id)
+        _put(edges, w.ast(e.ast))
+
+    types = bytearray()
+    _put(types, len(graph.type_values))
+    for tv in graph.type_values:
+        # fndef 的输入 phi 可能已被 connect_identifiers 替换 / 被剪枝，只写仍在图里的
+        live = [p for p in tv[1:] if p.id < len(graph.phis) and graph.phis[p.id] is p]
+        _put(types, tv[0].id)
+        _put(types, len(live))
+        for p in live:
+            _put(types, p.id)
+
+    bindphis = bytearray()
+    _put(bindphis, len(w.bindphis))
+    for bid, name in w.bindphis:
+        _put(bindphis, bid)
+        _put(bindphis, name)
+
+    asts = bytearray()
+    _put(asts, len(w.asts))
+    for entry in w.asts:
+        for x in entry:
+            _put(asts, x)
+
+    pos = bytearray()
+    _put(pos, len(w.pos))
+    for entry in w.pos:
+        for x in entry:
+            _put(pos, x)
+
+    strings = bytearray()
+    _put(strings, len(w.strings))
+    for s in w.strings:
+        data = s.encode("utf-8")
+        _put(strings, len(data))
+        strings += data
+
+    sections = {
+        "strings": strings, "pos": pos, "ast": asts, "bindphi": bindphis,
+        "values": values, "phis": phis, "edges": edges, "types": types,
+    }
+    offsets = []
+    off = _HEADER.size
+    for name in SECTIONS:
+        offsets.append(off)
+        off += len(sections[name])
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, 0, *offsets))
+    for name in SECTIONS:
+        out += sections[name]
+    return bytes(out)
+
+
+def save(graph: ValueGraph, path: str):
+    with open(path, "wb") as f:
+        f.write(dumps(graph))
+
+
+def _check_ids(graph: ValueGraph):
+    for lst in (graph.values, graph.phis, graph.edges):
+        for i, x in enumerate(lst):
+            if x.id != i:
+                raise VgFormatError(
+                    f"{type(x).__name__} ids are not compact (index {i} has id {x.id})"
+                )
+
+
+# ============================================================
+# load
+# ============================================================
+
+class LoadedAst:
+    """load 出来的 AST 替身：只有类名、名字 / 原文和 CST 位置"""
+    __slots__ = ("name", "raw", "type", "cstPointer", "bindphi")
+
+    def __init__(self, text: Optional[str], ltype: Optional[str], cst: Optional[dict]):
+        self.name = text
+        self.raw = text
+        self.type = ltype
+        self.cstPointer = cst
+        self.bindphi = None
+
+    def getCstPointer(self):
+        return self.cstPointer
+
+
+class LoadedBindPhi:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+
+
+_stub_classes: Dict[str, type] = {}
+
+
+def _stub_class(name: str) -> type:
+    # 保留原来的类名，dump_value_graph 按 __class__.__name__ 打印
+    cls = _stub_classes.get(name)
+    if cls is None:
+        cls = type(name, (LoadedAst,), {"__slots__": ()})
+        _stub_classes[name] = cls
+    return cls
+
+
+def loads(buf) -> ValueGraph:
+    if len(buf) < _HEADER.size:
+        raise VgFormatError("truncated header")
+    magic, version, _, *offsets = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise VgFormatError("not a value graph file")
+    if version != VERSION:
+        raise VgFormatError(f"unsupported value graph version {version}")
+    at = dict(zip(SECTIONS, offsets))
+
+    # strings
+    r = _Reader(buf, at["strings"])
+    strings = [r.raw(r.u()).decode("utf-8") for _ in range(r.u())]
+
+    # pos
+    r = _Reader(buf, at["pos"])
+    pos: List[dict] = []
+    for _ in range(r.u()):
+        if r.u() == _POS_TOKEN:
+            text, ttype, tid, line, col = r.u(), r.u(), r.u(), r.u(), r.u()
+            pos.append({
+                "node-type": "token",
+                "text": strings[text],
+                "token-type": strings[ttype],
+                "token-type-id": tid,
+                "line": _unopt(line),
+                "column": _unopt(col),
+            })
+        else:
+            rule, sl, sc, el, ec = r.u(), r.u(), r.u(), r.u(), r.u()
+            pos.append({
+                "node-type": "rule",
+                "rule": strings[rule],
+                "start": {"line": _unopt(sl), "column": _unopt(sc)},
+                "end": {"line": _unopt(el), "column": _unopt(ec)},
+                "children": [],
+            })
+
+    # bindphi
+    r = _Reader(buf, at["bindphi"])
+    bindphis = [LoadedBindPhi(r.u(), strings[r.u()]) for _ in range(r.u())]
+
+    # ast
+    r = _Reader(buf, at["ast"])
+    asts: List[LoadedAst] = []
+    for _ in range(r.u()):
+        cls, text, ltype, p = r.u(), r.u(), r.u(), r.u()
+        asts.append(_stub_class(strings[cls])(
+            strings[text - 1] if text else None,
+            strings[ltype - 1] if ltype else None,
+            pos[p - 1] if p else None,
+        ))
+
+    graph = ValueGraph()
+
+    # values
+    r = _Reader(buf, at["values"])
+    for _ in range(r.u()):
+        kind, flags, a = r.u(), r.u(), r.u()
+        ast = asts[a - 1] if a else None
+        graph.new_value(
+            kind=VALUE_KINDS[kind],
+            ast=ast,
+            cst=ast.cstPointer if ast is not None else None,
+            placeholder=bool(flags & 1),
+        )
+    values = graph.values
+
+    # phis
+    r = _Reader(buf, at["phis"])
+    for _ in range(r.u()):
+        ident, bp, flags = r.u(), r.u(), r.u()
+        p = graph.new_phi(
+            identifier=asts[ident - 1] if ident else None,
+            bindphi=bindphis[bp - 1] if bp else None,
+            placeholder=bool(flags & 1),
+        )
+        if p.identifier is not None and p.bindphi is not None:
+            p.identifier.bindphi = p.bindphi
+        for _ in range(r.u()):
+            level = _unzigzag(r.u())
+            for _ in range(r.u()):
+                p.add(level, values[r.u()])
+    phis = graph.phis
+
+    # edges
+    r = _Reader(buf, at["edges"])
+    for _ in range(r.u()):
+        kind, out, tr = r.u(), r.u(), r.u()
+        inputs = [phis[r.u()] for _ in range(r.u())]
+        a = r.u()
+        graph.new_edge(
+            kind=EDGE_KINDS[kind],
+            output=values[out],
+            transform=phis[tr - 1] if tr else None,
+            inputs=inputs,
+            ast=asts[a - 1] if a else None,
+        )
+
+    # type_values
+    r = _Reader(buf, at["types"])
+    for _ in range(r.u()):
+        e = graph.edges[r.u()]
+        graph.type_values.append([e, *(phis[r.u()] for _ in range(r.u()))])
+
+    return graph
+
+
+def load(path: str) -> ValueGraph:
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return loads(mm)
+
+
+if __name__ == "__main__":
+    # python vg_serial.py graph.vgb  —— 不重新编译，直接 dump
+    from bdg_to_vg import dump_value_graph
+    dump_value_graph(load(sys.argv[1]))
@@ -214,3 +214,15 @@ class ValueGraph:
             if v.ast is expr:
                 return v
         return None
+
+    def ident_phis(self) -> Dict[Identifier, PhiNode]:
+        """
+        Identifier -> connect_identifiers 建出的真实 phi
+        语句本身就是一个裸 Identifier 时，没有 edge 引用它，只能从这里找
+        """
+        index: Dict[Identifier, PhiNode] = {}
+        for p in self.phis:
+            if p.bindphi is not None and p.identifier is not None:
+                # 单态化克隆出的 phi 复用同一个 Identifier，原图里的优先
+                index.setdefault(p.identifier, p)
+        return index
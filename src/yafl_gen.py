@@ -0,0 +1,238 @@
+from __future__ import annotations
+import random
+from typing import Dict, List
+
+# ============================================================
+# 参数化的 YAFL 程序生成器（bench_suite 用）
+#
+# 每个维度单独可调，其余维度保持默认，方便做单变量的规模扫描：
+#   statements  —— 顶层语句条数
+#   depth       —— 函数体嵌套层数  (p1) => { (p2) => { ... } }
+#   reuse       —— 标识符复用比例：0 每条语句一个新名字，
+#                  越接近 1 同名绑定越多（BindPhi 候选越多）
+#   string_len  —— 字符串字面量长度（0 不生成字符串语句）
+#   list_width  —— list 字面量的元素个数
+#   curry       —— 柯里化调用链长度  f(a)(b)(c)...
+# 同一组参数 + seed 生成的程序逐字节相同。
+# ============================================================
+
+DEFAULTS: Dict[str, float] = {
+    "statements": 100,
+    "depth": 2,
+    "reuse": 0.0,
+    "string_len": 8,
+    "list_width": 4,
+    "curry": 2,
+}
+
+
+class _Gen:
+    def __init__(self, params: Dict[str, float], seed: int):
+        self.p = params
+        self.rnd = random.Random(seed)
+        self.defined: List[str] = []
+        n = int(params["statements"])
+        self.distinct = max(1, int(round(n * (1.0 - params["reuse"]))))
+
+    def name(self, i: int) -> str:
+        return f"v{i % self.distinct}"
+
+    def ref(self) -> str:
+        """引用一个之前绑定过的名字；还没有的话用字面量"""
+        if not self.defined:
+            return str(self.rnd.randrange(100))
+        return self.rnd.choice(self.defined)
+
+    # ---------------- 表达式 ----------------
+
+    def literal(self) -> str:
+        return str(self.rnd.randrange(1000))
+
+    def string(self) -> str:
+        n = int(self.p["string_len"])
+        return '"' + "".join(self.rnd.choice("abcdefghij") for _ in range(n)) + '"'
+
+    def list_(self) -> str:
+        width = max(1, int(self.p["list_width"]))
+        elems = [self.ref() if k % 2 else self.literal() for k in range(width)]
+        if width == 1:
+            return f"({elems[0]},)"
+        return "(" + ", ".join(elems) + ")"
+
+    def function(self, level: int = 1) -> str:
+        depth = max(1, int(self.p["depth"]))
+        param = f"p{level}"
+        if level >= depth:
+            body = f"q{level} := {param}; ({param}, {self.ref()})"
+        else:
+            body = f"q{level} := {param}; {self.function(level + 1)}"
+        return f"({param}: i32) => {{ {body} }}"
+
+    def curry_call(self) -> str:
+        length = max(1, int(self.p["curry"]))
+        call = self.ref()
+        for _ in range(length):
+            call += f"({self.ref()})"
+        return call
+
+    # ---------------- 语句 ----------------
+
+    def program(self) -> str:
+        kinds = [self.literal, self.list_, self.function, self.curry_call]
+        if self.p["string_len"] > 0:
+            kinds.append(self.string)
+        out = []
+        for i in range(int(self.p["statements"])):
+            expr = kinds[i % len(kinds)]()
+            name = self.name(i)
+            out.append(f"{name} := {expr};")
+            if name not in self.defined:
+                self.defined.append(name)
+        return "\n".join(out) + "\n"
+
+
+def generate_program(seed: int = 0, **params: float) -> str:
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown generator parameter(s): {', '.join(sorted(unknown))}")
+    merged = dict(DEFAULTS)
+    merged.update(params)
+    return _Gen(merged, seed).program()
+
+
+
+# ============================================================
+# 按 grammar 随机生成（differential 用）
+#
+# 每个函数对应 MainParser.g4 里的一条规则，budget 控制嵌套深度，
+# 名字从一个很小的池子里取，让同名绑定 / 遮蔽 / builtin 经常出现。
+# 生成的程序语法上合法，语义上不保证（不做类型检查）。
+# ============================================================
+
+NAME_POOL = ["a", "b", "c", "f", "g", "x", "T", "i32", "+", "arr!", "!pure"]
+
+LITERALS = ["0", "1", "42", "0x1f", "1_000", "1.5", "2.0f", "true", "false", "null", '"s"', '"ab\\n"']
+
+
+class _GrammarGen:
+    def __init__(self, rnd: random.Random, budget: int):
+        self.rnd = rnd
+        self.budget = budget
+
+    def pick(self, *weighted):
+        total = sum(w for w, _ in weighted)
+        r = self.rnd.random() * total
+        for w, fn in weighted:
+            r -= w
+            if r < 0:
+                return fn
+        return weighted[-1][1]
+
+    def ident(self) -> str:
+        return self.rnd.choice(NAME_POOL)
+
+    def binder(self) -> str:
+        # 绑定目标不用符号名，免得和 OP_BIND 粘在一起
+        return self.rnd.choice(NAME_POOL[:7])
+
+    # block : (statement (SEMICOLON statement)* SEMICOLON?)?
+    def block(self, depth: int, sep: str = " ") -> str:
+        n = self.rnd.randrange(0, 4)
+        stmts = [self.statement(depth) for _ in range(n)]
+        if not stmts:
+            return ""
+        tail = ";" if self.rnd.random() < 0.7 else ""
+        return (";" + sep).join(stmts) + tail
+
+    # statement : ID OP_BIND expression | expression
+    def statement(self, depth: int) -> str:
+        if self.rnd.random() < 0.7:
+            return f"{self.binder()} := {self.expression(depth)}"
+        return self.expression(depth)
+
+    # expression : function_call | atom_expression
+    def expression(self, depth: int) -> str:
+        if depth >= self.budget:
+            return self.leaf()
+        return self.pick(
+            (2, self.function_call),
+            (3, self.atom_expression),
+        )(depth + 1)
+
+    def leaf(self) -> str:
+        return self.rnd.choice(LITERALS) if self.rnd.random() < 0.4 else self.ident()
+
+    # atom_expression : function | literface | ID | list | ( expression )
+    def atom_expression(self, depth: int) -> str:
+        if depth >= self.budget:
+            return self.leaf()
+        return self.pick(
+            (1, self.function),
+            (2, lambda d: self.rnd.choice(LITERALS)),
+            (3, lambda d: self.ident()),
+            (2, self.list_),
+            (1, lambda d: f"({self.expression(d + 1)})"),
+        )(depth + 1)
+
+    # list : () | ( ID : expr ) | ( elem , (elem (, elem)*)? ,? )
+    def list_(self, depth: int) -> str:
+        shape = self.rnd.randrange(3)
+        if shape == 0:
+            return "()"
+        if shape == 1:
+            return f"({self.binder()}: {self.expression(depth)})"
+        n = self.rnd.randrange(1, 4)
+        elems = [self.list_element(depth) for _ in range(n)]
+        if n == 1 or self.rnd.random() < 0.3:
+            return "(" + ", ".join(elems) + ",)"
+        return "(" + ", ".join(elems) + ")"
+
+    def list_element(self, depth: int) -> str:
+        if self.rnd.random() < 0.3:
+            return f"{self.binder()}: {self.expression(depth)}"
+        return self.expression(depth)
+
+    # function : params (: atom)? => annotations* { block }
+    def function(self, depth: int) -> str:
+        params = self.pick(
+            (1, lambda d: self.binder()),
+            (3, self.list_),
+            (1, lambda d: f"({self.expression(d)})"),
+        )(depth)
+        ret = f": {self.atom_expression(depth)}" if self.rnd.random() < 0.3 else ""
+        ann = "".join(f" {self.ident()}" for _ in range(self.rnd.randrange(0, 2)))
+        return f"{params}{ret} =>{ann} {{ {self.block(depth)} }}"
+
+    # function_call : atom args | function_call args | [ expr , expr ]
+    def function_call(self, depth: int) -> str:
+        if self.rnd.random() < 0.15:
+            return f"[{self.expression(depth)}, {self.expression(depth)}]"
+        call = self.atom_expression(depth)
+        for _ in range(self.rnd.randrange(1, 3)):
+            call += self.function_arg_list(depth)
+        return call
+
+    # function_arg_list : list | ( expression )
+    def function_arg_list(self, depth: int) -> str:
+        if self.rnd.random() < 0.7:
+            return self.list_(depth)
+        return f"({self.expression(depth)})"
+
+
+def random_program(seed: int, statements: int = 8, budget: int = 5) -> str:
+    """顶层语句一行一条（differential 按行缩减失败用例）"""
+    gen = _GrammarGen(random.Random(seed), budget)
+    lines = [gen.statement(0) + ";" for _ in range(statements)]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic YAFL program")
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    params = {key: getattr(args, key) for key in DEFAULTS}
+    print(generate_program(args.seed, **params), end="")